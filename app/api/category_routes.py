@@ -1,4 +1,4 @@
-from typing import List
+from typing import Any, List, Literal, Optional, Tuple, Union
 from uuid import UUID
 
 from fastapi import (
@@ -7,14 +7,35 @@ from fastapi import (
     status,
     Depends,
     Query,
+    Request,
     Response,
 )
 
+from app.api.conditional import (
+    collection_validators,
+    has_preconditions,
+    is_not_modified,
+    not_modified,
+    set_validators,
+    validators,
+)
+from app.api.pagination import (
+    count_query,
+    name_cursor,
+    set_next_cursor,
+    set_total_count,
+)
+from app.api.responses import json_response
+from app.config import ASYNC_DB
 from app.services.category_service import CategoryService
+from app.services.async_category_service import AsyncCategoryService
+from app.services.threadpool import ThreadpoolService
 from app.schemas.category import (
     CategoryCreate,
     CategoryUpdate,
     CategoryResponse,
+    CategoryStatsResponse,
+    CategoryWithStatsResponse,
 )
 from app.unit_of_work.sqlalchemy_uow import SQLAlchemyUnitOfWork
 
@@ -23,8 +44,16 @@ router = APIRouter(prefix="/categories", tags=["Categories"])
 
 
 # Dependency
-def get_category_service() -> CategoryService:
-    return CategoryService(SQLAlchemyUnitOfWork)
+def get_category_service() -> AsyncCategoryService:
+    # Both variants are awaited by the routes; the sync one runs each call
+    # in the threadpool, the async one runs on the event loop.
+    if ASYNC_DB:
+        return AsyncCategoryService()
+    return ThreadpoolService(CategoryService(SQLAlchemyUnitOfWork))
+
+
+def category_version(category) -> Tuple[Any, ...]:
+    return (category.id, category.updated_at)
 
 
 # --------------------
@@ -36,12 +65,12 @@ def get_category_service() -> CategoryService:
     status_code=status.HTTP_201_CREATED,
     response_model=CategoryResponse
 )
-def create_category(
+async def create_category(
     payload: CategoryCreate,
-    service: CategoryService = Depends(get_category_service),
+    service: AsyncCategoryService = Depends(get_category_service),
 ):
     try:
-        return service.create_category(
+        return await service.create_category(
             name=payload.name,
             description=payload.description,
         )
@@ -57,15 +86,27 @@ def create_category(
     "/{category_id}",
     response_model=CategoryResponse
 )
-def get_category(
+async def get_category(
     category_id: UUID,
-    service: CategoryService = Depends(get_category_service),
+    request: Request,
+    response: Response,
+    service: AsyncCategoryService = Depends(get_category_service),
 ):
-    category = service.get_category(category_id)
+    # Answer conditional requests from the version row alone
+    if has_preconditions(request):
+        version = await service.get_category_version(category_id)
+
+        if version is not None:
+            etag, last_modified = validators([version])
+            if is_not_modified(request, etag, last_modified):
+                return not_modified(etag, last_modified)
+
+    category = await service.get_category(category_id)
 
     if not category:
         raise HTTPException(status_code=404, detail="Category not found")
 
+    set_validators(response, *validators([category_version(category)]))
     return category
 
 
@@ -75,14 +116,81 @@ def get_category(
 
 @router.get(
     "",
-    response_model=List[CategoryResponse]
+    response_model=Union[List[CategoryResponse], List[CategoryWithStatsResponse]]
 )
-def list_categories(
+async def list_categories(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100),
-    service: CategoryService = Depends(get_category_service),
+    after: Optional[Tuple[str, UUID]] = Depends(name_cursor),
+    count: Optional[str] = Depends(count_query),
+    include: Optional[Literal["stats"]] = Query(
+        None,
+        description="stats: embed each category's product count and "
+                    "min / max / average price.",
+    ),
+    service: AsyncCategoryService = Depends(get_category_service),
 ):
-    return service.list_categories(skip, limit)
+    stats = include == "stats"
+    total = await service.count_categories(count) if count else None
+    # The total is part of the response, so it is part of the ETag too
+    counted = [("total", total)] if count else []
+
+    # Stats change without the categories' updated_at; those pages are
+    # checked once read, below
+    if has_preconditions(request, collection=True) and not stats:
+        etag, last_modified = collection_validators(
+            await service.list_category_versions(skip, limit, after=after) + counted
+        )
+        if is_not_modified(request, etag, last_modified):
+            return not_modified(etag, last_modified)
+
+    rows = await service.list_categories(skip, limit, after=after, rows=True, stats=stats)
+
+    etag, last_modified = collection_validators([
+        (item["id"], item["updated_at"])
+        + ((item["stats"]["updated_at"],) if stats else ())
+        for item in rows
+    ] + counted)
+
+    if stats and is_not_modified(request, etag, last_modified):
+        return not_modified(etag, last_modified)
+
+    set_validators(response, etag, last_modified)
+    set_next_cursor(
+        response, rows, limit, key=lambda item: (item["name"], item["id"])
+    )
+    set_total_count(response, total)
+    return json_response(rows, response)
+
+
+# --------------------
+# Stats
+# --------------------
+
+@router.get(
+    "/{category_id}/stats",
+    response_model=CategoryStatsResponse
+)
+async def get_category_stats(
+    category_id: UUID,
+    request: Request,
+    response: Response,
+    service: AsyncCategoryService = Depends(get_category_service),
+):
+    stats = await service.get_category_stats(category_id)
+
+    if stats is None:
+        raise HTTPException(status_code=404, detail="Category not found")
+
+    etag, last_modified = validators([(category_id, stats["updated_at"])])
+
+    if is_not_modified(request, etag, last_modified):
+        return not_modified(etag, last_modified)
+
+    set_validators(response, etag, last_modified)
+    return stats
 
 
 # --------------------
@@ -93,13 +201,13 @@ def list_categories(
     "/{category_id}",
     response_model=CategoryResponse
 )
-def update_category(
+async def update_category(
     category_id: UUID,
     payload: CategoryUpdate,
-    service: CategoryService = Depends(get_category_service),
+    service: AsyncCategoryService = Depends(get_category_service),
 ):
     try:
-        category = service.update_category(
+        category = await service.update_category(
             category_id,
             name=payload.name,
             description=payload.description,
@@ -121,11 +229,11 @@ def update_category(
     "/{category_id}",
     status_code=status.HTTP_204_NO_CONTENT
 )
-def delete_category(
+async def delete_category(
     category_id: UUID,
-    service: CategoryService = Depends(get_category_service),
+    service: AsyncCategoryService = Depends(get_category_service),
 ):
-    deleted = service.delete_category(category_id)
+    deleted = await service.delete_category(category_id)
 
     if not deleted:
         raise HTTPException(status_code=404, detail="Category not found")
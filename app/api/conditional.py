@@ -0,0 +1,125 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Iterable, Optional, Sequence, Tuple
+
+from fastapi import Request, Response, status
+
+
+# A version is a tuple of values that changes whenever the representation
+# of a resource changes, e.g. (id, updated_at). Repositories can select it
+# without loading the full ORM graph.
+Version = Sequence[Any]
+
+
+def etag_for(versions: Iterable[Version]) -> str:
+    """
+    Strong ETag over the versions of every resource in a response.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+
+    for version in versions:
+        digest.update(
+            "|".join(
+                value.isoformat() if isinstance(value, datetime) else str(value)
+                for value in version
+            ).encode()
+        )
+        digest.update(b"\n")
+
+    return f'"{digest.hexdigest()}"'
+
+
+def _as_utc(value: datetime) -> datetime:
+    # Timestamps are stored without a time zone, in UTC whatever the
+    # session's TimeZone (written by app.models.base.utc_now)
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def last_modified_for(timestamps: Iterable[Optional[datetime]]) -> Optional[datetime]:
+    known = [_as_utc(value) for value in timestamps if value is not None]
+    return max(known) if known else None
+
+
+def validators(versions: Sequence[Version]) -> Tuple[str, Optional[datetime]]:
+    """
+    `(etag, last_modified)` for a response made of `versions`.
+    """
+    return etag_for(versions), last_modified_for(
+        value
+        for version in versions
+        for value in version
+        if isinstance(value, datetime)
+    )
+
+
+def collection_validators(versions: Sequence[Version]) -> Tuple[str, None]:
+    """
+    `(etag, None)` for a list response. The newest updated_at of a page
+    moves neither when one of its rows is deleted nor when rows shift in
+    from the next page, so collections have no Last-Modified and only
+    answer If-None-Match.
+    """
+    return etag_for(versions), None
+
+
+def set_validators(
+    response: Response,
+    etag: str,
+    last_modified: Optional[datetime] = None,
+) -> None:
+    response.headers["ETag"] = etag
+
+    if last_modified is not None:
+        response.headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+
+
+def is_not_modified(
+    request: Request,
+    etag: str,
+    last_modified: Optional[datetime] = None,
+) -> bool:
+    """
+    Evaluate If-None-Match, or If-Modified-Since when there is no
+    If-None-Match (RFC 9110, section 13.2.2).
+    """
+    if_none_match = request.headers.get("if-none-match")
+
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+
+        # GET uses weak comparison: ignore W/ prefixes
+        candidates = {
+            tag.strip().removeprefix("W/") for tag in if_none_match.split(",")
+        }
+        return etag.removeprefix("W/") in candidates
+
+    if_modified_since = request.headers.get("if-modified-since")
+
+    if if_modified_since is None or last_modified is None:
+        return False
+
+    try:
+        since = _as_utc(parsedate_to_datetime(if_modified_since))
+    except (TypeError, ValueError):
+        return False
+
+    # HTTP dates have one-second resolution
+    return last_modified.replace(microsecond=0) <= since
+
+
+def not_modified(etag: str, last_modified: Optional[datetime] = None) -> Response:
+    response = Response(status_code=status.HTTP_304_NOT_MODIFIED)
+    set_validators(response, etag, last_modified)
+    return response
+
+
+def has_preconditions(request: Request, collection: bool = False) -> bool:
+    # Collections ignore If-Modified-Since, see collection_validators
+    return (
+        "if-none-match" in request.headers
+        or (not collection and "if-modified-since" in request.headers)
+    )
@@ -0,0 +1,96 @@
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from starlette.responses import StreamingResponse
+
+
+Batch = List[Dict[str, Any]]
+
+CSV_COLUMNS = [
+    "id",
+    "name",
+    "description",
+    "price",
+    "sku",
+    "category_ids",
+    "category_names",
+    "created_at",
+    "updated_at",
+]
+
+
+def _json_default(value: Any) -> str:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def encode_ndjson(batch: Batch) -> str:
+    return "".join(
+        json.dumps(row, default=_json_default, separators=(",", ":")) + "\n"
+        for row in batch
+    )
+
+
+def encode_csv(batch: Batch) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    for row in batch:
+        writer.writerow([
+            row["id"],
+            row["name"],
+            row["description"],
+            row["price"],
+            row["sku"],
+            "|".join(str(category["id"]) for category in row["categories"]),
+            "|".join(category["name"] for category in row["categories"]),
+            row["created_at"].isoformat(),
+            row["updated_at"].isoformat(),
+        ])
+
+    return buffer.getvalue()
+
+
+def csv_header() -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(CSV_COLUMNS)
+    return buffer.getvalue()
+
+
+def encode_batches(batches: Any, encode: Callable[[Batch], str], header: Optional[str] = None):
+    """
+    Encode each batch into one chunk, keeping the iterator sync or async
+    to match the source (sync iterators are driven from the threadpool).
+    """
+    if hasattr(batches, "__aiter__"):
+        async def chunks():
+            if header:
+                yield header
+            async for batch in batches:
+                yield encode(batch)
+    else:
+        def chunks():
+            if header:
+                yield header
+            for batch in batches:
+                yield encode(batch)
+
+    return chunks()
+
+
+def export_response(batches: Any, format: str) -> StreamingResponse:
+    if format == "csv":
+        return StreamingResponse(
+            encode_batches(batches, encode_csv, header=csv_header()),
+            media_type="text/csv",
+            headers={"Content-Disposition": 'attachment; filename="products.csv"'},
+        )
+
+    return StreamingResponse(
+        encode_batches(batches, encode_ndjson),
+        media_type="application/x-ndjson",
+    )
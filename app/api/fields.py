@@ -0,0 +1,47 @@
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, Query
+
+from app.rendering import PRODUCT_EXPANSIONS, PRODUCT_FIELDS, Projection
+
+
+def _split(value: str, allowed: Tuple[str, ...], parameter: str) -> Tuple[str, ...]:
+    names = tuple(dict.fromkeys(
+        name.strip() for name in value.split(",") if name.strip()
+    ))
+
+    if any(name not in allowed for name in names):
+        raise ValueError(f"{parameter} must be among: {', '.join(allowed)}")
+
+    return names
+
+
+def product_projection(
+    fields: Optional[str] = Query(
+        None,
+        description=f"Comma-separated subset of: {', '.join(PRODUCT_FIELDS)}",
+    ),
+    expand: Optional[str] = Query(
+        None,
+        description="Comma-separated: categories. When `fields` or `expand` "
+                    "is given, categories are only embedded if expanded.",
+    ),
+) -> Optional[Projection]:
+    """
+    Dependency resolving `?fields=` / `?expand=`. None (neither given)
+    means the full ProductResponse, categories included.
+    """
+    if fields is None and expand is None:
+        return None
+
+    try:
+        selected = PRODUCT_FIELDS
+        if fields is not None:
+            selected = ("id", *_split(fields, PRODUCT_FIELDS, "fields"))
+
+        return Projection(
+            fields=tuple(dict.fromkeys(selected)),
+            expand=_split(expand or "", PRODUCT_EXPANSIONS, "expand"),
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
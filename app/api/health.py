@@ -1,5 +1,13 @@
 from fastapi import APIRouter, status
 
+from app.cache import CACHES
+from app.database import (
+    engine,
+    async_engine,
+    sync_pool_metrics,
+    async_pool_metrics,
+)
+
 
 router = APIRouter()
 
@@ -10,3 +18,22 @@ router = APIRouter()
 )
 def health_check():
     return {"status": "UP"}
+
+
+@router.get(
+    "/health/pool",
+    status_code=status.HTTP_200_OK
+)
+def pool_stats():
+    return {
+        "sync": sync_pool_metrics.snapshot(engine.pool),
+        "async": async_pool_metrics.snapshot(async_engine.pool),
+    }
+
+
+@router.get(
+    "/health/cache",
+    status_code=status.HTTP_200_OK
+)
+def cache_stats():
+    return {name: cache.stats() for name, cache in CACHES.items()}
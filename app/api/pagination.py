@@ -0,0 +1,104 @@
+import base64
+import binascii
+import json
+from decimal import Decimal
+from typing import Any, Callable, List, Literal, Optional, Sequence, Tuple
+from uuid import UUID
+
+from fastapi import HTTPException, Query, Response
+
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+TOTAL_COUNT_HEADER = "X-Total-Count"
+
+
+def encode_cursor(*values: Any) -> str:
+    """
+    Encode the sort key of the last row of a page into an opaque token.
+    """
+    payload = [
+        str(value) if isinstance(value, (UUID, Decimal)) else value
+        for value in values
+    ]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    padded = cursor + "=" * (-len(cursor) % 4)
+
+    try:
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("Invalid cursor")
+
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor")
+
+    return values
+
+
+def name_cursor(
+    cursor: Optional[str] = Query(None, min_length=1),
+) -> Optional[Tuple[str, UUID]]:
+    """
+    Dependency resolving `?cursor=` into the `(name, id)` keyset position.
+    """
+    if cursor is None:
+        return None
+
+    try:
+        name, id = decode_cursor(cursor)
+        if not isinstance(name, str):
+            raise ValueError("Invalid cursor")
+        return name, UUID(id)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def decode_sort_cursor(
+    cursor: str,
+    sort: str,
+    key_type: Callable[[Any], Any],
+) -> Tuple[Any, UUID]:
+    """
+    Decode a cursor produced for `sort` into its `(key, id)` position.
+    """
+    try:
+        cursor_sort, key, id = decode_cursor(cursor)
+        if cursor_sort != sort:
+            raise ValueError("Invalid cursor")
+        return key_type(key), UUID(id)
+    except (TypeError, ValueError, ArithmeticError):
+        raise ValueError("Invalid cursor")
+
+
+def set_next_cursor(
+    response: Response,
+    items: Sequence[Any],
+    limit: int,
+    key: Callable[[Any], Sequence[Any]] = lambda item: (item.name, item.id),
+) -> None:
+    """
+    Advertise the cursor of the next page when the current one is full.
+    """
+    if len(items) < limit:
+        return
+
+    response.headers[NEXT_CURSOR_HEADER] = encode_cursor(*key(items[-1]))
+
+
+def count_query(
+    count: Optional[Literal["exact", "estimate"]] = Query(
+        None,
+        description="Send the total number of matching rows as X-Total-Count: "
+                    "exact (COUNT) or estimate (from planner / table statistics).",
+    ),
+) -> Optional[str]:
+    return count
+
+
+def set_total_count(response: Response, total: Optional[int]) -> None:
+    if total is not None:
+        response.headers[TOTAL_COUNT_HEADER] = str(total)
@@ -1,14 +1,55 @@
-from typing import List, Optional
+import json
+from typing import Any, AsyncIterator, Dict, List, Literal, Optional, Tuple, Union
 from decimal import Decimal
 from uuid import UUID
 
-from fastapi import APIRouter, HTTPException, status, Depends, Query, Response
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Request, Response
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
 
-from app.services.product_service import ProductService
+from app.api.conditional import (
+    collection_validators,
+    has_preconditions,
+    is_not_modified,
+    not_modified,
+    set_validators,
+    validators,
+)
+from app.api.export import export_response
+from app.api.fields import product_projection
+from app.api.pagination import (
+    count_query,
+    decode_sort_cursor,
+    encode_cursor,
+    name_cursor,
+    set_next_cursor,
+    set_total_count,
+)
+from app.api.responses import json_response, raw_json_response
+from app.config import ASYNC_DB, BULK_CHUNK_SIZE, PRODUCT_DOCUMENTS
+from app.documents import document_version
+from app.rendering import FULL_PROJECTION, Projection, dumps, project
+from app.services.product_service import (
+    ProductService,
+    resolve_facets,
+    resolve_search_sort,
+)
+from app.services.async_product_service import AsyncProductService
+from app.services.threadpool import ThreadpoolService
 from app.schemas.product import (
     ProductCreate,
     ProductUpdate,
     ProductResponse,
+    ProductSuggestion,
+    ProductChanges,
+    ProductFacets,
+    ProductSearchResults,
+    ProductBatchGet,
+    ProductBatchResponse,
+    ProductBulkResponse,
+    ProductBulkDeleteResponse,
+    ProductPriceUpdate,
+    ProductPricesResponse,
 )
 from app.unit_of_work.sqlalchemy_uow import SQLAlchemyUnitOfWork
 
@@ -17,39 +58,432 @@ router = APIRouter(prefix="/products", tags=["Products"])
 
 
 # Dependency
-def get_product_service() -> ProductService:
-    return ProductService(SQLAlchemyUnitOfWork)
+def get_product_service() -> AsyncProductService:
+    # Both variants are awaited by the routes; the sync one runs each call
+    # in the threadpool, the async one runs on the event loop.
+    if ASYNC_DB:
+        return AsyncProductService()
+    return ThreadpoolService(ProductService(SQLAlchemyUnitOfWork))
+
+
+def product_version(
+    item: Dict[str, Any],
+    projection: Optional[Projection] = None,
+) -> Tuple[Any, ...]:
+    """
+    Same shape as ProductRepository.get_version, built from a product dict.
+    Categories only count when the projection embeds them.
+    """
+    categories_updated_at = category_count = None
+
+    if projection is None or projection.categories:
+        categories_updated_at = max(
+            (category["updated_at"] for category in item["categories"]),
+            default=None,
+        )
+        category_count = len(item["categories"])
+
+    return (item["id"], item["updated_at"], categories_updated_at, category_count)
+
+
+def projected_versions(
+    versions: List[Tuple[Any, ...]],
+    projection: Optional[Projection],
+) -> List[Tuple[Any, ...]]:
+    """
+    Versions identifying a projected representation: the projection is
+    part of it, and categories only count when embedded.
+    """
+    if projection is None:
+        return list(versions)
+
+    return [
+        *(
+            (id, updated_at, *(categories if projection.categories else (None, None)))
+            for id, updated_at, *categories in versions
+        ),
+        ("projection", ",".join(projection.fields), ",".join(projection.expand)),
+    ]
 
 
 # --------------------
 # Search
 # --------------------
 
+# Cursor key type and value per search sort order
+SEARCH_SORT_KEYS = {
+    "relevance": (float, lambda item: item["search_rank"]),
+    "name": (str, lambda item: item["name"]),
+    "price": (Decimal, lambda item: item["price"]),
+}
+
+
 @router.get(
     "/search",
-    response_model=List[ProductResponse]
+    response_model=Union[List[ProductResponse], ProductSearchResults]
 )
-def search_products(
+async def search_products(
+    response: Response,
     q: Optional[str] = Query(None, min_length=1),
     category_id: Optional[UUID] = None,
+    category_ids: Optional[List[UUID]] = Query(None),
+    category_match: Literal["any", "all"] = "any",
     min_price: Optional[Decimal] = Query(None, ge=0),
     max_price: Optional[Decimal] = Query(None, ge=0),
+    sort: Optional[Literal["relevance", "name", "price"]] = None,
+    fuzzy: bool = False,
+    facets: Optional[str] = Query(
+        None,
+        description="Comma-separated: categories, price. Wraps the page "
+                    "as {items, facets}.",
+    ),
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100),
-    service: ProductService = Depends(get_product_service),
+    cursor: Optional[str] = Query(None, min_length=1),
+    count: Optional[str] = Depends(count_query),
+    projection: Optional[Projection] = Depends(product_projection),
+    service: AsyncProductService = Depends(get_product_service),
 ):
     try:
-        return service.search_products(
+        sort = resolve_search_sort(q, sort)
+        requested_facets = resolve_facets(facets)
+        key_type, key = SEARCH_SORT_KEYS[sort]
+        after = decode_sort_cursor(cursor, sort, key_type) if cursor else None
+
+        result = await service.search_products_with_facets(
             keyword=q,
             category_id=category_id,
+            category_ids=category_ids,
+            category_match=category_match,
             min_price=min_price,
             max_price=max_price,
             skip=skip,
             limit=limit,
+            after=after,
+            sort=sort,
+            fuzzy=fuzzy,
+            facets=requested_facets,
+            count=count,
+            fields=projection and projection.fields,
+            categories=projection is None or projection.categories,
+            rows=True,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    rows = result["items"]
+
+    set_next_cursor(
+        response, rows, limit,
+        key=lambda item: (sort, key(item), item["id"]),
+    )
+    set_total_count(response, result["total"])
+
+    items = [project(item, projection or FULL_PROJECTION) for item in rows]
+
+    if requested_facets:
+        return json_response({
+            "items": items,
+            "facets": ProductFacets.model_validate(result["facets"]),
+            "total": result["total"],
+        }, response)
+    return json_response(items, response)
+
+
+@router.get(
+    "/autocomplete",
+    response_model=List[ProductSuggestion]
+)
+async def autocomplete_products(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=20),
+    service: AsyncProductService = Depends(get_product_service),
+):
+    return await service.autocomplete_products(q, limit)
+
+
+# --------------------
+# Export
+# --------------------
+
+@router.get("/export")
+async def export_products(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    q: Optional[str] = Query(None, min_length=1),
+    category_id: Optional[UUID] = None,
+    category_ids: Optional[List[UUID]] = Query(None),
+    category_match: Literal["any", "all"] = "any",
+    min_price: Optional[Decimal] = Query(None, ge=0),
+    max_price: Optional[Decimal] = Query(None, ge=0),
+    service: AsyncProductService = Depends(get_product_service),
+):
+    try:
+        batches = await service.export_products(
+            keyword=q,
+            category_id=category_id,
+            category_ids=category_ids,
+            category_match=category_match,
+            min_price=min_price,
+            max_price=max_price,
         )
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+    return export_response(batches, format)
+
+
+# --------------------
+# Change Feed
+# --------------------
+
+@router.get(
+    "/changes",
+    response_model=ProductChanges
+)
+async def product_changes(
+    since: Optional[str] = Query(None, min_length=1),
+    limit: int = Query(100, ge=1, le=1000),
+    service: AsyncProductService = Depends(get_product_service),
+):
+    try:
+        after = (
+            decode_sort_cursor(since, "changes", int)
+            if since else None
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid since token")
+
+    changes = await service.list_changes(after, limit)
+    last = changes.pop("last")
+
+    return {
+        **changes,
+        "next_token": (
+            encode_cursor("changes", last[0], last[1])
+            if last else since
+        ),
+    }
+
+
+# --------------------
+# Batch Get
+# --------------------
+
+def document_batch(keys: List[Any], documents: List[Optional[Dict[str, Any]]]) -> bytes:
+    """
+    The batch-get response body with pre-rendered documents spliced in.
+    """
+    results = []
+
+    for index, (key, row) in enumerate(zip(keys, documents)):
+        entry = dumps({
+            "index": index,
+            "key": str(key),
+            "status": "found" if row is not None else "not_found",
+        })
+        product = row["document"] if row is not None else b"null"
+        results.append(entry[:-1] + b',"product":' + product + b"}")
+
+    found = sum(row is not None for row in documents)
+    envelope = dumps({"found": found, "not_found": len(documents) - found})
+
+    return envelope[:-1] + b',"results":[' + b",".join(results) + b"]}"
+
+
+@router.post(
+    "/batch-get",
+    response_model=ProductBatchResponse
+)
+async def batch_get_products(
+    payload: ProductBatchGet,
+    response: Response,
+    projection: Optional[Projection] = Depends(product_projection),
+    service: AsyncProductService = Depends(get_product_service),
+):
+    if PRODUCT_DOCUMENTS and projection is None:
+        try:
+            documents = await service.batch_get_product_documents(
+                ids=payload.ids, skus=payload.skus
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        keys = payload.ids if payload.ids is not None else payload.skus
+        return raw_json_response(document_batch(keys, documents), response)
+
+    try:
+        rows = await service.batch_get_products(
+            ids=payload.ids,
+            skus=payload.skus,
+            fields=projection and projection.fields,
+            categories=projection is None or projection.categories,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    keys = payload.ids if payload.ids is not None else payload.skus
+    results = [
+        {
+            "index": index,
+            "key": str(key),
+            "status": "found" if item is not None else "not_found",
+            "product": (
+                project(item, projection or FULL_PROJECTION)
+                if item is not None else None
+            ),
+        }
+        for index, (key, item) in enumerate(zip(keys, rows))
+    ]
+    found = sum(item is not None for item in rows)
+
+    return json_response({
+        "found": found,
+        "not_found": len(rows) - found,
+        "results": results,
+    }, response)
+
+
+# --------------------
+# Bulk Upsert
+# --------------------
+
+NDJSON_MEDIA_TYPES = ("application/x-ndjson", "application/ndjson")
+
+
+def validation_message(error: ValidationError) -> str:
+    # Errors about the row itself (e.g. not an object) have an empty loc
+    return "; ".join(
+        f"{'.'.join(str(part) for part in e['loc'])}: {e['msg']}" if e["loc"] else e["msg"]
+        for e in error.errors()
+    )
+
+
+def validate_bulk_items(items: List[Any]) -> List[Any]:
+    """
+    Returns a `ProductCreate` or an error message per decoded item.
+    """
+    rows = []
+    for item in items:
+        if isinstance(item, ValueError):
+            rows.append(str(item))
+            continue
+        try:
+            rows.append(ProductCreate.model_validate(item))
+        except ValidationError as e:
+            rows.append(validation_message(e))
+
+    return rows
+
+
+def parse_bulk_rows(body: bytes) -> List[Any]:
+    """
+    Decode a JSON array body and validate every row.
+    """
+    try:
+        items = json.loads(body)
+    except ValueError:
+        raise ValueError("Body must be a JSON array or NDJSON")
+
+    if not isinstance(items, list):
+        raise ValueError("Body must be a JSON array or NDJSON")
+
+    return validate_bulk_items(items)
+
+
+def parse_ndjson_lines(lines: List[bytes]) -> List[Any]:
+    items = []
+    for line in lines:
+        try:
+            items.append(json.loads(line))
+        except ValueError:
+            items.append(ValueError("Invalid JSON line"))
+
+    return validate_bulk_items(items)
+
+
+async def ndjson_lines(request: Request) -> AsyncIterator[bytes]:
+    # Non-blank lines of the body, as they arrive
+    pending = b""
+    async for chunk in request.stream():
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            if line.strip():
+                yield line
+
+    if pending.strip():
+        yield pending
+
+
+async def upsert_bulk_rows(
+    service: AsyncProductService,
+    parsed: List[Any],
+    offset: int = 0,
+) -> List[Dict[str, Any]]:
+    valid = [
+        (index, row) for index, row in enumerate(parsed)
+        if isinstance(row, ProductCreate)
+    ]
+
+    outcomes = await service.bulk_upsert_products(
+        [row.model_dump() for _, row in valid]
+    )
+
+    results: List[Dict[str, Any]] = [
+        {"index": offset + index, "status": "error", "error": row}
+        for index, row in enumerate(parsed)
+    ]
+    for (index, _), outcome in zip(valid, outcomes):
+        results[index] = {"index": offset + index, **outcome}
+
+    return results
+
+
+@router.post(
+    "/bulk",
+    response_model=ProductBulkResponse
+)
+async def bulk_upsert_products(
+    request: Request,
+    service: AsyncProductService = Depends(get_product_service),
+):
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+
+    if content_type in NDJSON_MEDIA_TYPES:
+        # Read, validated and written BULK_CHUNK_SIZE lines at a time, so
+        # the body is never held whole. A sku repeated across chunks is
+        # written once per chunk, the last one winning
+        results: List[Dict[str, Any]] = []
+        lines: List[bytes] = []
+
+        async for line in ndjson_lines(request):
+            lines.append(line)
+
+            if len(lines) == BULK_CHUNK_SIZE:
+                parsed = await run_in_threadpool(parse_ndjson_lines, lines)
+                results += await upsert_bulk_rows(service, parsed, len(results))
+                lines = []
+
+        if lines:
+            parsed = await run_in_threadpool(parse_ndjson_lines, lines)
+            results += await upsert_bulk_rows(service, parsed, len(results))
+    else:
+        try:
+            parsed = await run_in_threadpool(parse_bulk_rows, await request.body())
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        results = await upsert_bulk_rows(service, parsed)
+
+    statuses = [result["status"] for result in results]
+
+    return {
+        "created": statuses.count("created"),
+        "updated": statuses.count("updated"),
+        "failed": statuses.count("error"),
+        "results": results,
+    }
+
 
 # --------------------
 # Create
@@ -60,12 +494,12 @@ def search_products(
     status_code=status.HTTP_201_CREATED,
     response_model=ProductResponse
 )
-def create_product(
+async def create_product(
     payload: ProductCreate,
-    service: ProductService = Depends(get_product_service),
+    service: AsyncProductService = Depends(get_product_service),
 ):
     try:
-        return service.create_product(
+        return await service.create_product(
             name=payload.name,
             price=payload.price,
             sku=payload.sku,
@@ -84,12 +518,65 @@ def create_product(
     "",
     response_model=List[ProductResponse]
 )
-def list_products(
+async def list_products(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100),
-    service: ProductService = Depends(get_product_service),
+    after: Optional[Tuple[str, UUID]] = Depends(name_cursor),
+    count: Optional[str] = Depends(count_query),
+    projection: Optional[Projection] = Depends(product_projection),
+    service: AsyncProductService = Depends(get_product_service),
 ):
-    return service.list_products(skip, limit)
+    total = await service.count_products(count) if count else None
+    # The total is part of the response, so it is part of the ETag too
+    counted = [("total", total)] if count else []
+
+    if has_preconditions(request, collection=True):
+        versions = await service.list_product_versions(skip, limit, after=after)
+        etag, last_modified = collection_validators(
+            projected_versions(versions, projection) + counted
+        )
+        if is_not_modified(request, etag, last_modified):
+            return not_modified(etag, last_modified)
+
+    if PRODUCT_DOCUMENTS and projection is None:
+        documents = await service.list_product_documents(skip, limit, after=after)
+
+        set_validators(
+            response,
+            *collection_validators([document_version(row) for row in documents] + counted),
+        )
+        set_next_cursor(
+            response, documents, limit, key=lambda row: (row["name"], row["id"])
+        )
+        set_total_count(response, total)
+
+        return raw_json_response(
+            b"[" + b",".join(row["document"] for row in documents) + b"]", response
+        )
+
+    rows = await service.list_products(
+        skip, limit,
+        after=after,
+        fields=projection and projection.fields,
+        categories=projection is None or projection.categories,
+        rows=True,
+    )
+
+    versions = [product_version(item, projection) for item in rows]
+    set_validators(
+        response,
+        *collection_validators(projected_versions(versions, projection) + counted),
+    )
+    set_next_cursor(
+        response, rows, limit, key=lambda item: (item["name"], item["id"])
+    )
+    set_total_count(response, total)
+
+    return json_response(
+        [project(item, projection or FULL_PROJECTION) for item in rows], response
+    )
 
 
 # --------------------
@@ -100,16 +587,44 @@ def list_products(
     "/{product_id}",
     response_model=ProductResponse
 )
-def get_product(
+async def get_product(
     product_id: UUID,
-    service: ProductService = Depends(get_product_service),
+    request: Request,
+    response: Response,
+    projection: Optional[Projection] = Depends(product_projection),
+    service: AsyncProductService = Depends(get_product_service),
 ):
-    product = service.get_product(product_id)
+    # Answer conditional requests from the version row alone
+    if has_preconditions(request):
+        version = await service.get_product_version(product_id)
+
+        if version is not None:
+            etag, last_modified = validators(projected_versions([version], projection))
+            if is_not_modified(request, etag, last_modified):
+                return not_modified(etag, last_modified)
+
+    if PRODUCT_DOCUMENTS and projection is None:
+        document = await service.get_product_document(product_id)
+
+        # Missing products take the regular path to their 404
+        if document is not None:
+            set_validators(response, *validators([document_version(document)]))
+            return raw_json_response(document["document"], response)
+
+    # Single products come whole from the cache; the projection only
+    # trims the response
+    product = await service.get_product(product_id)
 
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
 
-    return product
+    item = ProductResponse.model_validate(product).model_dump()
+
+    set_validators(
+        response,
+        *validators(projected_versions([product_version(item, projection)], projection)),
+    )
+    return json_response(project(item, projection or FULL_PROJECTION), response)
 
 
 # --------------------
@@ -120,13 +635,13 @@ def get_product(
     "/{product_id}",
     response_model=ProductResponse
 )
-def update_product(
+async def update_product(
     product_id: UUID,
     payload: ProductUpdate,
-    service: ProductService = Depends(get_product_service),
+    service: AsyncProductService = Depends(get_product_service),
 ):
     try:
-        product = service.update_product(
+        product = await service.update_product(
             product_id,
             name=payload.name,
             price=payload.price,
@@ -143,6 +658,34 @@ def update_product(
     return product
 
 
+# --------------------
+# Bulk Price Update
+# --------------------
+
+@router.patch(
+    "/prices",
+    response_model=ProductPricesResponse
+)
+async def update_prices(
+    payload: List[ProductPriceUpdate],
+    service: AsyncProductService = Depends(get_product_service),
+):
+    try:
+        results = await service.update_prices(
+            [item.model_dump() for item in payload]
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    statuses = [result["status"] for result in results]
+
+    return {
+        "updated": statuses.count("updated"),
+        "not_found": statuses.count("not_found"),
+        "results": results,
+    }
+
+
 # --------------------
 # Delete
 # --------------------
@@ -151,13 +694,35 @@ def update_product(
     "/{product_id}",
     status_code=status.HTTP_204_NO_CONTENT
 )
-def delete_product(
+async def delete_product(
     product_id: UUID,
-    service: ProductService = Depends(get_product_service),
+    service: AsyncProductService = Depends(get_product_service),
 ):
-    deleted = service.delete_product(product_id)
+    deleted = await service.delete_product(product_id)
 
     if not deleted:
         raise HTTPException(status_code=404, detail="Product not found")
 
     return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@router.delete(
+    "",
+    response_model=ProductBulkDeleteResponse
+)
+async def delete_products(
+    ids: Optional[List[UUID]] = Query(None, description="Product IDs (repeat the parameter)"),
+    service: AsyncProductService = Depends(get_product_service),
+):
+    try:
+        deleted = await service.delete_products(ids or [])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Compare as strings: asyncpg returns its own UUID type
+    existed = {str(id) for id in deleted}
+
+    return {
+        "deleted": [id for id in dict.fromkeys(ids) if str(id) in existed],
+        "not_found": [id for id in dict.fromkeys(ids) if str(id) not in existed],
+    }
@@ -0,0 +1,32 @@
+from typing import Any
+
+from fastapi import Response
+from starlette.responses import JSONResponse
+
+from app.rendering import dumps
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON rendered by orjson. UUIDs and datetimes are encoded natively,
+    Decimals as strings.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def json_response(content: Any, response: Response) -> FastJSONResponse:
+    """
+    Render plain `content` directly, bypassing the route's response_model
+    but keeping the headers already set on `response`.
+    """
+    return FastJSONResponse(content, headers=dict(response.headers))
+
+
+def raw_json_response(body: bytes, response: Response) -> Response:
+    """
+    Send JSON that is already encoded (pre-rendered documents), keeping
+    the headers already set on `response`.
+    """
+    return Response(body, media_type="application/json", headers=dict(response.headers))
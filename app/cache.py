@@ -0,0 +1,193 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional, Set, Tuple
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from app.config import CACHE_ENABLED, CACHE_MAX_ENTRIES, CACHE_TTL
+from app.models.category import Category
+from app.models.product import Product
+from app.models.product_category import product_categories
+
+
+MISSING = object()
+
+
+class LRUCache:
+    """
+    Bounded, thread-safe LRU cache whose entries expire after `ttl` seconds.
+
+    Every invalidation bumps a generation counter. `lookup` hands out the
+    current generation and `store` drops the value if an invalidation
+    happened in between, so a read that raced a commit cannot put the
+    pre-commit state back into the cache.
+    """
+
+    def __init__(self, max_entries: int, ttl: float, enabled: bool = True):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.enabled = enabled and max_entries > 0
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._generation = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def lookup(self, key: Hashable) -> Tuple[Any, int]:
+        """
+        Return `(value, generation)`; value is `MISSING` on a miss.
+        """
+        if not self.enabled:
+            return MISSING, 0
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is not None and entry[0] < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return MISSING, self._generation
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1], self._generation
+
+    def store(self, key: Hashable, value: Any, generation: int) -> None:
+        if not self.enabled:
+            return
+
+        with self._lock:
+            if generation != self._generation:
+                return
+
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, keys: Optional[Iterable[Hashable]] = None) -> None:
+        """
+        Drop `keys`, or every entry when `keys` is None.
+        """
+        with self._lock:
+            self._generation += 1
+            self.invalidations += 1
+
+            if keys is None:
+                self._entries.clear()
+                return
+
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+product_cache = LRUCache(CACHE_MAX_ENTRIES, CACHE_TTL, CACHE_ENABLED)
+category_cache = LRUCache(CACHE_MAX_ENTRIES, CACHE_TTL, CACHE_ENABLED)
+
+CACHES = {
+    "products": product_cache,
+    "categories": category_cache,
+}
+
+
+# --------------------
+# Commit-driven invalidation
+# --------------------
+
+# session.info key: cache name -> set of written IDs, or None for "all"
+_STALE = "stale_cache_keys"
+
+
+def mark_stale(session: Session, cache: str, ids: Optional[Iterable[Any]] = None) -> None:
+    """
+    Record that `ids` (or everything, when None) in `cache` were written
+    in this session's transaction. Applied by `invalidate_committed`.
+    """
+    stale: Dict[str, Optional[Set[Any]]] = session.info.setdefault(_STALE, {})
+
+    if ids is None or stale.get(cache, set()) is None:
+        stale[cache] = None
+    else:
+        stale.setdefault(cache, set()).update(ids)
+
+
+@event.listens_for(Session, "after_flush")
+def _track_flushed_writes(session: Session, flush_context) -> None:
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(instance, Product):
+            mark_stale(session, "products", [instance.id])
+        elif isinstance(instance, Category):
+            # Linking products dirties their categories through the
+            # backref; only the categories' own columns are cached
+            if (
+                instance in session.dirty
+                and not session.is_modified(instance, include_collections=False)
+            ):
+                continue
+
+            mark_stale(session, "categories", [instance.id])
+
+
+@event.listens_for(Session, "before_flush")
+def _track_category_edits(session: Session, flush_context, instances) -> None:
+    # Cached products embed their categories. Category updates and deletes
+    # are Core statements marking exactly the linked products; this only
+    # catches ORM edits, before the flush drops a deleted one's links
+    edited = [
+        instance.id
+        for instance in (*session.dirty, *session.deleted)
+        if isinstance(instance, Category)
+        and (
+            instance in session.deleted
+            or session.is_modified(instance, include_collections=False)
+        )
+    ]
+
+    if edited:
+        with session.no_autoflush:
+            mark_stale(session, "products", session.execute(
+                select(product_categories.c.product_id)
+                .where(product_categories.c.category_id.in_(edited))
+            ).scalars())
+
+
+def pending_invalidations(session: Session) -> Dict[str, Optional[Set[Any]]]:
+    return session.info.get(_STALE, {})
+
+
+def invalidate_committed(session: Session) -> None:
+    for cache, ids in session.info.pop(_STALE, {}).items():
+        CACHES[cache].invalidate(ids)
+
+
+def discard_stale(session: Session) -> None:
+    session.info.pop(_STALE, None)
@@ -0,0 +1,259 @@
+import logging
+
+from sqlalchemy import text
+
+from app.config import CATEGORY_STATS_WALK_THRESHOLD
+
+
+logger = logging.getLogger(__name__)
+
+
+# Serialises installs across workers starting together
+INSTALL_LOCK = "category_stats"
+
+# Aggregating a category reads all of its products; walking
+# idx_products_price from the cheap / dear end stops at the first product in
+# the category, after about products / category size probes, but reads far
+# more when the category is small or sits at the other end of the price
+# range. product_count picks between them.
+CATEGORY_PRICE_BOUND = """
+    CREATE OR REPLACE FUNCTION category_price_bound(
+        category UUID, lowest BOOLEAN, skip_product UUID DEFAULT NULL
+    ) RETURNS NUMERIC LANGUAGE plpgsql STABLE AS $$
+    BEGIN
+        IF coalesce(
+            (SELECT product_count FROM category_stats WHERE category_id = category), 0
+        ) < {walk_threshold} THEN
+            RETURN (
+                SELECT CASE WHEN lowest THEN min(p.price) ELSE max(p.price) END
+                FROM product_categories pc
+                JOIN products p ON p.id = pc.product_id
+                WHERE pc.category_id = category
+                  AND p.id IS DISTINCT FROM skip_product
+            );
+        ELSIF lowest THEN
+            RETURN (
+                SELECT p.price FROM products p
+                WHERE EXISTS (
+                    SELECT 1 FROM product_categories pc
+                    WHERE pc.product_id = p.id AND pc.category_id = category
+                )
+                AND p.id IS DISTINCT FROM skip_product
+                ORDER BY p.price LIMIT 1
+            );
+        END IF;
+        RETURN (
+            SELECT p.price FROM products p
+            WHERE EXISTS (
+                SELECT 1 FROM product_categories pc
+                WHERE pc.product_id = p.id AND pc.category_id = category
+            )
+            AND p.id IS DISTINCT FROM skip_product
+            ORDER BY p.price DESC LIMIT 1
+        );
+    END
+    $$
+"""
+
+# Statement-level triggers aggregate a whole statement's rows per category
+# (one bulk INSERT of links updates each category once). A product delete is
+# counted by a row-level BEFORE trigger on products, while its links and
+# price still exist; by the time ON DELETE CASCADE removes the links the
+# product is gone, so the link trigger skips them. Min / max are only
+# looked up again when the removed or repriced product held one of them.
+# Each function locks its category_stats rows in category_id order before
+# updating them (the UPDATEs would lock them in plan order), so concurrent
+# writes touching the same categories queue instead of deadlocking.
+CATEGORY_STATS_FUNCTIONS = (
+    CATEGORY_PRICE_BOUND.format(walk_threshold=CATEGORY_STATS_WALK_THRESHOLD),
+    """
+    CREATE OR REPLACE FUNCTION category_stats_links_added() RETURNS TRIGGER
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        INSERT INTO category_stats AS s
+            (category_id, product_count, price_sum, min_price, max_price, updated_at)
+        SELECT a.category_id, count(*), sum(p.price), min(p.price), max(p.price), timezone('UTC', now())
+        FROM added_links a
+        JOIN products p ON p.id = a.product_id
+        GROUP BY a.category_id
+        ORDER BY a.category_id
+        ON CONFLICT (category_id) DO UPDATE SET
+            product_count = s.product_count + excluded.product_count,
+            price_sum = s.price_sum + excluded.price_sum,
+            min_price = LEAST(s.min_price, excluded.min_price),
+            max_price = GREATEST(s.max_price, excluded.max_price),
+            updated_at = excluded.updated_at;
+        RETURN NULL;
+    END
+    $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION category_stats_links_removed() RETURNS TRIGGER
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        PERFORM 1 FROM category_stats
+        WHERE category_id IN (
+            SELECT l.category_id FROM removed_links l
+            JOIN products p ON p.id = l.product_id
+        )
+        ORDER BY category_id
+        FOR UPDATE;
+
+        UPDATE category_stats s SET
+            product_count = s.product_count - r.removed,
+            price_sum = s.price_sum - r.total,
+            min_price = CASE WHEN r.lowest > s.min_price THEN s.min_price
+                ELSE category_price_bound(s.category_id, TRUE) END,
+            max_price = CASE WHEN r.highest < s.max_price THEN s.max_price
+                ELSE category_price_bound(s.category_id, FALSE) END,
+            updated_at = timezone('UTC', now())
+        FROM (
+            SELECT l.category_id, count(*) AS removed, sum(p.price) AS total,
+                   min(p.price) AS lowest, max(p.price) AS highest
+            FROM removed_links l
+            JOIN products p ON p.id = l.product_id
+            GROUP BY l.category_id
+        ) r
+        WHERE s.category_id = r.category_id;
+        RETURN NULL;
+    END
+    $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION category_stats_product_deleted() RETURNS TRIGGER
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        PERFORM 1 FROM category_stats
+        WHERE category_id IN (
+            SELECT category_id FROM product_categories WHERE product_id = OLD.id
+        )
+        ORDER BY category_id
+        FOR UPDATE;
+
+        UPDATE category_stats s SET
+            product_count = s.product_count - 1,
+            price_sum = s.price_sum - OLD.price,
+            min_price = CASE WHEN OLD.price > s.min_price THEN s.min_price
+                ELSE category_price_bound(s.category_id, TRUE, OLD.id) END,
+            max_price = CASE WHEN OLD.price < s.max_price THEN s.max_price
+                ELSE category_price_bound(s.category_id, FALSE, OLD.id) END,
+            updated_at = timezone('UTC', now())
+        FROM product_categories pc
+        WHERE pc.product_id = OLD.id
+          AND s.category_id = pc.category_id;
+        RETURN OLD;
+    END
+    $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION category_stats_prices_changed() RETURNS TRIGGER
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        PERFORM 1 FROM category_stats
+        WHERE category_id IN (
+            SELECT pc.category_id FROM new_products n
+            JOIN old_products o ON o.id = n.id AND o.price <> n.price
+            JOIN product_categories pc ON pc.product_id = n.id
+        )
+        ORDER BY category_id
+        FOR UPDATE;
+
+        UPDATE category_stats s SET
+            price_sum = s.price_sum + d.delta,
+            min_price = CASE WHEN d.old_lowest > s.min_price
+                THEN LEAST(s.min_price, d.new_lowest)
+                ELSE category_price_bound(s.category_id, TRUE) END,
+            max_price = CASE WHEN d.old_highest < s.max_price
+                THEN GREATEST(s.max_price, d.new_highest)
+                ELSE category_price_bound(s.category_id, FALSE) END,
+            updated_at = timezone('UTC', now())
+        FROM (
+            SELECT pc.category_id, sum(n.price - o.price) AS delta,
+                   min(o.price) AS old_lowest, max(o.price) AS old_highest,
+                   min(n.price) AS new_lowest, max(n.price) AS new_highest
+            FROM new_products n
+            JOIN old_products o ON o.id = n.id AND o.price <> n.price
+            JOIN product_categories pc ON pc.product_id = n.id
+            GROUP BY pc.category_id
+        ) d
+        WHERE s.category_id = d.category_id;
+        RETURN NULL;
+    END
+    $$
+    """,
+)
+
+CATEGORY_STATS_TRIGGERS = {
+    ("trg_product_categories_stats_insert", "product_categories"): (
+        "AFTER INSERT ON product_categories REFERENCING NEW TABLE AS added_links "
+        "FOR EACH STATEMENT EXECUTE FUNCTION category_stats_links_added()"
+    ),
+    ("trg_product_categories_stats_delete", "product_categories"): (
+        "AFTER DELETE ON product_categories REFERENCING OLD TABLE AS removed_links "
+        "FOR EACH STATEMENT EXECUTE FUNCTION category_stats_links_removed()"
+    ),
+    ("trg_products_stats_delete", "products"): (
+        "BEFORE DELETE ON products "
+        "FOR EACH ROW EXECUTE FUNCTION category_stats_product_deleted()"
+    ),
+    # Transition tables rule out UPDATE OF price; unchanged prices are
+    # filtered in the function
+    ("trg_products_stats_price", "products"): (
+        "AFTER UPDATE ON products "
+        "REFERENCING OLD TABLE AS old_products NEW TABLE AS new_products "
+        "FOR EACH STATEMENT EXECUTE FUNCTION category_stats_prices_changed()"
+    ),
+}
+
+# Rebuilds every row from the links; runs when the triggers are installed
+CATEGORY_STATS_REBUILD = (
+    "DELETE FROM category_stats",
+    """
+    INSERT INTO category_stats
+        (category_id, product_count, price_sum, min_price, max_price, updated_at)
+    SELECT pc.category_id, count(*), sum(p.price), min(p.price), max(p.price), timezone('UTC', now())
+    FROM product_categories pc
+    JOIN products p ON p.id = pc.product_id
+    GROUP BY pc.category_id
+    """,
+)
+
+
+def install_category_stats(bind) -> bool:
+    """
+    Create or update the functions behind category_stats and, when any of
+    its triggers is missing (first start, tables re-created), (re)create
+    them and rebuild the table. The trigger DDL locks products and
+    product_categories against writes until the rebuild commits. Called
+    from the lifespan after create_all; returns whether it rebuilt.
+    """
+    with bind.begin() as connection:
+        connection.execute(
+            text("SELECT pg_advisory_xact_lock(hashtext(:lock))"),
+            {"lock": INSTALL_LOCK},
+        )
+
+        for statement in CATEGORY_STATS_FUNCTIONS:
+            connection.execute(text(statement))
+
+        installed = connection.execute(
+            text(
+                "SELECT count(*) FROM pg_trigger "
+                "WHERE tgname = ANY(:names) "
+                "AND tgrelid IN ('products'::regclass, 'product_categories'::regclass)"
+            ),
+            {"names": [name for name, _ in CATEGORY_STATS_TRIGGERS]},
+        ).scalar()
+
+        if installed == len(CATEGORY_STATS_TRIGGERS):
+            return False
+
+        for (name, table), definition in CATEGORY_STATS_TRIGGERS.items():
+            connection.execute(text(f"DROP TRIGGER IF EXISTS {name} ON {table}"))
+            connection.execute(text(f"CREATE TRIGGER {name} {definition}"))
+
+        for statement in CATEGORY_STATS_REBUILD:
+            connection.execute(text(statement))
+
+    logger.info("category_stats triggers installed, table rebuilt")
+    return True
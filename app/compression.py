@@ -0,0 +1,265 @@
+import zlib
+from typing import Callable, Dict, Optional, Sequence
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import (
+    COMPRESSION_BROTLI_QUALITY,
+    COMPRESSION_ENCODINGS,
+    COMPRESSION_GZIP_LEVEL,
+    COMPRESSION_MIN_SIZE,
+    COMPRESSION_ZSTD_LEVEL,
+)
+
+try:
+    import brotli
+except ImportError:  # optional: pip install brotli
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional: pip install zstandard
+    zstandard = None
+
+
+# --------------------
+# Encoders
+# --------------------
+
+class GzipEncoder:
+
+    def __init__(self, level: int = COMPRESSION_GZIP_LEVEL):
+        # wbits 16 + MAX_WBITS writes a gzip header and trailer
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        # Emit everything compressed so far without ending the stream
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class BrotliEncoder:
+
+    def __init__(self, quality: int = COMPRESSION_BROTLI_QUALITY):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class ZstdEncoder:
+
+    def __init__(self, level: int = COMPRESSION_ZSTD_LEVEL):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+def available_encoders() -> Dict[str, Callable]:
+    """
+    Content codings this process can produce, keyed by name, in the
+    preference order of COMPRESSION_ENCODINGS.
+    """
+    installed = {
+        "gzip": GzipEncoder,
+        "br": BrotliEncoder if brotli is not None else None,
+        "zstd": ZstdEncoder if zstandard is not None else None,
+    }
+    return {
+        name: installed[name]
+        for name in COMPRESSION_ENCODINGS
+        if installed.get(name) is not None
+    }
+
+
+def negotiate(accept_encoding: str, available: Sequence[str]) -> Optional[str]:
+    """
+    Pick the coding from `available` (in server preference order) with the
+    highest q-value in an Accept-Encoding header, or None.
+    """
+    qualities: Dict[str, float] = {}
+
+    for part in accept_encoding.split(","):
+        name, _, parameters = part.partition(";")
+        name = name.strip().lower()
+
+        if not name:
+            continue
+
+        quality = 1.0
+        for parameter in parameters.split(";"):
+            key, _, value = parameter.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+
+        qualities[name] = quality
+
+    wildcard = qualities.get("*", 0.0)
+    best, best_quality = None, 0.0
+
+    for name in available:
+        quality = qualities.get(name, wildcard)
+        if quality > best_quality:
+            best, best_quality = name, quality
+
+    return best
+
+
+# --------------------
+# Middleware
+# --------------------
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "application/ndjson",
+    "application/xml",
+    "application/javascript",
+)
+
+
+def is_compressible(headers: Headers) -> bool:
+    if "content-encoding" in headers:
+        return False
+
+    content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+
+    return (
+        content_type.startswith("text/")
+        or content_type.endswith("+json")
+        or content_type in COMPRESSIBLE_TYPES
+    )
+
+
+class CompressionMiddleware:
+    """
+    Compress responses with the best coding the client accepts.
+
+    Whole bodies below `minimum_size` are sent as is. Streaming responses
+    (several body messages, like the export) are compressed chunk by chunk
+    and flushed after each one, so nothing is buffered beyond a chunk.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = COMPRESSION_MIN_SIZE,
+        encoders: Optional[Dict[str, Callable]] = None,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.encoders = available_encoders() if encoders is None else encoders
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = Headers(scope=scope).get("accept-encoding", "")
+        encoding = negotiate(accept_encoding, list(self.encoders))
+
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressingResponder(
+            send, encoding, self.encoders[encoding], self.minimum_size
+        )
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressingResponder:
+
+    def __init__(self, send: Send, encoding: str, encoder: Callable, minimum_size: int):
+        self._send = send
+        self.encoding = encoding
+        self.encoder_factory = encoder
+        self.minimum_size = minimum_size
+
+        self.start: Optional[Message] = None
+        self.encoder = None
+        self.passthrough = False
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            # Held back until the first body chunk shows whether to compress
+            self.start = message
+            return
+
+        if message["type"] != "http.response.body":
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.start is not None:
+            await self._begin(body, more_body)
+            return
+
+        if self.passthrough:
+            await self._send(message)
+            return
+
+        data = self.encoder.compress(body)
+        data += self.encoder.flush() if more_body else self.encoder.finish()
+        await self._send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+    async def _begin(self, body: bytes, more_body: bool) -> None:
+        start, self.start = self.start, None
+        headers = MutableHeaders(raw=start["headers"])
+
+        if (
+            start["status"] in (204, 304)
+            or not is_compressible(headers)
+            or (not more_body and len(body) < self.minimum_size)
+        ):
+            self.passthrough = True
+            await self._send(start)
+            await self._send({"type": "http.response.body", "body": body, "more_body": more_body})
+            return
+
+        self.encoder = self.encoder_factory()
+        data = self.encoder.compress(body)
+
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+
+        # The compressed bytes are a different representation: keep the
+        # ETag but make it weak (If-None-Match compares weakly)
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = f"W/{etag}"
+
+        if more_body:
+            data += self.encoder.flush()
+            if "content-length" in headers:
+                del headers["Content-Length"]
+        else:
+            data += self.encoder.finish()
+            headers["Content-Length"] = str(len(data))
+
+        await self._send(start)
+        await self._send({"type": "http.response.body", "body": data, "more_body": more_body})
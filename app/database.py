@@ -1,12 +1,70 @@
-from sqlalchemy import create_engine
+import logging
+from typing import Any, Dict
+from uuid import uuid4
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+
+from app.config import (
+    DATABASE_URL,
+    ASYNC_DATABASE_URL,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE,
+    DB_POOL_PRE_PING,
+    DB_PGBOUNCER,
+)
+from app.metrics import PoolMetrics, instrumented_pool
+
+
+logger = logging.getLogger(__name__)
+
+sync_pool_metrics = PoolMetrics()
+async_pool_metrics = PoolMetrics()
+
+
+def _engine_options(url: str, metrics: PoolMetrics, pool_class) -> Dict[str, Any]:
+    driver = make_url(url).get_driver_name()
+
+    if DB_PGBOUNCER:
+        # pgbouncer owns the pooling; server-side prepared statements do not
+        # survive transaction pooling, so disable them per driver.
+        connect_args: Dict[str, Any] = {}
+
+        if driver == "psycopg":
+            connect_args["prepare_threshold"] = None
+        elif driver == "asyncpg":
+            connect_args.update(
+                statement_cache_size=0,
+                prepared_statement_cache_size=0,
+                prepared_statement_name_func=lambda: f"__asyncpg_{uuid4()}__",
+            )
+
+        return {
+            "poolclass": instrumented_pool(NullPool, metrics),
+            "connect_args": connect_args,
+        }
+
+    return {
+        "poolclass": instrumented_pool(pool_class, metrics),
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
 
-from app.config import DATABASE_URL
 
 engine = create_engine(
     DATABASE_URL,
     echo=False,
     future=True,
+    **_engine_options(DATABASE_URL, sync_pool_metrics, QueuePool),
 )
 
 # Session factory
@@ -17,9 +75,103 @@ SessionLocal = sessionmaker(
     expire_on_commit=False,
 )
 
+# Async engine / session factory used by the async request path
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    echo=False,
+    **_engine_options(ASYNC_DATABASE_URL, async_pool_metrics, AsyncAdaptedQueuePool),
+)
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
 Base = declarative_base()
 
 
+class DatabaseFeatures:
+    """
+    Optional server features, detected once at startup.
+    """
+    trigram: bool = False
+
+
+features = DatabaseFeatures()
+
+# pg_trgm is a contrib extension that may be missing or need a superuser,
+# so it is set up outside create_all and search degrades without it.
+TRIGRAM_EXTENSION = "CREATE EXTENSION IF NOT EXISTS pg_trgm"
+
+TRIGRAM_INDEXES = {
+    "idx_products_name_trgm": "ON products USING GIN (name gin_trgm_ops)",
+    "idx_products_sku_trgm": "ON products USING GIN (sku gin_trgm_ops)",
+}
+
+# Held by the worker building the trigram indexes
+TRIGRAM_INDEX_LOCK = "trigram_indexes"
+
+
+def enable_trigram_search(bind) -> bool:
+    try:
+        with bind.begin() as connection:
+            connection.execute(text(TRIGRAM_EXTENSION))
+    except DBAPIError as exc:
+        logger.warning("pg_trgm unavailable, fuzzy search uses ILIKE only: %s", exc.orig)
+        return False
+
+    build_trigram_indexes(bind)
+    return True
+
+
+def build_trigram_indexes(bind) -> None:
+    """
+    Create the trigram indexes that are missing, or left invalid by an
+    interrupted build, with CREATE INDEX CONCURRENTLY so a large products
+    table stays writable meanwhile. That cannot run inside a transaction,
+    hence the autocommit connection. The first worker to take the advisory
+    lock builds them, the others skip it (search works unindexed until
+    then).
+    """
+    with bind.connect() as connection:
+        connection.execution_options(isolation_level="AUTOCOMMIT")
+
+        locked = connection.execute(
+            text("SELECT pg_try_advisory_lock(hashtext(:lock))"),
+            {"lock": TRIGRAM_INDEX_LOCK},
+        ).scalar()
+
+        if not locked:
+            return
+
+        try:
+            valid = dict(connection.execute(
+                text(
+                    "SELECT c.relname, i.indisvalid FROM pg_index i "
+                    "JOIN pg_class c ON c.oid = i.indexrelid "
+                    "WHERE i.indrelid = 'products'::regclass AND c.relname = ANY(:names)"
+                ),
+                {"names": list(TRIGRAM_INDEXES)},
+            ).all())
+
+            for name, definition in TRIGRAM_INDEXES.items():
+                if valid.get(name):
+                    continue
+
+                if name in valid:
+                    connection.execute(text(f"DROP INDEX CONCURRENTLY {name}"))
+
+                connection.execute(text(f"CREATE INDEX CONCURRENTLY {name} {definition}"))
+                logger.info("Trigram index %s built", name)
+        except DBAPIError as exc:
+            logger.warning("Trigram index build failed, search runs unindexed: %s", exc.orig)
+        finally:
+            connection.execute(
+                text("SELECT pg_advisory_unlock(hashtext(:lock))"),
+                {"lock": TRIGRAM_INDEX_LOCK},
+            )
+
 
 def get_db():
     db = SessionLocal()
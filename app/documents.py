@@ -0,0 +1,144 @@
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.cache import pending_invalidations
+from app.config import PRODUCT_DOCUMENTS
+from app.rendering import FULL_PROJECTION, dumps, project
+from app.repositories.product_repository import ProductRepository
+
+
+# Products rendered per query / INSERT (and per backfill transaction)
+DOCUMENT_CHUNK_SIZE = 1000
+
+# Held by the worker running the backfill
+BACKFILL_LOCK = "product_documents_backfill"
+
+
+def render_document(item: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    The document of a full product dict (see ProductRepository.get_all_rows):
+    its GET /products/{id} body, byte for byte, the version columns its
+    ETag is computed from, and name / sku for cursors and batch keys.
+    """
+    return {
+        "id": item["id"],
+        "name": item["name"],
+        "sku": item["sku"],
+        "updated_at": item["updated_at"],
+        "categories_updated_at": max(
+            (category["updated_at"] for category in item["categories"]),
+            default=None,
+        ),
+        "category_count": len(item["categories"]),
+        "document": dumps(project(item, FULL_PROJECTION)),
+    }
+
+
+def with_rendered(
+    rows: List[Dict[str, Any]],
+    products: List[Dict[str, Any]],
+) -> List[Dict[str, Any]]:
+    """
+    `rows` from the ProductRepository document reads, with those lacking
+    an up-to-date document replaced by one rendered on the fly from their
+    full product dicts (`products`, see `missing_documents`). Not saved:
+    the writer's or the next backfill's job.
+    """
+    rendered = {item["id"]: render_document(item) for item in products}
+
+    return [
+        rendered.get(row["id"], row) if row["document"] is None else row
+        for row in rows
+    ]
+
+
+def missing_documents(rows: List[Dict[str, Any]]) -> List[Any]:
+    return [row["id"] for row in rows if row["document"] is None]
+
+
+def document_version(row: Dict[str, Any]) -> Tuple[Any, ...]:
+    # Same shape as ProductRepository.get_version
+    return (
+        row["id"],
+        row["updated_at"],
+        row["categories_updated_at"],
+        row["category_count"],
+    )
+
+
+def _render(repository: ProductRepository, ids: List[Any]) -> None:
+    # ID order, like the backfill, so overlapping renders lock rows alike
+    ids = sorted(ids)
+
+    for start in range(0, len(ids), DOCUMENT_CHUNK_SIZE):
+        rows = repository.get_many_rows(ids[start:start + DOCUMENT_CHUNK_SIZE])
+        repository.save_documents([render_document(row) for row in rows])
+
+
+def refresh_documents(session: Session) -> None:
+    """
+    Flush and re-render the documents of every product this transaction
+    wrote (the IDs marked stale for the products cache), so they commit
+    together; all of them are dropped instead when the whole cache was
+    marked stale. Deleted products lose theirs via ON DELETE CASCADE. Called
+    by the Units of Work right before committing.
+    """
+    if not PRODUCT_DOCUMENTS:
+        return
+
+    session.flush()
+    stale = pending_invalidations(session)
+
+    if "products" not in stale:
+        return
+
+    repository = ProductRepository(session)
+
+    if stale["products"] is None:
+        # Never re-render the catalog on a request's commit: drop the
+        # documents and leave them to on-the-fly reads and the backfill
+        repository.drop_documents()
+    else:
+        _render(repository, list(stale["products"]))
+
+
+def backfill_documents(bind) -> int:
+    """
+    Render documents for products that have none or an outdated one, e.g.
+    when (re-)enabling PRODUCT_DOCUMENTS on an existing catalog. Called
+    from every worker's lifespan: the first one to take the advisory lock
+    does the work, the others skip it (reads fall back to the regular
+    path for products still missing a document). Commits per chunk.
+    """
+    with bind.connect() as connection:
+        locked = connection.execute(
+            text("SELECT pg_try_advisory_lock(hashtext(:lock))"),
+            {"lock": BACKFILL_LOCK},
+        ).scalar()
+        connection.commit()
+
+        if not locked:
+            return 0
+
+        try:
+            with Session(bind=connection) as session:
+                repository = ProductRepository(session)
+                ids = repository.outdated_document_ids()
+                session.commit()
+
+                for start in range(0, len(ids), DOCUMENT_CHUNK_SIZE):
+                    chunk = ids[start:start + DOCUMENT_CHUNK_SIZE]
+                    repository.lock_for_render(chunk)
+                    _render(repository, chunk)
+                    session.commit()
+        finally:
+            connection.rollback()
+            connection.execute(
+                text("SELECT pg_advisory_unlock(hashtext(:lock))"),
+                {"lock": BACKFILL_LOCK},
+            )
+            connection.commit()
+
+    return len(ids)
@@ -1,23 +1,45 @@
-from contextlib import asynccontextmanager
+import asyncio
+from contextlib import asynccontextmanager, suppress
 
 from fastapi import FastAPI, Request
+from fastapi.encoders import jsonable_encoder
 from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
 
 from app.api.product_routes import router as product_router
 from app.api.category_routes import router as category_router
 from app.api.health import router as health_router
-from app.config import APP_NAME
+from app.category_stats import install_category_stats
+from app.compression import CompressionMiddleware
+from app.config import APP_NAME, CACHE_NOTIFY, COMPRESSION_ENABLED, PRODUCT_DOCUMENTS
 
-from app.database import Base, engine
+from app.database import Base, engine, async_engine, enable_trigram_search, features
+from app.documents import backfill_documents
+from app.notifications import listen_for_changes
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Create database tables (for demo / assignment purposes)
     Base.metadata.create_all(bind=engine)
+    features.trigram = enable_trigram_search(engine)
+    install_category_stats(engine)
+
+    if PRODUCT_DOCUMENTS:
+        backfill_documents(engine)
+
+    # Evict entries written by other workers from the local caches
+    listener = asyncio.create_task(listen_for_changes()) if CACHE_NOTIFY else None
+
     yield
 
+    if listener is not None:
+        listener.cancel()
+        with suppress(asyncio.CancelledError):
+            await listener
+
+    await async_engine.dispose()
+
 
 app = FastAPI(
     title=APP_NAME,
@@ -26,6 +48,10 @@ app = FastAPI(
 )
 
 
+if COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
+
+
 app.include_router(product_router)
 app.include_router(category_router)
 app.include_router(health_router)
@@ -37,7 +63,8 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
         status_code=400,
         content={
             "error": "Validation Error",
-            "details": exc.errors(),
+            # Error contexts can hold Decimals (e.g. a price's ge=0)
+            "details": jsonable_encoder(exc.errors()),
         },
     )
 
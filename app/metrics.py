@@ -0,0 +1,95 @@
+import threading
+import time
+from typing import Dict, Type
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import Pool, QueuePool
+
+
+class PoolMetrics:
+    """
+    Checkout counters for one connection pool.
+
+    The pool itself already knows its size, checked-out and overflow
+    counts; this adds how long callers waited to get a connection.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.in_use = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record_wait(self, seconds: float, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+                self.in_use += 1
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+    def record_return(self) -> None:
+        with self._lock:
+            self.in_use -= 1
+
+    def snapshot(self, pool: Pool) -> Dict[str, object]:
+        with self._lock:
+            stats: Dict[str, object] = {
+                "pool": type(pool).__name__,
+                "checkouts": self.checkouts,
+                "in_use": self.in_use,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": round(self.wait_seconds_total, 6),
+                "wait_seconds_avg": round(
+                    self.wait_seconds_total / self.checkouts, 6
+                ) if self.checkouts else 0.0,
+                "wait_seconds_max": round(self.wait_seconds_max, 6),
+            }
+
+        if isinstance(pool, QueuePool):
+            stats.update(
+                size=pool.size(),
+                idle=pool.checkedin(),
+                # overflow() counts down from -size while the base pool fills
+                overflow=max(pool.overflow(), 0),
+                max_overflow=pool._max_overflow,
+            )
+
+        return stats
+
+
+def instrumented_pool(pool_class: Type[Pool], metrics: PoolMetrics) -> Type[Pool]:
+    """
+    Subclass `pool_class` so every checkout records its wait time.
+
+    Pools are re-created with their own class on `engine.dispose()`, so the
+    metrics survive a dispose.
+    """
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = pool_class._do_get(self)
+        except PoolTimeoutError:
+            metrics.record_wait(time.perf_counter() - started, timed_out=True)
+            raise
+        metrics.record_wait(time.perf_counter() - started)
+        return connection
+
+    def _do_return_conn(self, record):
+        metrics.record_return()
+        pool_class._do_return_conn(self, record)
+
+    return type(
+        f"Instrumented{pool_class.__name__}",
+        (pool_class,),
+        {
+            "_do_get": _do_get,
+            "_do_return_conn": _do_return_conn,
+            "metrics": metrics,
+        },
+    )
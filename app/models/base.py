@@ -1,17 +1,66 @@
-from sqlalchemy import Column, DateTime, func
+import os
+import time
+import uuid
+
+from sqlalchemy import BigInteger, Column, DateTime, Text, cast, func
 from sqlalchemy.ext.declarative import declared_attr
 
+from app.config import UUID_VERSION
 from app.database import Base
 
 
+def uuid7() -> uuid.UUID:
+    """
+    RFC 9562 version 7 UUID: a 48-bit Unix timestamp in milliseconds, then
+    12 bits of sub-millisecond time (method 3) and 62 random bits, so IDs
+    sort by creation time.
+    """
+    milliseconds, nanoseconds = divmod(time.time_ns(), 1_000_000)
+    fraction = nanoseconds * 4096 // 1_000_000
+    random_bits = int.from_bytes(os.urandom(8), "big") & ((1 << 62) - 1)
+
+    return uuid.UUID(int=(
+        (milliseconds & ((1 << 48) - 1)) << 80
+        | 0x7 << 76
+        | fraction << 64
+        | 0b10 << 62
+        | random_bits
+    ))
+
+
+# Default for primary keys
+new_id = uuid7 if UUID_VERSION == 7 else uuid.uuid4
+
+
+def utc_now():
+    """
+    now() as a timestamp without time zone in UTC, whatever the session's
+    TimeZone. Every timestamp column holds UTC (see app.api.conditional).
+    """
+    return func.timezone("UTC", func.now())
+
+
+def current_xid():
+    """
+    The writing transaction's 64-bit ID (xid8, never wraps) as a bigint.
+    Rows stamped with it can be ordered against pg_current_snapshot():
+    see ProductRepository.changes.
+    """
+    return cast(cast(func.pg_current_xact_id(), Text), BigInteger)
+
+
 class BaseModel(Base):
     __abstract__ = True
 
+    # Fetch server-generated timestamps via RETURNING on flush, so instances
+    # stay fully loaded after the Unit of Work closes the session.
+    __mapper_args__ = {"eager_defaults": True}
+
     @declared_attr
     def created_at(cls):
         return Column(
             DateTime,
-            default=func.now(),
+            default=utc_now(),
             nullable=False
         )
 
@@ -19,7 +68,7 @@ class BaseModel(Base):
     def updated_at(cls):
         return Column(
             DateTime,
-            default=func.now(),
-            onupdate=func.now(),
+            default=utc_now(),
+            onupdate=utc_now(),
             nullable=False
         )
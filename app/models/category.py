@@ -1,20 +1,22 @@
-import uuid
-
-from sqlalchemy import Column, Text
+from sqlalchemy import Column, Index, Text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 
-from app.models.base import BaseModel
+from app.models.base import BaseModel, new_id
 from app.models.product_category import product_categories
 
 
 class Category(BaseModel):
     __tablename__ = "categories"
+    __table_args__ = (
+        # Backs keyset pagination ordered by (name, id)
+        Index("idx_categories_name_id", "name", "id"),
+    )
 
     id = Column(
         UUID(as_uuid=True),
         primary_key=True,
-        default=uuid.uuid4
+        default=new_id
     )
 
     name = Column(Text, unique=True, nullable=False)
@@ -25,7 +27,8 @@ class Category(BaseModel):
         "Product",
         secondary=product_categories,
         back_populates="categories",
-        lazy="joined"
+        # Links are removed by ON DELETE CASCADE, never loaded to be deleted
+        passive_deletes=True,
     )
 
     def __repr__(self) -> str:
@@ -0,0 +1,33 @@
+from sqlalchemy import BigInteger, Column, DateTime, ForeignKey, Numeric
+from sqlalchemy.dialects.postgresql import UUID
+
+from app.database import Base
+
+
+class CategoryStats(Base):
+    """
+    Product count and price aggregates of a category, kept current by
+    triggers on product_categories and products (see app.category_stats).
+    Categories without products may have no row.
+    """
+    __tablename__ = "category_stats"
+
+    category_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("categories.id", ondelete="CASCADE"),
+        primary_key=True
+    )
+
+    product_count = Column(BigInteger, nullable=False, default=0)
+
+    # The average is price_sum / product_count, computed on read
+    price_sum = Column(Numeric(18, 2), nullable=False, default=0)
+
+    min_price = Column(Numeric(10, 2))
+
+    max_price = Column(Numeric(10, 2))
+
+    updated_at = Column(DateTime, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<CategoryStats category_id={self.category_id} product_count={self.product_count}>"
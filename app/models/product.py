@@ -1,20 +1,37 @@
-import uuid
+from sqlalchemy import BigInteger, Column, Computed, Index, Text, DECIMAL
+from sqlalchemy.dialects.postgresql import TSVECTOR, UUID
+from sqlalchemy.orm import query_expression, relationship
 
-from sqlalchemy import Column, Text, DECIMAL
-from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship
-
-from app.models.base import BaseModel
+from app.models.base import BaseModel, current_xid, new_id
 from app.models.product_category import product_categories
 
 
 class Product(BaseModel):
     __tablename__ = "products"
+    __table_args__ = (
+        # Backs keyset pagination ordered by (name, id)
+        Index("idx_products_name_id", "name", "id"),
+        # Backs the change feed ordered by (changed_xid, id)
+        Index("idx_products_changed_xid_id", "changed_xid", "id"),
+        # Price filters and sorts; category_stats walks it for min / max
+        Index("idx_products_price", "price"),
+        Index(
+            "idx_products_search_vector",
+            "search_vector",
+            postgresql_using="gin",
+        ),
+    )
+    __mapper_args__ = {
+        **BaseModel.__mapper_args__,
+        # search_vector is maintained by Postgres and only used inside SQL;
+        # keep it out of the mapper so it is never selected or RETURNed.
+        "exclude_properties": ["search_vector"],
+    }
 
     id = Column(
         UUID(as_uuid=True),
         primary_key=True,
-        default=uuid.uuid4
+        default=new_id
     )
 
     name = Column(Text, nullable=False)
@@ -25,11 +42,35 @@ class Product(BaseModel):
 
     sku = Column(Text, unique=True, nullable=False)
 
+    # Transaction that last wrote the row; orders the change feed by commit
+    changed_xid = Column(
+        BigInteger,
+        server_default=current_xid(),
+        onupdate=current_xid(),
+        nullable=False,
+    )
+
+    # Name matches rank above description matches
+    search_vector = Column(
+        TSVECTOR,
+        Computed(
+            "setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+            "setweight(to_tsvector('english', coalesce(description, '')), 'B')",
+            persisted=True,
+        ),
+    )
+
+    # ts_rank of the current search, populated only by ranked searches
+    search_rank = query_expression()
+
     categories = relationship(
         "Category",
         secondary=product_categories,
         back_populates="products",
-        lazy="joined"
+        # Same order as the plain-row reads (ProductRepository.attach_categories)
+        order_by="[Category.name, Category.id]",
+        # Links are removed by ON DELETE CASCADE, never loaded to be deleted
+        passive_deletes=True,
     )
 
     def __repr__(self) -> str:
@@ -1,4 +1,4 @@
-from sqlalchemy import Table, Column, ForeignKey
+from sqlalchemy import Table, Column, ForeignKey, Index
 from sqlalchemy.dialects.postgresql import UUID
 
 from app.database import Base
@@ -21,4 +21,8 @@ product_categories = Table(
         ForeignKey("categories.id", ondelete="CASCADE"),
         primary_key=True
     ),
+
+    # The primary key serves lookups by product; this serves category
+    # filters (and covers product_id, so they stay index-only).
+    Index("idx_product_categories_category", "category_id", "product_id"),
 )
@@ -0,0 +1,33 @@
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, LargeBinary
+from sqlalchemy.dialects.postgresql import UUID
+
+from app.database import Base
+
+
+class ProductDocument(Base):
+    """
+    A product's ProductResponse JSON, rendered when its Unit of Work
+    commits (see app.documents), so reads need neither the categories
+    join nor JSON encoding. Reads go through products (pages, SKUs) and
+    only use a document whose updated_at matches the product's; the
+    version columns also serve ETags.
+    """
+    __tablename__ = "product_documents"
+
+    id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("products.id", ondelete="CASCADE"),
+        primary_key=True
+    )
+
+    updated_at = Column(DateTime, nullable=False)
+
+    # Newest updated_at of the embedded categories (see ProductRepository._versions)
+    categories_updated_at = Column(DateTime)
+
+    category_count = Column(Integer, nullable=False)
+
+    document = Column(LargeBinary, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<ProductDocument id={self.id} updated_at={self.updated_at}>"
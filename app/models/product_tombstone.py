@@ -0,0 +1,27 @@
+from sqlalchemy import BigInteger, Column, DateTime, Index, Text
+from sqlalchemy.dialects.postgresql import UUID
+
+from app.database import Base
+from app.models.base import current_xid, utc_now
+
+
+class ProductTombstone(Base):
+    """
+    Record of a deleted product, so change feeds can report deletions.
+    """
+    __tablename__ = "product_tombstones"
+    __table_args__ = (
+        # Backs the change feed ordered by (deleted_xid, product_id)
+        Index("idx_product_tombstones_deleted_xid_id", "deleted_xid", "product_id"),
+    )
+
+    product_id = Column(UUID(as_uuid=True), primary_key=True)
+
+    sku = Column(Text, nullable=False)
+
+    deleted_at = Column(DateTime, default=utc_now(), nullable=False)
+
+    deleted_xid = Column(BigInteger, server_default=current_xid(), nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<ProductTombstone product_id={self.product_id} sku={self.sku}>"
@@ -0,0 +1,142 @@
+import asyncio
+import json
+import logging
+from typing import Any, Dict, Optional
+from uuid import UUID, uuid4
+
+import asyncpg
+from sqlalchemy import func, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from app.cache import CACHES, pending_invalidations
+from app.config import CACHE_LISTEN_URL, CACHE_NOTIFY, CACHE_NOTIFY_CHANNEL
+
+
+logger = logging.getLogger(__name__)
+
+# Identifies this process in its own notifications, which it skips: its
+# caches were already invalidated by the committing Unit of Work.
+ORIGIN = uuid4().hex
+
+# NOTIFY payloads must stay under 8000 bytes
+MAX_PAYLOAD = 7900
+
+
+# --------------------
+# Publishing (inside the writing transaction)
+# --------------------
+
+def change_payload(session: Session) -> Optional[str]:
+    """
+    JSON payload describing what this transaction wrote, or None when it
+    wrote nothing cached. Caches with too many IDs to fit are sent as
+    null, meaning "clear everything".
+    """
+    stale = pending_invalidations(session)
+
+    if not stale:
+        return None
+
+    changes: Dict[str, Any] = {
+        cache: None if ids is None else [str(id) for id in ids]
+        for cache, ids in stale.items()
+    }
+    payload = json.dumps({"origin": ORIGIN, "changes": changes})
+
+    if len(payload) > MAX_PAYLOAD:
+        payload = json.dumps({
+            "origin": ORIGIN,
+            "changes": {cache: None for cache in changes},
+        })
+
+    return payload
+
+
+def publish_changes(session: Session) -> None:
+    """
+    Flush and queue a notification of what was written. pg_notify is
+    transactional, so other processes only receive it after COMMIT.
+    Called by the Units of Work right before committing.
+    """
+    if not CACHE_NOTIFY:
+        return
+
+    session.flush()
+    payload = change_payload(session)
+
+    if payload:
+        session.execute(select(func.pg_notify(CACHE_NOTIFY_CHANNEL, payload)))
+
+
+# --------------------
+# Listening (one connection per process, started from the lifespan)
+# --------------------
+
+def apply_notification(payload: str) -> None:
+    try:
+        message = json.loads(payload)
+        if message.get("origin") == ORIGIN:
+            return
+
+        for cache, ids in message["changes"].items():
+            if cache in CACHES:
+                CACHES[cache].invalidate(
+                    None if ids is None else [UUID(id) for id in ids]
+                )
+    except (KeyError, TypeError, ValueError, AttributeError):
+        # Unknown shape: safest is to drop everything
+        logger.warning("Malformed cache notification: %r", payload)
+        invalidate_all()
+
+
+def invalidate_all() -> None:
+    for cache in CACHES.values():
+        cache.invalidate()
+
+
+def listen_dsn() -> str:
+    # asyncpg takes a plain libpq-style URL
+    url = make_url(CACHE_LISTEN_URL).set(drivername="postgresql")
+    return url.render_as_string(hide_password=False)
+
+
+async def listen_for_changes(retry_seconds: float = 1.0) -> None:
+    """
+    Keep a LISTEN connection open and apply notifications to the local
+    caches until cancelled.
+
+    Notifications sent while disconnected are lost, so the caches are
+    cleared every time the connection is (re)established. This needs a
+    session-level connection; behind a transaction-pooling pgbouncer point
+    CACHE_LISTEN_URL at Postgres directly.
+    """
+    while True:
+        connection = None
+        try:
+            connection = await asyncpg.connect(listen_dsn())
+            closed = asyncio.Event()
+
+            connection.add_termination_listener(lambda _: closed.set())
+            await connection.add_listener(
+                CACHE_NOTIFY_CHANNEL,
+                lambda _connection, _pid, _channel, payload: apply_notification(payload),
+            )
+            invalidate_all()
+
+            await closed.wait()
+            logger.warning("Cache notification connection lost, reconnecting")
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Any failure (asyncpg.InterfaceError, a bad DSN, ...) must not
+            # end the listener for the life of the worker
+            logger.exception("Cache notification listener failed, retrying")
+        finally:
+            if connection is not None and not connection.is_closed():
+                try:
+                    await connection.close()
+                except Exception:
+                    connection.terminate()
+
+        await asyncio.sleep(retry_seconds)
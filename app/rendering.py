@@ -0,0 +1,67 @@
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Any, Dict, Tuple
+from uuid import UUID
+
+import orjson
+from pydantic import BaseModel
+
+from app.schemas.product import ProductResponse
+
+
+# Product projections and JSON encoding, shared by the routes and the
+# product_documents read model (app.documents)
+
+# Scalar fields selectable with ?fields=, and relations embeddable with ?expand=
+PRODUCT_FIELDS = tuple(
+    name for name in ProductResponse.model_fields if name != "categories"
+)
+PRODUCT_EXPANSIONS = ("categories",)
+
+
+@dataclass(frozen=True)
+class Projection:
+    """
+    The parts of a product representation a client asked for. `id` is
+    always included.
+    """
+    fields: Tuple[str, ...] = PRODUCT_FIELDS
+    expand: Tuple[str, ...] = ()
+
+    @property
+    def categories(self) -> bool:
+        return "categories" in self.expand
+
+
+# The full ProductResponse
+FULL_PROJECTION = Projection(PRODUCT_FIELDS, PRODUCT_EXPANSIONS)
+
+
+def project(item: Dict[str, Any], projection: Projection) -> Dict[str, Any]:
+    """
+    The requested parts of a product dict, dropping any extra keys a
+    query selected (sort keys, ranks, ...).
+    """
+    projected = {name: item[name] for name in projection.fields}
+
+    if projection.categories:
+        projected["categories"] = item["categories"]
+
+    return projected
+
+
+def json_default(value: Any) -> Any:
+    # Same output as pydantic's JSON mode (response_model), which orjson
+    # does not produce by itself
+    if isinstance(value, Decimal):
+        return str(value)
+    # asyncpg returns its own UUID subclass, which orjson does not accept
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=json_default)
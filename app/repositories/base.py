@@ -1,11 +1,137 @@
+import json
 from abc import ABC, abstractmethod
-from typing import Generic, TypeVar, List, Optional
+from typing import Any, Dict, Generic, TypeVar, List, Optional, Sequence, Tuple, Union
 from uuid import UUID
 
+from sqlalchemy import Select, any_, bindparam, column, func, select, table, tuple_
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Query, Session
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from app.config import COUNT_EXACT_THRESHOLD
+
 
 T = TypeVar("T")
 
 
+def any_of(column, values: Sequence[Any]):
+    """
+    `column = ANY(:values)` bound as a single array parameter, so the SQL
+    text stays the same for any number of values.
+    """
+    return column == any_(
+        bindparam(None, list(values), type_=ARRAY(column.type))
+    )
+
+
+def page_by_name(
+    query: Union[Query, Select],
+    model,
+    skip: int = 0,
+    limit: int = 10,
+    after: Optional[Tuple[str, UUID]] = None,
+) -> Union[Query, Select]:
+    """
+    Order `query` (ORM Query or Core select) by (name, id) and select one
+    page of it.
+
+    Keyset pagination: with `after`, seek past the last (name, id) instead
+    of scanning and discarding `skip` rows.
+    """
+    query = query.order_by(model.name, model.id)
+
+    if after is not None:
+        query = query.filter(tuple_(model.name, model.id) > tuple_(*after))
+    else:
+        query = query.offset(skip)
+
+    return query.limit(limit)
+
+
+# --------------------
+# Counting (X-Total-Count)
+# --------------------
+
+COUNT_MODES = ("exact", "estimate")
+
+
+class explain(Executable, ClauseElement):
+    """
+    `EXPLAIN (FORMAT JSON) <statement>`, with the statement's parameters
+    bound as usual.
+    """
+    inherit_cache = False
+
+    def __init__(self, statement: Select):
+        self.statement = statement
+
+
+@compiles(explain, "postgresql")
+def _compile_explain(element, compiler, **kw):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
+def planned_rows(session: Session, statement: Select) -> int:
+    """
+    The planner's row estimate for `statement`; nothing is executed.
+    """
+    plan = session.execute(explain(statement)).scalar_one()
+
+    # psycopg2 decodes json columns, asyncpg returns the text
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def table_rows(session: Session, model) -> int:
+    """
+    pg_class.reltuples for `model`'s table (as of the last VACUUM /
+    ANALYZE), or -1 when it has never been analyzed.
+    """
+    pg_class = table("pg_class", column("oid"), column("reltuples"))
+
+    return int(
+        session.execute(
+            select(pg_class.c.reltuples)
+            .where(pg_class.c.oid == func.to_regclass(model.__tablename__))
+        ).scalar_one()
+    )
+
+
+def count_rows(
+    session: Session,
+    statement: Select,
+    mode: str = "exact",
+    model=None,
+) -> int:
+    """
+    Number of rows `statement` returns.
+
+    "exact" runs a COUNT(*) over it. "estimate" reads the planner's
+    estimate instead, or pg_class.reltuples when `model` is given (for
+    unfiltered statements over its table), and only counts exactly when
+    the estimate is below COUNT_EXACT_THRESHOLD, where counting is cheap
+    and estimates are least reliable.
+    """
+    if mode not in COUNT_MODES:
+        raise ValueError(f"count must be one of: {', '.join(COUNT_MODES)}")
+
+    if mode == "estimate":
+        estimate = table_rows(session, model) if model is not None else -1
+
+        if estimate < 0:
+            estimate = planned_rows(session, statement)
+
+        if estimate >= COUNT_EXACT_THRESHOLD:
+            return estimate
+
+    return session.execute(
+        select(func.count()).select_from(statement.subquery())
+    ).scalar_one()
+
+
 class IRepository(ABC, Generic[T]):
     """
     Base repository interface.
@@ -20,7 +146,12 @@ class IRepository(ABC, Generic[T]):
         pass
 
     @abstractmethod
-    def get_all(self, skip: int = 0, limit: int = 10) -> List[T]:
+    def get_all(
+        self,
+        skip: int = 0,
+        limit: int = 10,
+        after: Optional[Tuple[Any, ...]] = None,
+    ) -> List[T]:
         pass
 
     @abstractmethod
@@ -28,7 +159,8 @@ class IRepository(ABC, Generic[T]):
         pass
 
     @abstractmethod
-    def update(self, id: UUID, entity: T) -> Optional[T]:
+    def update(self, id: UUID, entity: T) -> Optional[Dict[str, Any]]:
+        # One UPDATE ... RETURNING; the updated row as a plain dict
         pass
 
     @abstractmethod
@@ -1,10 +1,16 @@
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 from uuid import UUID
 
+from sqlalchemy import delete, func, select, update
 from sqlalchemy.orm import Session
 
+from app.cache import mark_stale
+from app.models.base import utc_now
 from app.models.category import Category
-from app.repositories.base import IRepository
+from app.models.category_stats import CategoryStats
+from app.models.product_category import product_categories
+from app.models.product_document import ProductDocument
+from app.repositories.base import IRepository, any_of, count_rows, page_by_name
 
 
 class CategoryRepository(IRepository[Category]):
@@ -24,35 +30,211 @@ class CategoryRepository(IRepository[Category]):
             .first()
         )
 
-    def get_all(self, skip: int = 0, limit: int = 10) -> List[Category]:
+    def get_many(self, ids: Sequence[UUID]) -> List[Category]:
+        """
+        Resolve several categories in one query; missing IDs are simply
+        absent from the result.
+        """
+        if not ids:
+            return []
+
         return (
             self.session
             .query(Category)
-            .order_by(Category.name)
-            .offset(skip)
-            .limit(limit)
+            .filter(any_of(Category.id, ids))
             .all()
         )
 
-    def update(self, id: UUID, category: Category) -> Optional[Category]:
-        db_category = self.get_by_id(id)
+    def get_all(
+        self,
+        skip: int = 0,
+        limit: int = 10,
+        after: Optional[Tuple[str, UUID]] = None,
+    ) -> List[Category]:
+        query = self.session.query(Category)
+        return page_by_name(query, Category, skip, limit, after).all()
+
+    def count(self, mode: str = "exact") -> int:
+        return count_rows(self.session, select(Category.id), mode, model=Category)
+
+    # Plain rows (no ORM instances)
+    @staticmethod
+    def row_columns() -> List[Any]:
+        """
+        Columns of CategoryResponse, in order.
+        """
+        return [
+            Category.id,
+            Category.name,
+            Category.description,
+            Category.created_at,
+            Category.updated_at,
+        ]
+
+    def get_all_rows(
+        self,
+        skip: int = 0,
+        limit: int = 10,
+        after: Optional[Tuple[str, UUID]] = None,
+        stats: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """
+        `get_all` as plain dicts, never hydrated into Category instances.
+        With `stats`, each also carries its `stats` (see `stats_columns`),
+        from the same query.
+        """
+        stmt = select(*self.row_columns())
+
+        if not stats:
+            stmt = page_by_name(stmt, Category, skip, limit, after)
+            return [row._asdict() for row in self.session.execute(stmt)]
+
+        # Both sides have an updated_at: split the rows by position
+        width = len(self.row_columns())
+        stats_names = [column.name for column in self.stats_columns()]
+
+        stmt = stmt.add_columns(*self.stats_columns()).outerjoin(
+            CategoryStats, CategoryStats.category_id == Category.id
+        )
 
-        if not db_category:
+        rows = []
+
+        for row in self.session.execute(page_by_name(stmt, Category, skip, limit, after)):
+            item = dict(zip(row._fields[:width], row[:width]))
+            item["stats"] = dict(zip(stats_names, row[width:]))
+            rows.append(item)
+
+        return rows
+
+    # Stats (category_stats, maintained by triggers)
+    @staticmethod
+    def stats_columns() -> List[Any]:
+        """
+        Columns of CategoryStatsResponse but category_id, in order.
+        Categories without a category_stats row read as empty.
+        """
+        return [
+            func.coalesce(CategoryStats.product_count, 0).label("product_count"),
+            CategoryStats.min_price,
+            CategoryStats.max_price,
+            func.round(
+                CategoryStats.price_sum / func.nullif(CategoryStats.product_count, 0), 2
+            ).label("avg_price"),
+            CategoryStats.updated_at,
+        ]
+
+    def get_stats(self, id: UUID) -> Optional[Dict[str, Any]]:
+        """
+        One primary key lookup whatever the category's product count;
+        None when the category does not exist.
+        """
+        row = self.session.execute(
+            select(Category.id.label("category_id"), *self.stats_columns())
+            .outerjoin(CategoryStats, CategoryStats.category_id == Category.id)
+            .where(Category.id == id)
+        ).first()
+        return row._asdict() if row else None
+
+    # Versions (conditional GETs)
+    def get_version(self, id: UUID) -> Optional[Tuple[UUID, Any]]:
+        row = (
+            self.session
+            .query(Category.id, Category.updated_at)
+            .filter(Category.id == id)
+            .first()
+        )
+        return tuple(row) if row else None
+
+    def get_all_versions(
+        self,
+        skip: int = 0,
+        limit: int = 10,
+        after: Optional[Tuple[str, UUID]] = None,
+    ) -> List[Tuple[UUID, Any]]:
+        query = self.session.query(Category.id, Category.updated_at)
+        return [
+            tuple(row)
+            for row in page_by_name(query, Category, skip, limit, after)
+        ]
+
+    def update(self, id: UUID, category: Category) -> Optional[Dict[str, Any]]:
+        """
+        Set the category's non-None fields with one UPDATE ... RETURNING
+        and return the row as a plain dict, or None when it does not exist.
+        """
+        changes = {
+            name: getattr(category, name)
+            for name in ("name", "description")
+            if getattr(category, name) is not None
+        }
+
+        if not changes:
+            row = self.session.execute(
+                select(*self.row_columns()).where(Category.id == id)
+            ).first()
+            return row._asdict() if row else None
+
+        row = self.session.execute(
+            update(Category)
+            .where(Category.id == id)
+            .values(**changes, updated_at=utc_now())
+            .returning(*self.row_columns())
+            .execution_options(synchronize_session=False)
+        ).first()
+
+        if row is None:
             return None
 
-        if category.name is not None:
-            db_category.name = category.name
+        # Core statements are invisible to the flush listener; cached
+        # products embed their categories
+        mark_stale(self.session, "categories", [id])
+        mark_stale(self.session, "products", self._outdate_products(id))
+        return row._asdict()
+
+    def _outdate_products(self, id: UUID) -> List[UUID]:
+        """
+        IDs of the products linked to the category, whose representation
+        embeds it, with their documents dropped: rendered again at commit
+        (PRODUCT_DOCUMENTS on) or on read and by the next backfill (off).
+
+        The products themselves are not written. Their versions cover the
+        category (see ProductRepository._versions), and category edits are
+        not product changes for the change feed.
+        """
+        linked = select(product_categories.c.product_id).where(
+            product_categories.c.category_id == id
+        )
+        products = list(self.session.execute(linked).scalars())
 
-        if category.description is not None:
-            db_category.description = category.description
+        if products:
+            self.session.execute(
+                delete(ProductDocument)
+                .where(ProductDocument.id.in_(linked))
+                .execution_options(synchronize_session=False)
+            )
 
-        return db_category
+        return products
 
     def delete(self, id: UUID) -> bool:
-        category = self.get_by_id(id)
-
-        if not category:
+        """
+        Delete a category with one DELETE ... RETURNING; its product links
+        go via ON DELETE CASCADE, never loaded. The linked products are
+        read first, while the links still exist (see _outdate_products).
+        """
+        products = self._outdate_products(id)
+
+        deleted = self.session.execute(
+            delete(Category)
+            .where(Category.id == id)
+            .returning(Category.id)
+            .execution_options(synchronize_session=False)
+        ).first()
+
+        if deleted is None:
             return False
 
-        self.session.delete(category)
+        # Core statements are invisible to the flush listener; cached
+        # products embed their categories
+        mark_stale(self.session, "categories", [id])
+        mark_stale(self.session, "products", products)
         return True
@@ -1,12 +1,61 @@
-from typing import List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+from datetime import datetime
 from decimal import Decimal
 from uuid import UUID
 
-from sqlalchemy import text
-from sqlalchemy.orm import Session
+from sqlalchemy import (
+    JSON,
+    BigInteger,
+    Select,
+    Text,
+    and_,
+    bindparam,
+    case,
+    cast,
+    delete,
+    column,
+    exists,
+    false,
+    func,
+    literal,
+    literal_column,
+    null,
+    or_,
+    select,
+    true,
+    tuple_,
+    union_all,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, REAL, insert
+from sqlalchemy.orm import Session, load_only, selectinload, with_expression
 
+from app.cache import mark_stale
+from app.config import SEARCH_FUZZY_THRESHOLD
+from app.database import features
+from app.models.base import current_xid, utc_now
+from app.models.category import Category
+from app.models.category_stats import CategoryStats
 from app.models.product import Product
-from app.repositories.base import IRepository
+from app.models.product_category import product_categories
+from app.models.product_document import ProductDocument
+from app.models.product_tombstone import ProductTombstone
+from app.repositories.base import IRepository, any_of, count_rows, page_by_name
+from app.repositories.category_repository import CategoryRepository
+
+
+# ProductResponse fields, in order, read by the plain-row methods
+ROW_FIELDS = ("id", "name", "description", "price", "sku", "created_at", "updated_at")
+
+# product_documents columns, id first
+DOCUMENT_KEYS = (
+    "id", "updated_at", "categories_updated_at", "category_count", "document"
+)
+
+
+def like_escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
 
 
 class ProductRepository(IRepository[Product]):
@@ -18,93 +67,1052 @@ class ProductRepository(IRepository[Product]):
         self.session.add(product)
         return product
 
+    def _query(
+        self,
+        fields: Optional[Sequence[str]] = None,
+        categories: bool = True,
+    ):
+        """
+        `fields` limits the product columns selected (the primary key and
+        updated_at, needed for ETags, are always loaded). Categories are
+        loaded with one extra IN query per page instead of being joined
+        under LIMIT, and only when `categories` is set.
+        """
+        query = self.session.query(Product)
+
+        if fields is not None:
+            query = query.options(
+                load_only(*(
+                    getattr(Product, name)
+                    for name in dict.fromkeys((*fields, "updated_at"))
+                ))
+            )
+
+        if categories:
+            query = query.options(selectinload(Product.categories))
+
+        return query
+
     def get_by_id(self, id: UUID) -> Optional[Product]:
         return (
-            self.session
-            .query(Product)
+            self._query()
             .filter(Product.id == id)
             .first()
         )
 
-    def get_all(self, skip: int = 0, limit: int = 10) -> List[Product]:
-        return (
-            self.session
-            .query(Product)
-            .order_by(Product.name)
-            .offset(skip)
-            .limit(limit)
-            .all()
+    def get_many(self, ids: Sequence[UUID]) -> List[Product]:
+        """
+        Load several products in one query; missing IDs are simply absent
+        from the result.
+        """
+        if not ids:
+            return []
+
+        return self._query().filter(any_of(Product.id, ids)).all()
+
+    def get_all(
+        self,
+        skip: int = 0,
+        limit: int = 10,
+        after: Optional[Tuple[str, UUID]] = None,
+        fields: Optional[Sequence[str]] = None,
+        categories: bool = True,
+    ) -> List[Product]:
+        """
+        See `_query` for `fields` and `categories`; name is always loaded
+        for the next page's cursor.
+        """
+        if fields is not None:
+            fields = [*fields, "name"]
+
+        query = self._query(fields, categories)
+        return page_by_name(query, Product, skip, limit, after).all()
+
+    def count(self, mode: str = "exact") -> int:
+        return count_rows(self.session, select(Product.id), mode, model=Product)
+
+    # Plain rows (no ORM instances)
+    @staticmethod
+    def row_columns(fields: Optional[Sequence[str]] = None) -> List[Any]:
+        """
+        Product columns for `fields` (id and updated_at always included),
+        or for every ProductResponse field.
+        """
+        names = ROW_FIELDS if fields is None else ("id", *fields, "updated_at")
+        return [getattr(Product, name) for name in dict.fromkeys(names)]
+
+    def _rows(self, stmt, categories: bool = True) -> List[Dict[str, Any]]:
+        rows = [row._asdict() for row in self.session.execute(stmt)]
+
+        if categories:
+            self.attach_categories(rows)
+
+        return rows
+
+    def attach_categories(self, rows: List[Dict[str, Any]]) -> None:
+        """
+        Set rows' "categories" to lists of category dicts, read with one
+        query for all of them.
+        """
+        by_product: Dict[UUID, List[Dict[str, Any]]] = {}
+
+        for row in rows:
+            row["categories"] = by_product.setdefault(row["id"], [])
+
+        if not by_product:
+            return
+
+        stmt = (
+            select(product_categories.c.product_id, *CategoryRepository.row_columns())
+            .join(Category, Category.id == product_categories.c.category_id)
+            .where(any_of(product_categories.c.product_id, list(by_product)))
+            .order_by(Category.name, Category.id)
+        )
+
+        for row in self.session.execute(stmt):
+            category = row._asdict()
+            by_product[category.pop("product_id")].append(category)
+
+    def get_many_rows(
+        self,
+        keys: Sequence[Any],
+        by: str = "id",
+        fields: Optional[Sequence[str]] = None,
+        categories: bool = True,
+    ) -> List[Dict[str, Any]]:
+        """
+        Products whose `by` column ("id" or "sku") is in `keys`, as plain
+        dicts (see `get_all_rows`), in one `= ANY(...)` query. Missing keys
+        are simply absent from the result.
+        """
+        if not keys:
+            return []
+
+        if fields is not None:
+            fields = [*fields, by]
+
+        stmt = select(*self.row_columns(fields)).where(
+            any_of(getattr(Product, by), list(dict.fromkeys(keys)))
         )
+        return self._rows(stmt, categories)
 
-    def update(self, id: UUID, product: Product) -> Optional[Product]:
-        db_product = self.get_by_id(id)
+    def get_all_rows(
+        self,
+        skip: int = 0,
+        limit: int = 10,
+        after: Optional[Tuple[str, UUID]] = None,
+        fields: Optional[Sequence[str]] = None,
+        categories: bool = True,
+    ) -> List[Dict[str, Any]]:
+        """
+        `get_all` as plain dicts keyed like ProductResponse, selected with
+        Core and never hydrated into Product instances. With `fields`,
+        only those columns (plus id, updated_at and name) are selected.
+        """
+        if fields is not None:
+            fields = [*fields, "name"]
+
+        stmt = page_by_name(
+            select(*self.row_columns(fields)), Product, skip, limit, after
+        )
+        return self._rows(stmt, categories)
+
+    # Versions (conditional GETs)
+    def _versions(self):
+        """
+        (id, updated_at, categories_updated_at, category_count) rows.
+        Together they change whenever a ProductResponse would: category
+        edits move categories_updated_at, category deletes the count.
+        """
+        categories_updated_at = (
+            select(func.max(Category.updated_at))
+            .select_from(product_categories.join(Category))
+            .where(product_categories.c.product_id == Product.id)
+            .scalar_subquery()
+        )
+        category_count = (
+            select(func.count())
+            .select_from(product_categories)
+            .where(product_categories.c.product_id == Product.id)
+            .scalar_subquery()
+        )
 
-        if not db_product:
+        return self.session.query(
+            Product.id,
+            Product.updated_at,
+            categories_updated_at.label("categories_updated_at"),
+            category_count.label("category_count"),
+        )
+
+    def get_version(self, id: UUID) -> Optional[Tuple[UUID, Any, Any, int]]:
+        row = self._versions().filter(Product.id == id).first()
+        return tuple(row) if row else None
+
+    def get_all_versions(
+        self,
+        skip: int = 0,
+        limit: int = 10,
+        after: Optional[Tuple[str, UUID]] = None,
+    ) -> List[Tuple[UUID, Any, Any, int]]:
+        """
+        Versions of the rows `get_all` would return, in the same order.
+        """
+        query = page_by_name(self._versions(), Product, skip, limit, after)
+        return [tuple(row) for row in query]
+
+    def update(
+        self,
+        id: UUID,
+        product: Product,
+        touch: bool = False,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Set the product's non-None fields with one UPDATE ... RETURNING and
+        return the row as a plain dict (see `get_all_rows`), or None when
+        it does not exist. `touch` bumps updated_at even when no field is
+        given (for link changes). Categories are not attached.
+        """
+        changes = {
+            name: getattr(product, name)
+            for name in ("name", "description", "price", "sku")
+            if getattr(product, name) is not None
+        }
+
+        if not changes and not touch:
+            rows = self.get_many_rows([id], categories=False)
+            return rows[0] if rows else None
+
+        row = self.session.execute(
+            update(Product)
+            .where(Product.id == id)
+            .values(**changes, updated_at=utc_now())
+            .returning(*self.row_columns())
+            .execution_options(synchronize_session=False)
+        ).first()
+
+        if row is None:
             return None
 
-        if product.name is not None:
-            db_product.name = product.name
+        # Core statements are invisible to the flush listener
+        mark_stale(self.session, "products", [id])
+        return row._asdict()
 
-        if product.description is not None:
-            db_product.description = product.description
+    def update_prices(
+        self,
+        prices: Dict[Any, Decimal],
+        by: str = "id",
+    ) -> List[Tuple[UUID, str]]:
+        """
+        Set the price of every product whose `by` column ("id" or "sku")
+        is a key of `prices`, in one UPDATE ... FROM (VALUES ...).
+        Returns (id, sku) of the products found.
+        """
+        if not prices:
+            return []
 
-        if product.price is not None:
-            db_product.price = product.price
+        key = getattr(Product, by)
+        rows = values(
+            column("key", key.type),
+            column("price", Product.price.type),
+            name="prices",
+        ).data(list(prices.items()))
 
-        if product.sku is not None:
-            db_product.sku = product.sku
+        result = self.session.execute(
+            update(Product)
+            .where(key == rows.c.key)
+            .values(price=rows.c.price, updated_at=utc_now())
+            .returning(Product.id, Product.sku)
+            .execution_options(synchronize_session=False)
+        )
+        updated = [tuple(row) for row in result]
 
-        return db_product
+        mark_stale(self.session, "products", [id for id, _ in updated])
+        return updated
 
     def delete(self, id: UUID) -> bool:
-        product = self.get_by_id(id)
+        return bool(self.delete_many([id]))
+
+    def delete_many(self, ids: Sequence[UUID]) -> List[UUID]:
+        """
+        Delete products by ID and write their tombstones in one statement
+        (an INSERT from the DELETE ... RETURNING rows). Category links go
+        with them via ON DELETE CASCADE, never loaded. Returns the IDs
+        that existed.
+        """
+        if not ids:
+            return []
 
-        if not product:
-            return False
+        ids = list(dict.fromkeys(ids))
 
-        self.session.delete(product)
-        return True
+        # The delete trigger updates each product's category_stats rows as
+        # it deletes the product; take them all up front in category_id
+        # order so concurrent bulk deletes can't lock them crosswise
+        if len(ids) > 1:
+            self.session.execute(
+                select(CategoryStats.category_id)
+                .where(
+                    CategoryStats.category_id.in_(
+                        select(product_categories.c.category_id)
+                        .where(any_of(product_categories.c.product_id, ids))
+                    )
+                )
+                .order_by(CategoryStats.category_id)
+                .with_for_update()
+            )
+
+        deleted = (
+            delete(Product.__table__)
+            .where(any_of(Product.__table__.c.id, ids))
+            .returning(Product.__table__.c.id, Product.__table__.c.sku)
+            .cte("deleted")
+        )
+
+        stmt = (
+            insert(ProductTombstone.__table__)
+            .from_select(
+                ["product_id", "sku", "deleted_at"],
+                select(deleted.c.id, deleted.c.sku, utc_now()),
+            )
+            .returning(ProductTombstone.__table__.c.product_id)
+        )
+
+        deleted_ids = list(self.session.execute(stmt).scalars())
+
+        # Core statements are invisible to the flush listener
+        mark_stale(self.session, "products", deleted_ids)
+        return deleted_ids
+
+    # Documents (pre-rendered ProductResponse JSON, see app.documents)
+    @staticmethod
+    def _documents():
+        """
+        Products with their documents: `document` (and the document's
+        version columns) are None where the document is missing or older
+        than the product, e.g. for products written by a process with
+        PRODUCT_DOCUMENTS off. See app.documents.with_rendered.
+        """
+        return select(
+            Product.id,
+            Product.name,
+            Product.sku,
+            Product.updated_at,
+            ProductDocument.categories_updated_at,
+            ProductDocument.category_count,
+            ProductDocument.document,
+        ).outerjoin(
+            ProductDocument,
+            and_(
+                ProductDocument.id == Product.id,
+                ProductDocument.updated_at == Product.updated_at,
+            ),
+        )
+
+    def get_document(self, id: UUID) -> Optional[Dict[str, Any]]:
+        row = self.session.execute(self._documents().where(Product.id == id)).first()
+        return row._asdict() if row else None
+
+    def get_many_documents(
+        self,
+        keys: Sequence[Any],
+        by: str = "id",
+    ) -> List[Dict[str, Any]]:
+        """
+        Documents of the products whose `by` column ("id" or "sku") is in
+        `keys`; unknown keys are simply absent from the result.
+        """
+        if not keys:
+            return []
+
+        stmt = self._documents().where(
+            any_of(getattr(Product, by), list(dict.fromkeys(keys)))
+        )
+        return [row._asdict() for row in self.session.execute(stmt)]
+
+    def get_all_documents(
+        self,
+        skip: int = 0,
+        limit: int = 10,
+        after: Optional[Tuple[str, UUID]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        A `get_all` page of documents: paged over products, so products
+        without a document keep their place.
+        """
+        stmt = page_by_name(self._documents(), Product, skip, limit, after)
+        return [row._asdict() for row in self.session.execute(stmt)]
+
+    def outdated_document_ids(self) -> List[UUID]:
+        """
+        Products with no document, or one older than the product (written
+        while PRODUCT_DOCUMENTS was off). Category edits drop the linked
+        products' documents, so this covers them too.
+        """
+        return list(self.session.execute(
+            select(Product.id).where(
+                ~exists().where(
+                    ProductDocument.id == Product.id,
+                    ProductDocument.updated_at == Product.updated_at,
+                )
+            ).order_by(Product.id)
+        ).scalars())
+
+    def lock_for_render(self, ids: Sequence[UUID]) -> None:
+        """
+        FOR SHARE on the products, in ID order, until the transaction ends:
+        concurrent writers (which re-render their products' documents at
+        commit) wait, so a document read now cannot overwrite a newer one.
+        """
+        self.session.execute(
+            select(Product.id)
+            .where(any_of(Product.id, ids))
+            .order_by(Product.id)
+            .with_for_update(read=True)
+        ).all()
+
+    def save_documents(self, documents: List[Dict[str, Any]]) -> None:
+        """
+        Insert or replace documents (see app.documents.render_document)
+        with one batched INSERT ... ON CONFLICT (id) DO UPDATE.
+        """
+        if not documents:
+            return
+
+        table = ProductDocument.__table__
+
+        stmt = insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.id],
+            set_={
+                name: stmt.excluded[name]
+                for name in DOCUMENT_KEYS[1:]
+            },
+        )
+        self.session.execute(
+            stmt,
+            [{name: document[name] for name in DOCUMENT_KEYS} for document in documents],
+        )
+
+    def drop_documents(self) -> None:
+        """
+        Delete every document; reads render products on the fly until the
+        backfill (see app.documents.backfill_documents) restores them.
+        """
+        self.session.execute(
+            delete(ProductDocument).execution_options(synchronize_session=False)
+        )
+
+    # Change feed
+    @staticmethod
+    def _settled_before():
+        """
+        Upper bound for change feed xids: the oldest transaction still in
+        progress (xmin of the current snapshot), or the next xid when none is.
+
+        changed_xid / deleted_xid hold the writing transaction's ID, so
+        every row stamped below this bound is committed (or rolled back)
+        and none can appear behind a consumer's watermark later. Only
+        transactions that have written something hold it back; long
+        readers such as exports, and sessions idle before their first
+        write, do not. Needs no privileges beyond reading the tables.
+        """
+        return cast(
+            cast(func.pg_snapshot_xmin(func.pg_current_snapshot()), Text),
+            BigInteger,
+        )
+
+    def changes(
+        self,
+        after: Optional[Tuple[int, UUID]] = None,
+        limit: int = 100,
+    ) -> List[Tuple[UUID, int, datetime, str, bool]]:
+        """
+        Upserted and deleted products after the `(xid, id)` watermark,
+        merged in commit order. Returns `(id, xid, changed_at, sku,
+        deleted)` rows. Only writes to the products themselves count:
+        renaming or deleting a category reports none of its products.
+        """
+        settled = self._settled_before()
+
+        upserted = select(
+            Product.id.label("id"),
+            Product.changed_xid.label("xid"),
+            Product.updated_at.label("changed_at"),
+            Product.sku.label("sku"),
+            false().label("deleted"),
+        ).where(Product.changed_xid < settled)
+
+        deleted = select(
+            ProductTombstone.product_id,
+            ProductTombstone.deleted_xid,
+            ProductTombstone.deleted_at,
+            ProductTombstone.sku,
+            true(),
+        ).where(ProductTombstone.deleted_xid < settled)
+
+        if after is not None:
+            upserted = upserted.where(
+                tuple_(Product.changed_xid, Product.id) > tuple_(*after)
+            )
+            deleted = deleted.where(
+                tuple_(ProductTombstone.deleted_xid, ProductTombstone.product_id)
+                > tuple_(*after)
+            )
+
+        # Each branch reads at most `limit` rows off its (xid, id) index
+        events = union_all(
+            upserted.order_by(Product.changed_xid, Product.id).limit(limit),
+            deleted
+            .order_by(ProductTombstone.deleted_xid, ProductTombstone.product_id)
+            .limit(limit),
+        ).subquery()
+
+        result = self.session.execute(
+            select(events)
+            .order_by(events.c.xid, events.c.id)
+            .limit(limit)
+        )
+        return [tuple(row) for row in result]
+
+    # Bulk ingest (set-based)
+    def bulk_upsert(self, rows: List[Dict[str, Any]]) -> List[Tuple[UUID, str, bool]]:
+        """
+        Upsert `rows` by sku with INSERT ... ON CONFLICT (sku) DO UPDATE.
+
+        Executed as an executemany, which SQLAlchemy batches into multi-row
+        VALUES statements from one cached compilation. Returns
+        `(id, sku, inserted)` per row, in no particular order. SKUs must be
+        unique within `rows`.
+        """
+        table = Product.__table__
+
+        stmt = insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.sku],
+            set_={
+                "name": stmt.excluded.name,
+                "description": stmt.excluded.description,
+                "price": stmt.excluded.price,
+                "updated_at": utc_now(),
+                "changed_xid": current_xid(),
+            },
+        ).returning(
+            table.c.id,
+            table.c.sku,
+            # xmax is 0 only for freshly inserted tuples
+            literal_column("(xmax = 0)").label("inserted"),
+        )
+
+        result = self.session.execute(
+            stmt,
+            [
+                {
+                    "name": row["name"],
+                    "description": row.get("description"),
+                    "price": row["price"],
+                    "sku": row["sku"],
+                }
+                for row in rows
+            ],
+        )
+        upserted = [tuple(row) for row in result]
+        mark_stale(self.session, "products", [id for id, _, _ in upserted])
+        return upserted
+
+    def replace_category_links(self, links: Dict[UUID, List[UUID]]) -> None:
+        """
+        Make each product's categories exactly the given IDs, using one
+        DELETE and one batched INSERT for all products.
+        """
+        if not links:
+            return
+
+        mark_stale(self.session, "products", links)
+
+        self.session.execute(
+            delete(product_categories)
+            .where(any_of(product_categories.c.product_id, list(links)))
+        )
+
+        values = [
+            {"product_id": product_id, "category_id": category_id}
+            for product_id, category_ids in links.items()
+            for category_id in category_ids
+        ]
+
+        if values:
+            self.session.execute(insert(product_categories), values)
 
     # Advanced Search (FULL-TEXT SEARCH)
+    @staticmethod
+    def tsquery(keyword: str):
+        return func.plainto_tsquery("english", keyword)
+
+    @staticmethod
+    def search_criteria(
+        keyword: Optional[str] = None,
+        category_ids: Sequence[UUID] = (),
+        category_match: str = "any",
+        min_price: Optional[Decimal] = None,
+        max_price: Optional[Decimal] = None,
+        fuzzy: bool = False,
+    ) -> List[Any]:
+        """
+        WHERE criteria shared by search, facets and export. With `fuzzy`,
+        the keyword is matched by `fuzzy_criteria` instead of full-text.
+        """
+        criteria = []
+
+        if keyword and fuzzy:
+            criteria.append(ProductRepository.fuzzy_criteria(keyword))
+        elif keyword:
+            criteria.append(
+                Product.search_vector.op("@@")(ProductRepository.tsquery(keyword))
+            )
+
+        if min_price is not None:
+            criteria.append(Product.price >= min_price)
+
+        if max_price is not None:
+            criteria.append(Product.price <= max_price)
+
+        if category_ids:
+            criteria.append(
+                ProductRepository.category_criteria(category_ids, category_match)
+            )
+
+        return criteria
+
+    @staticmethod
+    def category_criteria(category_ids: Sequence[UUID], match: str = "any"):
+        """
+        "any": linked to at least one of `category_ids` (EXISTS).
+        "all": linked to every one of them; the product IDs are found from
+        the category side of product_categories with GROUP BY / HAVING.
+        Neither joins product rows, so no DISTINCT is needed.
+        """
+        category_ids = list(dict.fromkeys(category_ids))
+        in_categories = any_of(product_categories.c.category_id, category_ids)
+
+        if match == "all" and len(category_ids) > 1:
+            return Product.id.in_(
+                select(product_categories.c.product_id)
+                .where(in_categories)
+                .group_by(product_categories.c.product_id)
+                .having(func.count() == len(category_ids))
+            )
+
+        return exists().where(
+            product_categories.c.product_id == Product.id,
+            in_categories,
+        )
+
+    def matches_fulltext(
+        self,
+        keyword: str,
+        category_ids: Sequence[UUID] = (),
+        category_match: str = "any",
+        min_price: Optional[Decimal] = None,
+        max_price: Optional[Decimal] = None,
+    ) -> bool:
+        return self.session.query(
+            exists().where(
+                *self.search_criteria(
+                    keyword, category_ids, category_match, min_price, max_price
+                )
+            )
+        ).scalar()
+
+    # Fuzzy / autocomplete search (pg_trgm when available)
+    @staticmethod
+    def fuzzy_criteria(keyword: str):
+        """
+        Substring match on name, prefix match on sku and, with pg_trgm,
+        typo-tolerant word similarity on name. All of them can be served
+        by the trigram GIN indexes on name and sku.
+        """
+        escaped = like_escape(keyword)
+        criteria = [
+            Product.name.ilike(f"%{escaped}%", escape="\\"),
+            Product.sku.ilike(f"{escaped}%", escape="\\"),
+        ]
+
+        if features.trigram:
+            # name %> keyword  <=>  word_similarity(keyword, name) >= threshold
+            criteria.append(Product.name.op("%>")(keyword))
+
+        return or_(*criteria)
+
+    @staticmethod
+    def name_prefix(keyword: str):
+        return Product.name.ilike(f"{like_escape(keyword)}%", escape="\\")
+
+    @staticmethod
+    def fuzzy_rank(keyword: str):
+        if features.trigram:
+            return func.word_similarity(keyword, Product.name)
+
+        # Without pg_trgm, name prefixes rank above other substring matches
+        return cast(
+            case((ProductRepository.name_prefix(keyword), 1.0), else_=0.5),
+            REAL,
+        )
+
+    def _set_fuzzy_threshold(self) -> None:
+        # Transaction-local, so it is safe behind pgbouncer
+        if features.trigram:
+            self.session.execute(
+                select(func.set_config(
+                    "pg_trgm.word_similarity_threshold",
+                    str(SEARCH_FUZZY_THRESHOLD),
+                    True,
+                ))
+            )
+
+    def autocomplete(self, keyword: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Small (id, name, sku) projection for search-as-you-type: name
+        prefixes first, then by similarity.
+        """
+        self._set_fuzzy_threshold()
+
+        stmt = (
+            select(Product.id, Product.name, Product.sku)
+            .where(self.fuzzy_criteria(keyword))
+            .order_by(
+                self.name_prefix(keyword).desc(),
+                self.fuzzy_rank(keyword).desc(),
+                Product.name,
+                Product.id,
+            )
+            .limit(limit)
+        )
+
+        return [dict(row._mapping) for row in self.session.execute(stmt)]
+
+    def _search_page(
+        self,
+        query,
+        keyword: Optional[str] = None,
+        category_ids: Sequence[UUID] = (),
+        category_match: str = "any",
+        min_price: Optional[Decimal] = None,
+        max_price: Optional[Decimal] = None,
+        skip: int = 0,
+        limit: int = 10,
+        after: Optional[Tuple[Any, UUID]] = None,
+        sort: str = "name",
+        fuzzy: bool = False,
+        rank_column: bool = False,
+    ):
+        """
+        Filter, order and page `query` (an ORM Query or a Core select) for
+        `search` / `search_rows`. The relevance rank goes into
+        `Product.search_rank`, or into a "search_rank" column when
+        `rank_column` is set.
+        """
+        if fuzzy:
+            self._set_fuzzy_threshold()
+
+        query = query.filter(
+            *self.search_criteria(
+                keyword, category_ids, category_match, min_price, max_price, fuzzy
+            )
+        )
+
+        if sort == "relevance":
+            if fuzzy:
+                rank = self.fuzzy_rank(keyword)
+            else:
+                rank = func.ts_rank(Product.search_vector, self.tsquery(keyword))
+
+            if rank_column:
+                query = query.add_columns(rank.label("search_rank"))
+            else:
+                query = query.options(with_expression(Product.search_rank, rank))
+
+            query = query.order_by(rank.desc(), Product.id)
+
+            if after is not None:
+                # Both ranks are REAL; compare as REAL so ties stay exact
+                after_rank = cast(after[0], REAL)
+                query = query.filter(
+                    or_(
+                        rank < after_rank,
+                        and_(rank == after_rank, Product.id > after[1]),
+                    )
+                )
+        else:
+            key = Product.price if sort == "price" else Product.name
+            query = query.order_by(key, Product.id)
+
+            if after is not None:
+                query = query.filter(tuple_(key, Product.id) > tuple_(*after))
+
+        if after is None:
+            query = query.offset(skip)
+
+        return query.limit(limit)
+
     def search(
         self,
         keyword: Optional[str] = None,
-        category_id: Optional[UUID] = None,
+        category_ids: Sequence[UUID] = (),
+        category_match: str = "any",
         min_price: Optional[Decimal] = None,
         max_price: Optional[Decimal] = None,
         skip: int = 0,
         limit: int = 10,
+        after: Optional[Tuple[Any, UUID]] = None,
+        sort: str = "name",
+        fuzzy: bool = False,
+        fields: Optional[Sequence[str]] = None,
+        categories: bool = True,
     ) -> List[Product]:
+        """
+        `sort` is "relevance" (best first; requires `keyword`), "name" or
+        "price". `after` is the (sort key, id) of the last row of the
+        previous page. With `fuzzy`, the keyword is matched by
+        `fuzzy_criteria` and ranked by similarity instead of full-text.
+        `fields` and `categories` narrow what is loaded (see `_query`).
+        """
+        if fields is not None and sort != "relevance":
+            # The sort key is needed for the next page's cursor
+            fields = [*fields, sort]
 
-        query = self.session.query(Product)
+        return self._search_page(
+            self._query(fields, categories),
+            keyword, category_ids, category_match, min_price, max_price,
+            skip, limit, after, sort, fuzzy,
+        ).all()
 
-        if keyword:
-            query = query.filter(
-                text(
-                    "to_tsvector('english', products.name || ' ' || "
-                    "COALESCE(products.description, '')) "
-                    "@@ plainto_tsquery('english', :keyword)"
+    def search_rows(
+        self,
+        keyword: Optional[str] = None,
+        category_ids: Sequence[UUID] = (),
+        category_match: str = "any",
+        min_price: Optional[Decimal] = None,
+        max_price: Optional[Decimal] = None,
+        skip: int = 0,
+        limit: int = 10,
+        after: Optional[Tuple[Any, UUID]] = None,
+        sort: str = "name",
+        fuzzy: bool = False,
+        fields: Optional[Sequence[str]] = None,
+        categories: bool = True,
+    ) -> List[Dict[str, Any]]:
+        """
+        `search` as plain dicts (see `get_all_rows`); ranked searches add
+        a "search_rank" key.
+        """
+        if fields is not None and sort != "relevance":
+            fields = [*fields, sort]
+
+        stmt = self._search_page(
+            select(*self.row_columns(fields)),
+            keyword, category_ids, category_match, min_price, max_price,
+            skip, limit, after, sort, fuzzy,
+            rank_column=True,
+        )
+        return self._rows(stmt, categories)
+
+    def count_search(
+        self,
+        mode: str = "exact",
+        keyword: Optional[str] = None,
+        category_ids: Sequence[UUID] = (),
+        category_match: str = "any",
+        min_price: Optional[Decimal] = None,
+        max_price: Optional[Decimal] = None,
+        fuzzy: bool = False,
+    ) -> int:
+        """
+        Total number of products `search` pages through (see `count_rows`
+        for the modes).
+        """
+        if fuzzy:
+            self._set_fuzzy_threshold()
+
+        criteria = self.search_criteria(
+            keyword, category_ids, category_match, min_price, max_price, fuzzy
+        )
+
+        return count_rows(
+            self.session,
+            select(Product.id).where(*criteria),
+            mode,
+            model=None if criteria else Product,
+        )
+
+    def facets(
+        self,
+        keyword: Optional[str] = None,
+        category_ids: Sequence[UUID] = (),
+        category_match: str = "any",
+        min_price: Optional[Decimal] = None,
+        max_price: Optional[Decimal] = None,
+        fuzzy: bool = False,
+        facets: Sequence[str] = ("categories", "price"),
+        price_buckets: Sequence[Decimal] = (),
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Counts over the full filtered result set, in one statement: a CTE
+        of the matching products feeding one GROUP BY per facet.
+
+        "categories" counts matches per category; "price" counts matches
+        per bucket between consecutive `price_buckets` edges, the last
+        bucket being open-ended.
+        """
+        if fuzzy:
+            self._set_fuzzy_threshold()
+
+        matched = (
+            select(Product.id, Product.price)
+            .where(
+                *self.search_criteria(
+                    keyword, category_ids, category_match, min_price, max_price, fuzzy
                 )
-            ).params(keyword=keyword)
+            )
+            .cte("matched")
+        )
 
-        if min_price is not None:
-            query = query.filter(Product.price >= min_price)
+        parts = []
 
-        if max_price is not None:
-            query = query.filter(Product.price <= max_price)
+        if "categories" in facets:
+            parts.append(
+                select(
+                    literal("categories").label("facet"),
+                    Category.id.label("category_id"),
+                    Category.name.label("category_name"),
+                    null().label("bucket"),
+                    func.count().label("count"),
+                )
+                .select_from(
+                    matched
+                    .join(
+                        product_categories,
+                        product_categories.c.product_id == matched.c.id,
+                    )
+                    .join(Category)
+                )
+                .group_by(Category.id, Category.name)
+            )
+
+        if "price" in facets and price_buckets:
+            bucket = func.width_bucket(
+                matched.c.price,
+                bindparam(
+                    "price_buckets", list(price_buckets), type_=ARRAY(Product.price.type)
+                ),
+            )
+            parts.append(
+                select(
+                    literal("price").label("facet"),
+                    null().label("category_id"),
+                    null().label("category_name"),
+                    bucket.label("bucket"),
+                    func.count().label("count"),
+                )
+                .select_from(matched)
+                # By output name, so the array parameter is bound only once
+                .group_by(literal_column("bucket"))
+            )
+
+        result: Dict[str, List[Dict[str, Any]]] = {facet: [] for facet in facets}
+
+        if not parts:
+            return result
 
-        if category_id:
-            query = (
-                query
-                .join(Product.categories)
-                .filter_by(id=category_id)
-                .distinct()
+        rows = self.session.execute(union_all(*parts)).all()
+
+        categories = sorted(
+            (row for row in rows if row.facet == "categories"),
+            key=lambda row: (-row.count, row.category_name),
+        )
+        if "categories" in facets:
+            result["categories"] = [
+                {"id": row.category_id, "name": row.category_name, "count": row.count}
+                for row in categories
+            ]
+
+        if "price" in facets:
+            # width_bucket numbers the bucket starting at edge i as i + 1
+            counts = {row.bucket: row.count for row in rows if row.facet == "price"}
+            result["price"] = [
+                {
+                    "min": edge,
+                    "max": price_buckets[index + 1] if index + 1 < len(price_buckets) else None,
+                    "count": counts.get(index + 1, 0),
+                }
+                for index, edge in enumerate(price_buckets)
+            ]
+
+        return result
+
+    # Export (server-side cursor)
+    @staticmethod
+    def export_statement(
+        keyword: Optional[str] = None,
+        category_ids: Sequence[UUID] = (),
+        category_match: str = "any",
+        min_price: Optional[Decimal] = None,
+        max_price: Optional[Decimal] = None,
+    ) -> Select:
+        """
+        Plain rows for export, one per product. Categories are aggregated
+        by a correlated subquery instead of a join, so rows never multiply.
+        """
+        categories = (
+            select(
+                func.coalesce(
+                    func.json_agg(
+                        func.json_build_object(
+                            "id", Category.id, "name", Category.name
+                        )
+                    ),
+                    literal_column("'[]'::json"),
+                    type_=JSON,
+                )
             )
+            .select_from(product_categories.join(Category))
+            .where(product_categories.c.product_id == Product.id)
+            .scalar_subquery()
+        )
 
         return (
-            query
-            .order_by(Product.name)
-            .offset(skip)
-            .limit(limit)
-            .all()
+            select(
+                Product.id,
+                Product.name,
+                Product.description,
+                Product.price,
+                Product.sku,
+                categories.label("categories"),
+                Product.created_at,
+                Product.updated_at,
+            )
+            .where(
+                *ProductRepository.search_criteria(
+                    keyword, category_ids, category_match, min_price, max_price
+                )
+            )
         )
+
+    def stream_export(
+        self,
+        keyword: Optional[str] = None,
+        category_ids: Sequence[UUID] = (),
+        category_match: str = "any",
+        min_price: Optional[Decimal] = None,
+        max_price: Optional[Decimal] = None,
+        batch_size: int = 1000,
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Yield matching products in batches of plain dicts from a
+        server-side cursor, keeping memory constant.
+        """
+        stmt = self.export_statement(
+            keyword, category_ids, category_match, min_price, max_price
+        )
+        result = self.session.execute(stmt.execution_options(yield_per=batch_size))
+
+        for partition in result.partitions():
+            yield [dict(row._mapping) for row in partition]
@@ -1,6 +1,7 @@
 from typing import Optional
 from uuid import UUID
 from datetime import datetime
+from decimal import Decimal
 
 from pydantic import BaseModel, Field, ConfigDict
 
@@ -34,3 +35,20 @@ class CategoryResponse(BaseModel):
     updated_at: datetime
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class CategoryStatsSummary(BaseModel):
+    product_count: int
+    # None while the category has no products
+    min_price: Optional[Decimal]
+    max_price: Optional[Decimal]
+    avg_price: Optional[Decimal]
+    updated_at: Optional[datetime]
+
+
+class CategoryStatsResponse(CategoryStatsSummary):
+    category_id: UUID
+
+
+class CategoryWithStatsResponse(CategoryResponse):
+    stats: CategoryStatsSummary
@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import List, Literal, Optional
 from uuid import UUID
 from decimal import Decimal
 from datetime import datetime
@@ -62,4 +62,108 @@ class ProductResponse(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class ProductSuggestion(BaseModel):
+    id: UUID
+    name: str
+    sku: str
+
+
+class CategoryFacet(BaseModel):
+    id: UUID
+    name: str
+    count: int
+
+
+class PriceFacet(BaseModel):
+    min: Decimal
+    # None for the open-ended top bucket
+    max: Optional[Decimal]
+    count: int
+
+
+class ProductFacets(BaseModel):
+    categories: Optional[List[CategoryFacet]] = None
+    price: Optional[List[PriceFacet]] = None
+
+
+class ProductSearchResults(BaseModel):
+    items: List["ProductResponse"]
+    facets: ProductFacets
+    # Also sent as X-Total-Count; only set when `count` is requested
+    total: Optional[int] = None
+
+
+class ProductTombstoneResponse(BaseModel):
+    id: UUID
+    sku: str
+    deleted_at: datetime
+
+
+class ProductChanges(BaseModel):
+    updated: List["ProductResponse"]
+    deleted: List[ProductTombstoneResponse]
+    # Pass back as `since` to continue; unchanged when nothing new arrived
+    next_token: Optional[str]
+    has_more: bool
+
+
+class ProductBulkResult(BaseModel):
+    index: int
+    sku: Optional[str] = None
+    status: Literal["created", "updated", "error"]
+    id: Optional[UUID] = None
+    error: Optional[str] = None
+
+
+class ProductBulkResponse(BaseModel):
+    created: int
+    updated: int
+    failed: int
+    results: List[ProductBulkResult]
+
+
+class ProductBulkDeleteResponse(BaseModel):
+    deleted: List[UUID]
+    not_found: List[UUID]
+
+
+class ProductPriceUpdate(BaseModel):
+    # Exactly one of id / sku, the same one for every item of a request
+    id: Optional[UUID] = None
+    sku: Optional[str] = None
+    # products.price is DECIMAL(10, 2): anything else fails as a 500
+    price: Decimal = Field(..., ge=0, le=Decimal("99999999.99"), decimal_places=2)
+
+
+class ProductPriceResult(BaseModel):
+    index: int
+    key: str
+    status: Literal["updated", "not_found"]
+
+
+class ProductPricesResponse(BaseModel):
+    updated: int
+    not_found: int
+    results: List[ProductPriceResult]
+
+
+class ProductBatchGet(BaseModel):
+    # Exactly one of the two
+    ids: Optional[List[UUID]] = None
+    skus: Optional[List[str]] = None
+
+
+class ProductBatchResult(BaseModel):
+    index: int
+    key: str
+    status: Literal["found", "not_found"]
+    product: Optional["ProductResponse"] = None
+
+
+class ProductBatchResponse(BaseModel):
+    found: int
+    not_found: int
+    results: List[ProductBatchResult]
+
+
 from app.schemas.category import CategoryResponse
@@ -0,0 +1,65 @@
+from types import GeneratorType
+from typing import Any, AsyncIterator, Callable, Iterator, Type
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import AsyncSessionLocal
+from app.unit_of_work.sqlalchemy_uow import SQLAlchemyUnitOfWork
+
+
+class AsyncService:
+    """
+    Async facade over a sync service.
+
+    NOTE:
+    - Orchestration lives in the sync service only; each call runs it
+      through `AsyncSession.run_sync`, with its Units of Work on that
+      session's sync side, so every DB round trip awaits on the event loop
+      instead of blocking a thread.
+    - Generators the service returns (exports) are driven the same way, one
+      item per run_sync, and keep the session until exhausted or closed.
+    """
+
+    service_class: Type[Any]
+
+    def __init__(self, session_factory: Callable[[], AsyncSession] = AsyncSessionLocal):
+        self.session_factory = session_factory
+
+    def __getattr__(self, name: str):
+        async def call(*args, **kwargs):
+            session = self.session_factory()
+
+            try:
+                result = await session.run_sync(
+                    lambda sync_session: getattr(
+                        self.service_class(lambda: SQLAlchemyUnitOfWork(lambda: sync_session)),
+                        name,
+                    )(*args, **kwargs)
+                )
+            except BaseException:
+                await session.close()
+                raise
+
+            if isinstance(result, GeneratorType):
+                return self._iterate(session, result)
+
+            await session.close()
+            return result
+
+        return call
+
+    @staticmethod
+    async def _iterate(session: AsyncSession, iterator: Iterator[Any]) -> AsyncIterator[Any]:
+        done = object()
+
+        try:
+            while True:
+                item = await session.run_sync(lambda _: next(iterator, done))
+
+                if item is done:
+                    return
+
+                yield item
+        finally:
+            await session.run_sync(lambda _: iterator.close())
+            await session.close()
@@ -0,0 +1,7 @@
+from app.services.async_base import AsyncService
+from app.services.category_service import CategoryService
+
+
+class AsyncCategoryService(AsyncService):
+
+    service_class = CategoryService
@@ -0,0 +1,7 @@
+from app.services.async_base import AsyncService
+from app.services.product_service import ProductService
+
+
+class AsyncProductService(AsyncService):
+
+    service_class = ProductService
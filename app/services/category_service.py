@@ -1,6 +1,7 @@
-from typing import List, Optional, Callable
+from typing import Any, Dict, List, Optional, Callable, Tuple
 from uuid import UUID
 
+from app.cache import MISSING, category_cache
 from app.models.category import Category
 from app.unit_of_work.base import IUnitOfWork
 
@@ -29,12 +30,63 @@ class CategoryService:
             return category
 
     def get_category(self, category_id: UUID) -> Optional[Category]:
+        """
+        Read-through `category_cache`; entries are invalidated when a Unit of
+        Work that wrote the category commits.
+        """
+        cached, generation = category_cache.lookup(category_id)
+        if cached is not MISSING:
+            return cached
+
+        with self.uow_factory() as uow:
+            category = uow.categories.get_by_id(category_id)
+
+        if category is not None:
+            category_cache.store(category_id, category, generation)
+
+        return category
+
+    def get_category_version(self, category_id: UUID) -> Optional[Tuple[Any, ...]]:
+        with self.uow_factory() as uow:
+            return uow.categories.get_version(category_id)
+
+    def list_category_versions(
+        self,
+        skip: int = 0,
+        limit: int = 10,
+        after: Optional[Tuple[str, UUID]] = None,
+    ) -> List[Tuple[Any, ...]]:
+        with self.uow_factory() as uow:
+            return uow.categories.get_all_versions(skip, limit, after=after)
+
+    def list_categories(
+        self,
+        skip: int = 0,
+        limit: int = 10,
+        after: Optional[Tuple[str, UUID]] = None,
+        rows: bool = False,
+        stats: bool = False,
+    ) -> List[Any]:
+        """
+        With `rows`, returns plain dicts instead of Category instances,
+        with `stats` embedding each category's product stats.
+        """
+        with self.uow_factory() as uow:
+            if rows:
+                return uow.categories.get_all_rows(skip, limit, after=after, stats=stats)
+            return uow.categories.get_all(skip, limit, after=after)
+
+    def get_category_stats(self, category_id: UUID) -> Optional[Dict[str, Any]]:
+        """
+        Product count and min / max / average price, read from the
+        trigger-maintained category_stats; None for an unknown category.
+        """
         with self.uow_factory() as uow:
-            return uow.categories.get_by_id(category_id)
+            return uow.categories.get_stats(category_id)
 
-    def list_categories(self, skip: int = 0, limit: int = 10) -> List[Category]:
+    def count_categories(self, mode: str = "exact") -> int:
         with self.uow_factory() as uow:
-            return uow.categories.get_all(skip, limit)
+            return uow.categories.count(mode)
 
     def update_category(
         self,
@@ -42,7 +94,7 @@ class CategoryService:
         *,
         name: Optional[str] = None,
         description: Optional[str] = None,
-    ) -> Optional[Category]:
+    ) -> Optional[Dict[str, Any]]:
 
         if name is not None and not name.strip():
             raise ValueError("Category name must not be empty")
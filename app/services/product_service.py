@@ -1,12 +1,329 @@
-from typing import List, Optional, Callable
+from typing import Any, Dict, Iterator, List, Optional, Callable, Sequence, Set, Tuple
+from datetime import datetime
 from decimal import Decimal
 from uuid import UUID
 
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.config import (
+    BATCH_GET_MAX_ITEMS,
+    BULK_CHUNK_SIZE,
+    BULK_DELETE_MAX_ITEMS,
+    PRICE_UPDATE_MAX_ITEMS,
+    SEARCH_PRICE_BUCKETS,
+)
+from app.cache import MISSING, product_cache
+from app.documents import missing_documents, with_rendered
 from app.models.product import Product
 from app.models.category import Category
 from app.unit_of_work.base import IUnitOfWork
 
 
+SEARCH_SORTS = ("relevance", "name", "price")
+
+SEARCH_FACETS = ("categories", "price")
+
+CATEGORY_MATCHES = ("any", "all")
+
+
+def match_categories(
+    category_ids: List[UUID],
+    categories: List[Category],
+) -> List[Category]:
+    """
+    Order `categories` as requested (dropping duplicate IDs) and report
+    every requested ID that was not found.
+    """
+    by_id = {category.id: category for category in categories}
+    requested = list(dict.fromkeys(category_ids))
+
+    missing = [str(category_id) for category_id in requested if category_id not in by_id]
+
+    if missing:
+        raise ValueError(f"Categories not found: {', '.join(missing)}")
+
+    return [by_id[category_id] for category_id in requested]
+
+
+def resolve_search_sort(keyword: Optional[str], sort: Optional[str]) -> str:
+    """
+    Searches with a keyword default to relevance order, others to name.
+    """
+    if sort is None:
+        return "relevance" if keyword else "name"
+
+    if sort not in SEARCH_SORTS:
+        raise ValueError(f"sort must be one of: {', '.join(SEARCH_SORTS)}")
+
+    if sort == "relevance" and not keyword:
+        raise ValueError("sort=relevance requires a search keyword")
+
+    return sort
+
+
+def changes_page(
+    events: List[Tuple[UUID, int, datetime, str, bool]],
+    products: List[Product],
+    limit: int,
+) -> Dict[str, Any]:
+    by_id = {product.id: product for product in products}
+
+    return {
+        # A product deleted since `events` was read shows up as a later
+        # tombstone, so it is safe to skip here.
+        "updated": [
+            by_id[id] for id, _, _, _, deleted in events
+            if not deleted and id in by_id
+        ],
+        "deleted": [
+            {"id": id, "sku": sku, "deleted_at": changed_at}
+            for id, _, changed_at, sku, deleted in events
+            if deleted
+        ],
+        "last": (events[-1][1], events[-1][0]) if events else None,
+        "has_more": len(events) == limit,
+    }
+
+
+def resolve_category_filter(
+    category_id: Optional[UUID],
+    category_ids: Optional[List[UUID]],
+    category_match: str,
+) -> List[UUID]:
+    """
+    Merge the single `category_id` filter into `category_ids`.
+    """
+    if category_match not in CATEGORY_MATCHES:
+        raise ValueError(
+            f"category_match must be one of: {', '.join(CATEGORY_MATCHES)}"
+        )
+
+    merged = ([category_id] if category_id else []) + list(category_ids or [])
+    return list(dict.fromkeys(merged))
+
+
+def resolve_batch_keys(
+    ids: Optional[List[UUID]],
+    skus: Optional[List[str]],
+) -> Tuple[str, List[Any]]:
+    """
+    `("id", ids)` or `("sku", skus)` for a batch get; exactly one of them
+    must be given.
+    """
+    if (ids is None) == (skus is None):
+        raise ValueError("Provide either ids or skus")
+
+    by, keys = ("id", ids) if ids is not None else ("sku", skus)
+
+    if len(keys) > BATCH_GET_MAX_ITEMS:
+        raise ValueError(f"At most {BATCH_GET_MAX_ITEMS} {by}s per request")
+
+    return by, keys
+
+
+def check_bulk_delete(ids: Sequence[UUID]) -> None:
+    if not ids:
+        raise ValueError("Provide at least one id")
+
+    if len(ids) > BULK_DELETE_MAX_ITEMS:
+        raise ValueError(f"At most {BULK_DELETE_MAX_ITEMS} ids per request")
+
+
+def resolve_price_updates(
+    items: Sequence[Dict[str, Any]],
+) -> Tuple[str, List[Any], Dict[Any, Decimal]]:
+    """
+    For a bulk price update: the key column ("id" or "sku"), the keys in
+    request order and the price per key (the last one when a key repeats).
+    Every item must give exactly one of id and sku, the same for all.
+    """
+    if not items:
+        raise ValueError("Provide at least one price")
+
+    if len(items) > PRICE_UPDATE_MAX_ITEMS:
+        raise ValueError(f"At most {PRICE_UPDATE_MAX_ITEMS} prices per request")
+
+    by = "id" if items[0].get("id") is not None else "sku"
+    keys = []
+
+    for item in items:
+        given = [name for name in ("id", "sku") if item.get(name) is not None]
+
+        if given != [by]:
+            raise ValueError("Every item must give exactly one of id or sku, the same for all")
+
+        if item["price"] < 0:
+            raise ValueError("Price must be non-negative")
+
+        keys.append(item[by])
+
+    return by, keys, {key: item["price"] for key, item in zip(keys, items)}
+
+
+def price_outcomes(
+    by: str,
+    keys: List[Any],
+    updated: List[Tuple[UUID, str]],
+) -> List[Dict[str, Any]]:
+    # Compare as strings: asyncpg returns its own UUID type
+    found = {str(id if by == "id" else sku) for id, sku in updated}
+
+    return [
+        {
+            "index": index,
+            "key": str(key),
+            "status": "updated" if str(key) in found else "not_found",
+        }
+        for index, key in enumerate(keys)
+    ]
+
+
+def order_batch(
+    keys: List[Any],
+    by: str,
+    rows: List[Dict[str, Any]],
+) -> List[Optional[Dict[str, Any]]]:
+    """
+    One row per requested key, in request order; None where not found.
+    """
+    # Compare as strings: asyncpg returns its own UUID type
+    by_key = {str(row[by]): row for row in rows}
+    return [by_key.get(str(key)) for key in keys]
+
+
+def resolve_facets(facets: Optional[str]) -> Tuple[str, ...]:
+    """
+    Parse a comma-separated facet list such as "categories,price".
+    """
+    if not facets:
+        return ()
+
+    requested = tuple(dict.fromkeys(
+        facet.strip() for facet in facets.split(",") if facet.strip()
+    ))
+
+    if any(facet not in SEARCH_FACETS for facet in requested):
+        raise ValueError(f"facets must be among: {', '.join(SEARCH_FACETS)}")
+
+    return requested
+
+
+# --------------------
+# Bulk ingest helpers
+# --------------------
+
+def bulk_outcome(
+    sku: str,
+    status: str,
+    id: Optional[UUID] = None,
+    error: Optional[str] = None,
+) -> Dict[str, Any]:
+    return {"sku": sku, "status": status, "id": id, "error": error}
+
+
+def plan_bulk_upsert(
+    rows: Sequence[Dict[str, Any]],
+) -> Tuple[List[Optional[Dict[str, Any]]], List[List[int]]]:
+    """
+    Reject rows that can never be written and split the rest into chunks
+    of row indices. When a sku repeats, only its last row is written.
+    """
+    outcomes: List[Optional[Dict[str, Any]]] = [None] * len(rows)
+    last_index = {row["sku"]: index for index, row in enumerate(rows)}
+    pending = []
+
+    for index, row in enumerate(rows):
+        if last_index[row["sku"]] != index:
+            outcomes[index] = bulk_outcome(
+                row["sku"], "error", error="Duplicate sku in request"
+            )
+        elif row["price"] < 0:
+            outcomes[index] = bulk_outcome(
+                row["sku"], "error", error="Price must be non-negative"
+            )
+        else:
+            pending.append(index)
+
+    chunks = [
+        pending[start:start + BULK_CHUNK_SIZE]
+        for start in range(0, len(pending), BULK_CHUNK_SIZE)
+    ]
+    return outcomes, chunks
+
+
+def bulk_category_ids(rows: Sequence[Dict[str, Any]], indices: List[int]) -> List[UUID]:
+    return list({
+        category_id
+        for index in indices
+        for category_id in rows[index].get("category_ids") or []
+    })
+
+
+def reject_unknown_categories(
+    rows: Sequence[Dict[str, Any]],
+    indices: List[int],
+    known: Set[UUID],
+    outcomes: List[Optional[Dict[str, Any]]],
+) -> List[int]:
+    accepted = []
+
+    for index in indices:
+        row = rows[index]
+        missing = [
+            str(category_id)
+            for category_id in dict.fromkeys(row.get("category_ids") or [])
+            if category_id not in known
+        ]
+
+        if missing:
+            outcomes[index] = bulk_outcome(
+                row["sku"], "error",
+                error=f"Categories not found: {', '.join(missing)}",
+            )
+        else:
+            accepted.append(index)
+
+    return accepted
+
+
+def record_bulk_upserts(
+    rows: Sequence[Dict[str, Any]],
+    indices: List[int],
+    upserted: List[Tuple[UUID, str, bool]],
+    outcomes: List[Optional[Dict[str, Any]]],
+) -> Dict[UUID, List[UUID]]:
+    """
+    Fill in outcomes for written rows and return the category links to
+    replace (rows without `category_ids` keep their current links).
+    """
+    by_sku = {sku: (id, inserted) for id, sku, inserted in upserted}
+    links = {}
+
+    for index in indices:
+        row = rows[index]
+        id, inserted = by_sku[row["sku"]]
+        outcomes[index] = bulk_outcome(
+            row["sku"], "created" if inserted else "updated", id=id
+        )
+
+        if row.get("category_ids") is not None:
+            links[id] = list(dict.fromkeys(row["category_ids"]))
+
+    return links
+
+
+def fail_bulk_chunk(
+    rows: Sequence[Dict[str, Any]],
+    indices: List[int],
+    exc: SQLAlchemyError,
+    outcomes: List[Optional[Dict[str, Any]]],
+) -> None:
+    reason = str(getattr(exc, "orig", None) or exc).strip().splitlines()[0]
+
+    for index in indices:
+        outcomes[index] = bulk_outcome(rows[index]["sku"], "error", error=reason)
+
+
 class ProductService:
 
     def __init__(self, uow_factory: Callable[[], IUnitOfWork]):
@@ -33,27 +350,150 @@ class ProductService:
                 description=description,
             )
 
-            if category_ids:
-                categories = [
-                    uow.categories.get_by_id(category_id)
-                    for category_id in category_ids
-                ]
+            categories = []
 
-                if any(category is None for category in categories):
-                    raise ValueError("One or more categories not found")
+            if category_ids:
+                categories = match_categories(
+                    category_ids,
+                    uow.categories.get_many(category_ids),
+                )
 
-                product.categories = categories  # type: ignore
+            # Always assign so the collection is populated on the detached
+            # instance returned to the caller.
+            product.categories = categories  # type: ignore
 
             uow.products.add(product)
             return product
 
     def get_product(self, product_id: UUID) -> Optional[Product]:
+        """
+        Read-through `product_cache`; entries are invalidated when a Unit of
+        Work that wrote the product commits.
+        """
+        cached, generation = product_cache.lookup(product_id)
+        if cached is not MISSING:
+            return cached
+
+        with self.uow_factory() as uow:
+            product = uow.products.get_by_id(product_id)
+
+        if product is not None:
+            product_cache.store(product_id, product, generation)
+
+        return product
+
+    def get_product_version(self, product_id: UUID) -> Optional[Tuple[Any, ...]]:
         with self.uow_factory() as uow:
-            return uow.products.get_by_id(product_id)
+            return uow.products.get_version(product_id)
 
-    def list_products(self, skip: int = 0, limit: int = 10) -> List[Product]:
+    def list_product_versions(
+        self,
+        skip: int = 0,
+        limit: int = 10,
+        after: Optional[Tuple[str, UUID]] = None,
+    ) -> List[Tuple[Any, ...]]:
         with self.uow_factory() as uow:
-            return uow.products.get_all(skip, limit)
+            return uow.products.get_all_versions(skip, limit, after=after)
+
+    def list_products(
+        self,
+        skip: int = 0,
+        limit: int = 10,
+        after: Optional[Tuple[str, UUID]] = None,
+        fields: Optional[Sequence[str]] = None,
+        categories: bool = True,
+        rows: bool = False,
+    ) -> List[Any]:
+        """
+        `fields` limits the columns loaded and `categories` whether the
+        categories are; the other attributes are left unloaded. With
+        `rows`, returns plain dicts instead of Product instances (see
+        ProductRepository.get_all_rows).
+        """
+        with self.uow_factory() as uow:
+            get_all = uow.products.get_all_rows if rows else uow.products.get_all
+            return get_all(
+                skip, limit, after=after, fields=fields, categories=categories
+            )
+
+    def batch_get_products(
+        self,
+        ids: Optional[List[UUID]] = None,
+        skus: Optional[List[str]] = None,
+        fields: Optional[Sequence[str]] = None,
+        categories: bool = True,
+    ) -> List[Optional[Dict[str, Any]]]:
+        """
+        Products for every requested ID or SKU (see `resolve_batch_keys`)
+        as plain dicts, in request order, None where not found. One query
+        for the products plus one for their categories.
+        """
+        by, keys = resolve_batch_keys(ids, skus)
+
+        with self.uow_factory() as uow:
+            rows = uow.products.get_many_rows(
+                keys, by, fields=fields, categories=categories
+            )
+
+        return order_batch(keys, by, rows)
+
+    # Pre-rendered documents (PRODUCT_DOCUMENTS), no categories join
+    def get_product_document(self, product_id: UUID) -> Optional[Dict[str, Any]]:
+        with self.uow_factory() as uow:
+            row = uow.products.get_document(product_id)
+
+            if row is not None and row["document"] is None:
+                row, = with_rendered([row], uow.products.get_many_rows([product_id]))
+
+        return row
+
+    def list_product_documents(
+        self,
+        skip: int = 0,
+        limit: int = 10,
+        after: Optional[Tuple[str, UUID]] = None,
+    ) -> List[Dict[str, Any]]:
+        with self.uow_factory() as uow:
+            rows = uow.products.get_all_documents(skip, limit, after=after)
+            return with_rendered(rows, uow.products.get_many_rows(missing_documents(rows)))
+
+    def batch_get_product_documents(
+        self,
+        ids: Optional[List[UUID]] = None,
+        skus: Optional[List[str]] = None,
+    ) -> List[Optional[Dict[str, Any]]]:
+        """
+        `batch_get_products` from product_documents: one query, plus one
+        rendering the products that lack an up-to-date document.
+        """
+        by, keys = resolve_batch_keys(ids, skus)
+
+        with self.uow_factory() as uow:
+            rows = uow.products.get_many_documents(keys, by)
+            rows = with_rendered(rows, uow.products.get_many_rows(missing_documents(rows)))
+
+        return order_batch(keys, by, rows)
+
+    def count_products(self, mode: str = "exact") -> int:
+        with self.uow_factory() as uow:
+            return uow.products.count(mode)
+
+    def list_changes(
+        self,
+        after: Optional[Tuple[int, UUID]] = None,
+        limit: int = 100,
+    ) -> Dict[str, Any]:
+        """
+        Products upserted or deleted after the `(xid, id)` watermark, in
+        commit order. `last` is the `(xid, id)` to resume from.
+        """
+        with self.uow_factory() as uow:
+            events = uow.products.changes(after, limit)
+            products = uow.products.get_many(
+                [id for id, _, _, _, deleted in events if not deleted]
+            )
+
+        return changes_page(events, products, limit)
 
     def update_product(
         self,
@@ -64,7 +504,7 @@ class ProductService:
         sku: Optional[str] = None,
         description: Optional[str] = None,
         category_ids: Optional[List[UUID]] = None,
-    ) -> Optional[Product]:
+    ) -> Optional[Dict[str, Any]]:
 
         if price is not None and price < 0:
             raise ValueError("Price must be non-negative")
@@ -77,38 +517,150 @@ class ProductService:
                 description=description,
             )
 
-            updated = uow.products.update(product_id, product)
+            # Link changes alone still bump updated_at
+            updated = uow.products.update(
+                product_id, product, touch=category_ids is not None
+            )
 
             if not updated:
                 return None
 
             if category_ids is not None:
-                categories = [
-                    uow.categories.get_by_id(category_id)
-                    for category_id in category_ids
-                ]
+                categories = match_categories(
+                    category_ids,
+                    uow.categories.get_many(category_ids),
+                )
+                uow.products.replace_category_links(
+                    {product_id: [category.id for category in categories]}
+                )
 
-                if any(category is None for category in categories):
-                    raise ValueError("One or more categories not found")
+            uow.products.attach_categories([updated])
+            return updated
 
-                updated.categories = categories  # type: ignore
+    def update_prices(self, items: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Reprice products by ID or SKU (see `resolve_price_updates`) with a
+        single UPDATE ... FROM (VALUES ...). One outcome per item.
+        """
+        by, keys, prices = resolve_price_updates(items)
 
-            return updated
+        with self.uow_factory() as uow:
+            updated = uow.products.update_prices(prices, by)
+
+        return price_outcomes(by, keys, updated)
 
     def delete_product(self, product_id: UUID) -> bool:
         with self.uow_factory() as uow:
             return uow.products.delete(product_id)
 
+    def delete_products(self, product_ids: Sequence[UUID]) -> List[UUID]:
+        """
+        Delete several products in one statement; returns the IDs that
+        existed.
+        """
+        check_bulk_delete(product_ids)
+
+        with self.uow_factory() as uow:
+            return uow.products.delete_many(product_ids)
+
+    def bulk_upsert_products(
+        self,
+        rows: Sequence[Dict[str, Any]],
+    ) -> List[Dict[str, Any]]:
+        """
+        Create or update products by sku. Every row carries the full
+        product state; `category_ids` of None leaves links untouched.
+
+        Each chunk of rows is written in its own transaction, so a failing
+        chunk does not discard the others. Returns one outcome per row.
+        """
+        outcomes, chunks = plan_bulk_upsert(rows)
+
+        for indices in chunks:
+            try:
+                with self.uow_factory() as uow:
+                    known = {
+                        category.id
+                        for category in uow.categories.get_many(
+                            bulk_category_ids(rows, indices)
+                        )
+                    }
+                    indices = reject_unknown_categories(rows, indices, known, outcomes)
+
+                    if indices:
+                        upserted = uow.products.bulk_upsert(
+                            [rows[index] for index in indices]
+                        )
+                        uow.products.replace_category_links(
+                            record_bulk_upserts(rows, indices, upserted, outcomes)
+                        )
+            except SQLAlchemyError as exc:
+                fail_bulk_chunk(rows, indices, exc, outcomes)
+
+        return outcomes
+
     def search_products(
         self,
         *,
         keyword: Optional[str] = None,
         category_id: Optional[UUID] = None,
+        category_ids: Optional[List[UUID]] = None,
+        category_match: str = "any",
         min_price: Optional[Decimal] = None,
         max_price: Optional[Decimal] = None,
         skip: int = 0,
         limit: int = 10,
+        after: Optional[Tuple[Any, UUID]] = None,
+        sort: Optional[str] = None,
+        fuzzy: bool = False,
     ) -> List[Product]:
+        """
+        With `fuzzy`, a keyword that matches nothing in full-text search
+        falls back to substring / trigram similarity matching. The check is
+        repeated per page, so every page of one search uses the same mode.
+        """
+        result = self.search_products_with_facets(
+            keyword=keyword,
+            category_id=category_id,
+            category_ids=category_ids,
+            category_match=category_match,
+            min_price=min_price,
+            max_price=max_price,
+            skip=skip,
+            limit=limit,
+            after=after,
+            sort=sort,
+            fuzzy=fuzzy,
+        )
+        return result["items"]
+
+    def search_products_with_facets(
+        self,
+        *,
+        keyword: Optional[str] = None,
+        category_id: Optional[UUID] = None,
+        category_ids: Optional[List[UUID]] = None,
+        category_match: str = "any",
+        min_price: Optional[Decimal] = None,
+        max_price: Optional[Decimal] = None,
+        skip: int = 0,
+        limit: int = 10,
+        after: Optional[Tuple[Any, UUID]] = None,
+        sort: Optional[str] = None,
+        fuzzy: bool = False,
+        facets: Sequence[str] = (),
+        count: Optional[str] = None,
+        fields: Optional[Sequence[str]] = None,
+        categories: bool = True,
+        rows: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        A page of `search_products` plus counts over the whole filtered
+        result set for each requested facet (see `SEARCH_FACETS`) and, with
+        `count` ("exact" or "estimate"), its total, read in the same
+        transaction. With `rows`, items are plain dicts (see
+        ProductRepository.search_rows).
+        """
 
         if min_price is not None and min_price < 0:
             raise ValueError("min_price must be non-negative")
@@ -116,12 +668,97 @@ class ProductService:
         if max_price is not None and max_price < 0:
             raise ValueError("max_price must be non-negative")
 
+        sort = resolve_search_sort(keyword, sort)
+        category_ids = resolve_category_filter(category_id, category_ids, category_match)
+        fuzzy = bool(fuzzy and keyword)
+
         with self.uow_factory() as uow:
-            return uow.products.search(
+            if fuzzy:
+                fuzzy = not uow.products.matches_fulltext(
+                    keyword, category_ids, category_match, min_price, max_price
+                )
+
+            search = uow.products.search_rows if rows else uow.products.search
+            items = search(
                 keyword=keyword,
-                category_id=category_id,
+                category_ids=category_ids,
+                category_match=category_match,
                 min_price=min_price,
                 max_price=max_price,
                 skip=skip,
                 limit=limit,
+                after=after,
+                sort=sort,
+                fuzzy=fuzzy,
+                fields=fields,
+                categories=categories,
             )
+
+            counts = None
+            if facets:
+                counts = uow.products.facets(
+                    keyword=keyword,
+                    category_ids=category_ids,
+                    category_match=category_match,
+                    min_price=min_price,
+                    max_price=max_price,
+                    fuzzy=fuzzy,
+                    facets=facets,
+                    price_buckets=SEARCH_PRICE_BUCKETS,
+                )
+
+            total = None
+            if count:
+                total = uow.products.count_search(
+                    count,
+                    keyword=keyword,
+                    category_ids=category_ids,
+                    category_match=category_match,
+                    min_price=min_price,
+                    max_price=max_price,
+                    fuzzy=fuzzy,
+                )
+
+        return {"items": items, "facets": counts, "total": total}
+
+    def autocomplete_products(
+        self,
+        keyword: str,
+        limit: int = 10,
+    ) -> List[Dict[str, Any]]:
+        with self.uow_factory() as uow:
+            return uow.products.autocomplete(keyword, limit)
+
+    def export_products(
+        self,
+        *,
+        keyword: Optional[str] = None,
+        category_id: Optional[UUID] = None,
+        category_ids: Optional[List[UUID]] = None,
+        category_match: str = "any",
+        min_price: Optional[Decimal] = None,
+        max_price: Optional[Decimal] = None,
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Batches of plain product rows matching the search filters. The
+        Unit of Work stays open until the iterator is exhausted or closed.
+        """
+        if min_price is not None and min_price < 0:
+            raise ValueError("min_price must be non-negative")
+
+        if max_price is not None and max_price < 0:
+            raise ValueError("max_price must be non-negative")
+
+        return self._stream_export(
+            keyword=keyword,
+            category_ids=resolve_category_filter(
+                category_id, category_ids, category_match
+            ),
+            category_match=category_match,
+            min_price=min_price,
+            max_price=max_price,
+        )
+
+    def _stream_export(self, **filters) -> Iterator[List[Dict[str, Any]]]:
+        with self.uow_factory() as uow:
+            yield from uow.products.stream_export(**filters)
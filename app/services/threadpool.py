@@ -0,0 +1,22 @@
+from typing import Any
+
+from starlette.concurrency import run_in_threadpool
+
+
+class ThreadpoolService:
+    """
+    Exposes a sync service through the awaitable interface used by the
+    routes, running every call in the threadpool exactly like a sync
+    `def` endpoint would.
+    """
+
+    def __init__(self, service: Any):
+        self._service = service
+
+    def __getattr__(self, name: str):
+        method = getattr(self._service, name)
+
+        async def call(*args, **kwargs):
+            return await run_in_threadpool(method, *args, **kwargs)
+
+        return call
@@ -1,8 +1,11 @@
-from typing import Optional
+from typing import Callable, Optional
 
 from sqlalchemy.orm import Session
 
+from app.cache import discard_stale, invalidate_committed
 from app.database import SessionLocal
+from app.documents import refresh_documents
+from app.notifications import publish_changes
 from app.repositories.product_repository import ProductRepository
 from app.repositories.category_repository import CategoryRepository
 from app.unit_of_work.base import IUnitOfWork
@@ -10,7 +13,8 @@ from app.unit_of_work.base import IUnitOfWork
 
 class SQLAlchemyUnitOfWork(IUnitOfWork):
 
-    def __init__(self):
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal):
+        self.session_factory = session_factory
         self.session: Optional[Session] = None
         self._products: Optional[ProductRepository] = None
         self._categories: Optional[CategoryRepository] = None
@@ -55,17 +59,21 @@ class SQLAlchemyUnitOfWork(IUnitOfWork):
     # -----------------
 
     def _start(self):
-        self.session = SessionLocal()
+        self.session = self.session_factory()
         self._products = ProductRepository(self.session)
         self._categories = CategoryRepository(self.session)
 
     def commit(self):
         if self.session:
+            refresh_documents(self.session)
+            publish_changes(self.session)
             self.session.commit()
+            invalidate_committed(self.session)
 
     def rollback(self):
         if self.session:
             self.session.rollback()
+            discard_stale(self.session)
 
     def dispose(self):
         if self.session:
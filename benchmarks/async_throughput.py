@@ -0,0 +1,99 @@
+"""
+Compare single-worker throughput of the threadpool (sync) and async
+request paths under increasing concurrency.
+
+Usage:
+    DATABASE_URL=postgresql+psycopg2://... python benchmarks/async_throughput.py
+
+Starts `uvicorn app.main:app --workers 1` once per mode (ASYNC_DB=false /
+ASYNC_DB=true), then fires GET /products/{id} at each concurrency level.
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+
+def start_server(port: int, async_db: bool) -> subprocess.Popen:
+    env = dict(os.environ, ASYNC_DB="true" if async_db else "false")
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "app.main:app",
+            "--port", str(port), "--workers", "1", "--log-level", "warning",
+        ],
+        env=env,
+    )
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/health")
+            return process
+        except httpx.TransportError:
+            time.sleep(0.2)
+
+    process.terminate()
+    raise RuntimeError("server did not start")
+
+
+async def run_level(base_url: str, path: str, concurrency: int, requests: int) -> float:
+    limits = httpx.Limits(max_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits) as client:
+        remaining = iter(range(requests))
+
+        async def worker():
+            for _ in remaining:
+                response = await client.get(path)
+                response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return requests / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--levels", default="1,10,50,100,200")
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.levels.split(",")]
+    base_url = f"http://127.0.0.1:{args.port}"
+    results = {}
+
+    for async_db in (False, True):
+        server = start_server(args.port, async_db)
+        try:
+            product = httpx.post(
+                f"{base_url}/products",
+                json={"name": "Bench", "price": "1.00", "sku": f"BENCH-{int(time.time() * 1000)}"},
+            ).json()
+            path = f"/products/{product['id']}"
+
+            # Warm up the pool and the import caches
+            asyncio.run(run_level(base_url, path, 10, 200))
+
+            for level in levels:
+                results[(async_db, level)] = asyncio.run(
+                    run_level(base_url, path, level, args.requests)
+                )
+        finally:
+            server.terminate()
+            server.wait()
+
+    print(f"{'concurrency':>12} {'sync req/s':>12} {'async req/s':>12}")
+    for level in levels:
+        print(
+            f"{level:>12} {results[(False, level)]:>12.0f} "
+            f"{results[(True, level)]:>12.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
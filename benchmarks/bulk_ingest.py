@@ -0,0 +1,73 @@
+"""
+Measure POST /products/bulk ingest throughput (rows/s).
+
+Usage:
+    DATABASE_URL=postgresql+psycopg2://... python benchmarks/bulk_ingest.py --rows 100000
+
+Runs the app in-process against DATABASE_URL, creates a few categories and
+sends NDJSON batches of generated products, first as inserts and then
+again as updates of the same SKUs.
+"""
+import argparse
+import json
+import random
+import time
+import uuid
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+
+def ndjson_batch(start: int, size: int, run: str, category_ids, price_factor: float) -> str:
+    lines = []
+    for number in range(start, start + size):
+        lines.append(json.dumps({
+            "name": f"Bench product {number}",
+            "description": "Generated by benchmarks/bulk_ingest.py",
+            "price": f"{(number % 1000) * price_factor:.2f}",
+            "sku": f"BULK-{run}-{number}",
+            "category_ids": random.sample(category_ids, 2),
+        }))
+    return "\n".join(lines)
+
+
+def ingest(client: TestClient, rows: int, batch: int, run: str, category_ids, price_factor: float) -> float:
+    started = time.perf_counter()
+
+    for start in range(0, rows, batch):
+        body = ndjson_batch(start, min(batch, rows - start), run, category_ids, price_factor)
+        response = client.post(
+            "/products/bulk",
+            content=body,
+            headers={"Content-Type": "application/x-ndjson"},
+        )
+        response.raise_for_status()
+        assert response.json()["failed"] == 0, response.json()["results"][:3]
+
+    return rows / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--batch", type=int, default=10_000, help="rows per request")
+    args = parser.parse_args()
+
+    run = uuid.uuid4().hex[:8].upper()
+
+    with TestClient(app) as client:
+        category_ids = [
+            client.post("/categories", json={"name": f"Bulk bench {run} {n}"}).json()["id"]
+            for n in range(10)
+        ]
+
+        inserted = ingest(client, args.rows, args.batch, run, category_ids, 1.0)
+        updated = ingest(client, args.rows, args.batch, run, category_ids, 1.1)
+
+    print(f"insert: {inserted:,.0f} rows/s")
+    print(f"update: {updated:,.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
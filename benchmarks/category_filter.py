@@ -0,0 +1,135 @@
+"""
+Compare multi-category search filters: the EXISTS ("any") and
+GROUP BY / HAVING ("all") criteria used by ProductRepository.search against
+the old join + DISTINCT over joined-eager rows.
+
+Usage:
+    DATABASE_URL=postgresql+psycopg2://... python benchmarks/category_filter.py \
+        --products 1000000 --categories 5000
+
+Generates the catalog in a scratch schema (dropped afterwards unless
+--keep), links every product to --links random categories, then times a
+20-row page filtered by 1, 3 and 10 random categories per variant.
+"""
+import argparse
+import random
+import statistics
+import time
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session, joinedload
+
+from app.database import Base, engine
+from app.models.category import Category
+from app.models.product import Product
+from app.repositories.product_repository import ProductRepository
+
+
+SCHEMA = "bench_category_filter"
+
+
+def populate(connection, products: int, categories: int, links: int) -> None:
+    connection.execute(text(
+        "INSERT INTO categories (id, name, created_at, updated_at) "
+        "SELECT gen_random_uuid(), 'Category ' || g, now(), now() "
+        "FROM generate_series(1, :n) g"
+    ), {"n": categories})
+
+    connection.execute(text(
+        "INSERT INTO products (id, name, price, sku, created_at, updated_at) "
+        "SELECT gen_random_uuid(), 'Product ' || g, (g % 1000) + 0.99, "
+        "'BENCH-' || g, now(), now() "
+        "FROM generate_series(1, :n) g"
+    ), {"n": products})
+
+    connection.execute(text(
+        "INSERT INTO product_categories (product_id, category_id) "
+        "SELECT DISTINCT p.id, c.id "
+        "FROM products p "
+        "CROSS JOIN generate_series(1, :links) k "
+        "JOIN categories c "
+        "  ON c.name = 'Category ' || (1 + abs(hashtext(p.sku || ':' || k)) % :categories)"
+    ), {"links": links, "categories": categories})
+
+    connection.execute(text("ANALYZE"))
+
+
+def legacy_search(session: Session, category_ids, match: str, limit: int):
+    query = session.query(Product).options(joinedload(Product.categories))
+
+    if match == "all":
+        # The old code had no "all"; emulate it with one EXISTS per category
+        for category_id in category_ids:
+            query = query.filter(Product.categories.any(Category.id == category_id))
+    else:
+        query = query.join(Product.categories).filter(Category.id.in_(category_ids))
+
+    return query.distinct().order_by(Product.name, Product.id).limit(limit).all()
+
+
+def current_search(session: Session, category_ids, match: str, limit: int):
+    return ProductRepository(session).search(
+        category_ids=category_ids,
+        category_match=match,
+        limit=limit,
+    )
+
+
+def time_variant(session, search, category_pool, size, match, runs, limit):
+    timings = []
+
+    for _ in range(runs):
+        category_ids = random.sample(category_pool, size)
+        started = time.perf_counter()
+        search(session, category_ids, match, limit)
+        timings.append((time.perf_counter() - started) * 1000)
+        session.expunge_all()
+
+    return statistics.median(timings), max(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=1_000_000)
+    parser.add_argument("--categories", type=int, default=5_000)
+    parser.add_argument("--links", type=int, default=3, help="categories per product")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--keep", action="store_true", help="keep the scratch schema")
+    args = parser.parse_args()
+
+    with engine.connect() as connection:
+        connection.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        connection.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+        connection.commit()
+
+        # Unqualified names (ORM and text SQL alike) resolve to the scratch schema
+        connection.execute(text(f"SET search_path TO {SCHEMA}"))
+        Base.metadata.create_all(connection)
+
+        started = time.perf_counter()
+        populate(connection, args.products, args.categories, args.links)
+        connection.commit()
+        print(f"populated in {time.perf_counter() - started:.0f}s")
+
+        try:
+            with Session(bind=connection) as session:
+                category_pool = [id for (id,) in session.query(Category.id)]
+
+                print(f"{'variant':>10} {'match':>6} {'categories':>11} {'median ms':>10} {'max ms':>8}")
+                for match in ("any", "all"):
+                    for size in (1, 3, 10):
+                        for name, search in (("legacy", legacy_search), ("current", current_search)):
+                            median, worst = time_variant(
+                                session, search, category_pool, size, match,
+                                args.runs, args.limit,
+                            )
+                            print(f"{name:>10} {match:>6} {size:>11} {median:>10.1f} {worst:>8.1f}")
+        finally:
+            if not args.keep:
+                connection.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+                connection.commit()
+
+
+if __name__ == "__main__":
+    main()
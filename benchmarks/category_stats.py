@@ -0,0 +1,179 @@
+"""
+Reading per-category product counts and price stats from the trigger-
+maintained category_stats table against aggregating the products on every
+read, and what the triggers add to writes.
+
+Usage:
+    DATABASE_URL=postgresql+psycopg2://... PYTHONPATH=. python benchmarks/category_stats.py \
+        --products 1000000 --categories 100
+
+Works in a scratch schema (dropped afterwards). Reads are one page of
+`--categories` categories with their stats, `--reads` times each way.
+Writes (linking new products, repricing, deleting `--writes` products in
+transactions of `--batch`) run once before the triggers are installed and
+once after.
+"""
+import argparse
+import random
+import time
+from decimal import Decimal
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from app.category_stats import install_category_stats
+from app.database import Base, engine
+from app.models import category_stats, product_tombstone  # noqa: F401 (registers the tables)
+from app.repositories.category_repository import CategoryRepository
+from app.repositories.product_repository import ProductRepository
+
+
+SCHEMA = "bench_category_stats"
+
+AGGREGATE = text(
+    "SELECT c.id, c.name, count(p.id), min(p.price), max(p.price), round(avg(p.price), 2) "
+    "FROM categories c "
+    "LEFT JOIN product_categories pc ON pc.category_id = c.id "
+    "LEFT JOIN products p ON p.id = pc.product_id "
+    "GROUP BY c.id ORDER BY c.name, c.id LIMIT :limit"
+)
+
+
+def populate(connection, products: int, categories: int) -> None:
+    connection.execute(text(
+        "INSERT INTO categories (id, name, created_at, updated_at) "
+        "SELECT gen_random_uuid(), 'Category ' || g, now(), now() "
+        "FROM generate_series(1, :n) g"
+    ), {"n": categories})
+
+    connection.execute(text(
+        "INSERT INTO products (id, name, price, sku, created_at, updated_at) "
+        "SELECT gen_random_uuid(), 'Product ' || g, (g % 1000) + 0.99, "
+        "'STATS-' || g, now(), now() "
+        "FROM generate_series(1, :n) g"
+    ), {"n": products})
+
+    connection.execute(text(
+        "INSERT INTO product_categories (product_id, category_id) "
+        "SELECT p.id, c.id FROM products p "
+        "JOIN categories c ON c.name = 'Category ' || (1 + abs(hashtext(p.sku)) % :n)"
+    ), {"n": categories})
+
+    connection.execute(text("ANALYZE"))
+
+
+def timed(label: str, work) -> None:
+    started = time.perf_counter()
+    work()
+    print(f"  {label:<28} {time.perf_counter() - started:>8.3f}s")
+
+
+def write(connection, args, round: int) -> None:
+    def link():
+        for start in range(0, args.writes, args.batch):
+            connection.execute(text(
+                "WITH created AS ("
+                "  INSERT INTO products (id, name, price, sku, created_at, updated_at) "
+                "  SELECT gen_random_uuid(), 'New ' || g, 5.99, 'NEW-' || :round || '-' || g, now(), now() "
+                "  FROM generate_series(:start, :stop) g RETURNING id, sku) "
+                "INSERT INTO product_categories (product_id, category_id) "
+                "SELECT created.id, c.id FROM created "
+                "JOIN categories c ON c.name = 'Category ' || (1 + abs(hashtext(created.sku)) % :n)"
+            ), {"round": round, "start": start, "stop": start + args.batch - 1, "n": args.categories})
+            connection.commit()
+
+    ids = [
+        id for (id,) in connection.execute(
+            text("SELECT id FROM products ORDER BY random() LIMIT :n"), {"n": args.writes * 2}
+        )
+    ]
+
+    def reprice():
+        for start in range(0, args.writes, args.batch):
+            with Session(bind=connection) as session:
+                ProductRepository(session).update_prices({
+                    id: Decimal(random.randint(100, 99_999)) / 100
+                    for id in ids[start:start + args.batch]
+                })
+                session.commit()
+
+    def delete():
+        for start in range(args.writes, args.writes * 2, args.batch):
+            with Session(bind=connection) as session:
+                ProductRepository(session).delete_many(ids[start:start + args.batch])
+                session.commit()
+
+    timed(f"link {args.writes} products", link)
+    timed(f"reprice {args.writes} products", reprice)
+    timed(f"delete {args.writes} products", delete)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=1_000_000)
+    parser.add_argument("--categories", type=int, default=100)
+    parser.add_argument("--reads", type=int, default=20)
+    parser.add_argument("--writes", type=int, default=10_000)
+    parser.add_argument("--batch", type=int, default=1000, help="products per transaction")
+    args = parser.parse_args()
+
+    with engine.connect() as connection:
+        connection.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        connection.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+        connection.commit()
+
+        # Unqualified names (ORM and text SQL alike) resolve to the scratch schema
+        connection.execute(text(f"SET search_path TO {SCHEMA}"))
+        Base.metadata.create_all(connection)
+        populate(connection, args.products, args.categories)
+        connection.commit()
+
+        try:
+            print("without triggers")
+            write(connection, args, 1)
+
+            # install_category_stats takes an engine; this one's sessions
+            # resolve names to the scratch schema too
+            scratch = create_engine(
+                engine.url, connect_args={"options": f"-c search_path={SCHEMA}"}
+            )
+            timed("install + rebuild", lambda: install_category_stats(scratch))
+            scratch.dispose()
+            connection.execute(text("ANALYZE"))
+            connection.commit()
+
+            print("with triggers")
+            write(connection, args, 2)
+
+            # Both reads must agree
+            with Session(bind=connection) as session:
+                rows = CategoryRepository(session).get_all_rows(limit=args.categories, stats=True)
+            expected = connection.execute(AGGREGATE, {"limit": args.categories}).all()
+            assert [
+                (row["id"], row["stats"]["product_count"], row["stats"]["avg_price"])
+                for row in rows
+            ] == [(row[0], row[2], row[5]) for row in expected]
+            connection.commit()
+
+            print(f"read {args.categories} categories with stats, {args.reads} times")
+
+            def aggregate():
+                for _ in range(args.reads):
+                    connection.execute(AGGREGATE, {"limit": args.categories}).all()
+
+            def summary():
+                with Session(bind=connection) as session:
+                    repository = CategoryRepository(session)
+                    for _ in range(args.reads):
+                        repository.get_all_rows(limit=args.categories, stats=True)
+
+            timed("aggregate products", aggregate)
+            timed("category_stats", summary)
+        finally:
+            connection.rollback()
+            connection.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+            connection.commit()
+
+
+if __name__ == "__main__":
+    main()
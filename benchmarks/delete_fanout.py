@@ -0,0 +1,171 @@
+"""
+Cost of deleting a category linked to many products, and of deleting a
+batch of products: the old ORM path (load the instance and its link
+collection, then session.delete) against the set-based
+CategoryRepository.delete / ProductRepository.delete_many.
+
+Usage:
+    DATABASE_URL=postgresql+psycopg2://... PYTHONPATH=. python benchmarks/delete_fanout.py \
+        --fanouts 1000,10000
+
+Works in a scratch schema (dropped afterwards). For every fan-out, links
+that many products to a fresh category, deletes it, and rolls back, so
+each run starts from the same data. Also reports the SQL statements each
+delete sends.
+"""
+import argparse
+import statistics
+import time
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from app.database import Base, engine
+from app.models.category import Category
+from app.models.product import Product
+from app.models.product_tombstone import ProductTombstone
+from app.repositories.category_repository import CategoryRepository
+from app.repositories.product_repository import ProductRepository
+
+
+SCHEMA = "bench_delete_fanout"
+
+
+def populate(connection, products: int) -> None:
+    connection.execute(text(
+        "INSERT INTO categories (id, name, created_at, updated_at) "
+        "VALUES (gen_random_uuid(), 'Fan-out', now(), now())"
+    ))
+
+    connection.execute(text(
+        "INSERT INTO products (id, name, price, sku, created_at, updated_at) "
+        "SELECT gen_random_uuid(), 'Product ' || g, (g % 1000) + 0.99, "
+        "'FANOUT-' || g, now(), now() "
+        "FROM generate_series(1, :n) g"
+    ), {"n": products})
+
+    connection.execute(text("ANALYZE"))
+
+
+def link(session: Session, category_id, fanout: int) -> None:
+    session.execute(text(
+        "INSERT INTO product_categories (product_id, category_id) "
+        "SELECT id, :category_id FROM products ORDER BY sku LIMIT :n"
+    ), {"category_id": category_id, "n": fanout})
+
+
+def legacy_category_delete(session: Session, category_id) -> None:
+    category = session.get(Category, category_id)
+
+    # What delete did before: touch every linked product
+    session.execute(text(
+        "UPDATE products SET updated_at = now() WHERE id IN ("
+        "SELECT product_id FROM product_categories WHERE category_id = :id)"
+    ), {"id": category_id})
+    # What session.delete did without passive_deletes: load the links
+    # so the unit of work can delete them row by row
+    category.products
+    session.delete(category)
+    session.flush()
+
+
+def current_category_delete(session: Session, category_id) -> None:
+    CategoryRepository(session).delete(category_id)
+    session.flush()
+
+
+def legacy_products_delete(session: Session, ids) -> None:
+    for id in ids:
+        product = session.get(Product, id)
+        product.categories
+        session.delete(product)
+        session.add(ProductTombstone(product_id=product.id, sku=product.sku))
+    session.flush()
+
+
+def current_products_delete(session: Session, ids) -> None:
+    ProductRepository(session).delete_many(ids)
+    session.flush()
+
+
+def time_delete(connection, delete, setup, runs: int):
+    timings, statements = [], []
+
+    for _ in range(runs):
+        transaction = connection.begin_nested()
+        with Session(bind=connection, join_transaction_mode="create_savepoint") as session:
+            target = setup(session)
+
+            executed = []
+            listener = lambda *args: executed.append(args[2])
+            event.listen(connection, "before_cursor_execute", listener)
+
+            started = time.perf_counter()
+            delete(session, target)
+            timings.append((time.perf_counter() - started) * 1000)
+
+            event.remove(connection, "before_cursor_execute", listener)
+            statements.append(len(executed))
+
+        transaction.rollback()
+
+    return statistics.median(timings), max(statements)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--fanouts", default="1000,10000", help="products per category")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    fanouts = [int(size) for size in args.fanouts.split(",")]
+
+    with engine.connect() as connection:
+        connection.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        connection.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+        connection.commit()
+
+        # Unqualified names (ORM and text SQL alike) resolve to the scratch schema
+        connection.execute(text(f"SET search_path TO {SCHEMA}"))
+        Base.metadata.create_all(connection)
+        populate(connection, max(fanouts))
+        connection.commit()
+
+        category_id = connection.execute(text("SELECT id FROM categories")).scalar()
+
+        try:
+            print(f"{'target':>9} {'variant':>8} {'fan-out':>8} {'median ms':>10} {'statements':>11}")
+
+            for fanout in fanouts:
+                def setup_category(session, fanout=fanout):
+                    link(session, category_id, fanout)
+                    return category_id
+
+                def setup_products(session, fanout=fanout):
+                    return [
+                        id for (id,) in session.execute(text(
+                            "SELECT id FROM products ORDER BY sku LIMIT :n"
+                        ), {"n": fanout})
+                    ]
+
+                for target, setup, variants in (
+                    ("category", setup_category, (
+                        ("legacy", legacy_category_delete),
+                        ("current", current_category_delete),
+                    )),
+                    ("products", setup_products, (
+                        ("legacy", legacy_products_delete),
+                        ("current", current_products_delete),
+                    )),
+                ):
+                    for name, delete in variants:
+                        median, statements = time_delete(connection, delete, setup, args.runs)
+                        print(f"{target:>9} {name:>8} {fanout:>8} {median:>10.1f} {statements:>11}")
+        finally:
+            connection.rollback()
+            connection.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+            connection.commit()
+
+
+if __name__ == "__main__":
+    main()
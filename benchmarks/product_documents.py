@@ -0,0 +1,137 @@
+"""
+Cost of serving product pages from the product_documents read model
+(PRODUCT_DOCUMENTS=true) against the regular plain-row path.
+
+Usage:
+    DATABASE_URL=postgresql+psycopg2://... PYTHONPATH=. python benchmarks/product_documents.py \
+        --products 100000 --limit 100 --pages 200
+
+Works in a scratch schema (dropped afterwards). Reports the one-off render
+time, then the time to build response bodies for `--pages` keyset pages of
+`--limit` products each way: rows (products + categories queries, projection
+and orjson encoding) vs documents (one query, bytes spliced together), and
+the time to re-render the documents of one category's products after the
+category is renamed.
+"""
+import argparse
+import time
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.database import Base, engine
+from app.documents import _render
+from app.models import product_document  # noqa: F401 (registers the table)
+from app.rendering import FULL_PROJECTION, dumps, project
+from app.repositories.product_repository import ProductRepository
+
+
+SCHEMA = "bench_product_documents"
+
+
+def populate(connection, products: int, categories: int) -> None:
+    connection.execute(text(
+        "INSERT INTO categories (id, name, description, created_at, updated_at) "
+        "SELECT gen_random_uuid(), 'Category ' || g, 'Description ' || g, now(), now() "
+        "FROM generate_series(1, :n) g"
+    ), {"n": categories})
+
+    connection.execute(text(
+        "INSERT INTO products (id, name, description, price, sku, created_at, updated_at) "
+        "SELECT gen_random_uuid(), 'Product ' || g, 'Description of product ' || g, "
+        "(g % 1000) + 0.99, 'DOC-' || g, now(), now() "
+        "FROM generate_series(1, :n) g"
+    ), {"n": products})
+
+    # Two categories per product
+    connection.execute(text(
+        "INSERT INTO product_categories (product_id, category_id) "
+        "SELECT p.id, c.id FROM products p "
+        "JOIN categories c ON c.name IN ("
+        "'Category ' || (1 + abs(hashtext(p.sku)) % :n), "
+        "'Category ' || (1 + abs(hashtext(p.sku || 'x')) % :n))"
+    ), {"n": categories})
+
+    connection.execute(text("ANALYZE"))
+
+
+def row_page(repository: ProductRepository, limit: int, after):
+    rows = repository.get_all_rows(limit=limit, after=after)
+    body = dumps([project(row, FULL_PROJECTION) for row in rows])
+    return rows, body
+
+
+def document_page(repository: ProductRepository, limit: int, after):
+    rows = repository.get_all_documents(limit=limit, after=after)
+    body = b"[" + b",".join(row["document"] for row in rows) + b"]"
+    return rows, body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--categories", type=int, default=100)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--pages", type=int, default=200)
+    args = parser.parse_args()
+
+    with engine.connect() as connection:
+        connection.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        connection.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+        connection.commit()
+
+        # Unqualified names (ORM and text SQL alike) resolve to the scratch schema
+        connection.execute(text(f"SET search_path TO {SCHEMA}"))
+        Base.metadata.create_all(connection)
+        populate(connection, args.products, args.categories)
+        connection.commit()
+
+        try:
+            with Session(bind=connection) as session:
+                started = time.perf_counter()
+                repository = ProductRepository(session)
+                _render(repository, repository.outdated_document_ids())
+                session.commit()
+                print(f"render {args.products} documents: {time.perf_counter() - started:.2f}s")
+
+            connection.execute(text("ANALYZE"))
+            connection.commit()
+
+            print(f"{'variant':>10} {'pages':>6} {'seconds':>8} {'pages/s':>8} {'KB/page':>8}")
+
+            for name, page in (("rows", row_page), ("documents", document_page)):
+                with Session(bind=connection) as session:
+                    repository = ProductRepository(session)
+                    after, size = None, 0
+                    started = time.perf_counter()
+
+                    for _ in range(args.pages):
+                        rows, body = page(repository, args.limit, after)
+                        size += len(body)
+                        after = (rows[-1]["name"], rows[-1]["id"])
+
+                    elapsed = time.perf_counter() - started
+                    print(
+                        f"{name:>10} {args.pages:>6} {elapsed:>8.2f} "
+                        f"{args.pages / elapsed:>8.0f} {size / args.pages / 1024:>8.1f}"
+                    )
+
+            # Write side: a category rename re-renders its products' documents
+            with Session(bind=connection) as session:
+                ids = list(session.execute(text(
+                    "SELECT product_id FROM product_categories pc "
+                    "JOIN categories c ON c.id = pc.category_id "
+                    "WHERE c.name = 'Category 1'"
+                )).scalars())
+                started = time.perf_counter()
+                _render(ProductRepository(session), ids)
+                session.commit()
+                print(f"re-render {len(ids)} documents of one category: {time.perf_counter() - started:.2f}s")
+        finally:
+            connection.rollback()
+            connection.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+            connection.commit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Per-row cost of serving a product page: ORM instances validated through
+ProductResponse (the response_model path) vs plain rows rendered by
+orjson (ProductRepository.get_all_rows + FastJSONResponse).
+
+Usage:
+    DATABASE_URL=postgresql+psycopg2://... PYTHONPATH=. python benchmarks/read_path.py \
+        --products 20000 --pages 100,1000,5000
+
+Generates the catalog in a scratch schema (dropped afterwards), each
+product with `--links` categories, then times reading and encoding the
+first page of every size. Reports the median over `--runs`, split into
+the query (including ORM hydration) and the encoding step.
+"""
+import argparse
+import statistics
+import time
+from typing import List
+
+from pydantic import TypeAdapter
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from starlette.responses import JSONResponse
+
+from app.api.responses import FastJSONResponse
+from app.database import Base, engine
+from app.rendering import FULL_PROJECTION, project
+from app.repositories.product_repository import ProductRepository
+from app.schemas.product import ProductResponse
+
+
+SCHEMA = "bench_read_path"
+
+PAGE = TypeAdapter(List[ProductResponse])
+
+
+def populate(connection, products: int, categories: int, links: int) -> None:
+    connection.execute(text(
+        "INSERT INTO categories (id, name, description, created_at, updated_at) "
+        "SELECT gen_random_uuid(), 'Category ' || g, 'Generated category', now(), now() "
+        "FROM generate_series(1, :n) g"
+    ), {"n": categories})
+
+    connection.execute(text(
+        "INSERT INTO products (id, name, description, price, sku, created_at, updated_at) "
+        "SELECT gen_random_uuid(), 'Product ' || g, repeat('Generated description. ', 20), "
+        "(g % 1000) + 0.99, 'READ-' || g, now(), now() "
+        "FROM generate_series(1, :n) g"
+    ), {"n": products})
+
+    connection.execute(text(
+        "INSERT INTO product_categories (product_id, category_id) "
+        "SELECT DISTINCT p.id, c.id "
+        "FROM products p "
+        "CROSS JOIN generate_series(1, :links) k "
+        "JOIN categories c "
+        "  ON c.name = 'Category ' || (1 + abs(hashtext(p.sku || ':' || k)) % :categories)"
+    ), {"links": links, "categories": categories})
+
+    connection.execute(text("ANALYZE"))
+
+
+def orm_page(session: Session, limit: int):
+    started = time.perf_counter()
+    products = ProductRepository(session).get_all(limit=limit)
+    loaded = time.perf_counter()
+
+    # What FastAPI does with response_model=List[ProductResponse]
+    validated = PAGE.validate_python(products, from_attributes=True)
+    body = JSONResponse(PAGE.dump_python(validated, mode="json")).body
+    encoded = time.perf_counter()
+
+    return loaded - started, encoded - loaded, len(body)
+
+
+def rows_page(session: Session, limit: int):
+    started = time.perf_counter()
+    rows = ProductRepository(session).get_all_rows(limit=limit)
+    loaded = time.perf_counter()
+
+    body = FastJSONResponse(
+        [project(item, FULL_PROJECTION) for item in rows]
+    ).body
+    encoded = time.perf_counter()
+
+    return loaded - started, encoded - loaded, len(body)
+
+
+def measure(session: Session, read, limit: int, runs: int):
+    query, encode = [], []
+
+    for _ in range(runs):
+        query_seconds, encode_seconds, size = read(session, limit)
+        query.append(query_seconds)
+        encode.append(encode_seconds)
+        session.expunge_all()
+
+    return statistics.median(query), statistics.median(encode), size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=20_000)
+    parser.add_argument("--categories", type=int, default=200)
+    parser.add_argument("--links", type=int, default=2, help="categories per product")
+    parser.add_argument("--pages", default="100,1000,5000", help="page sizes")
+    parser.add_argument("--runs", type=int, default=15)
+    args = parser.parse_args()
+
+    with engine.connect() as connection:
+        connection.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        connection.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+        connection.commit()
+
+        # Unqualified names (ORM and text SQL alike) resolve to the scratch schema
+        connection.execute(text(f"SET search_path TO {SCHEMA}"))
+        Base.metadata.create_all(connection)
+        populate(connection, args.products, args.categories, args.links)
+        connection.commit()
+
+        try:
+            with Session(bind=connection) as session:
+                print(
+                    f"{'path':>5} {'rows':>6} {'query ms':>9} {'encode ms':>10} "
+                    f"{'us/row':>8} {'bytes':>9}"
+                )
+                for limit in (int(size) for size in args.pages.split(",")):
+                    for name, read in (("orm", orm_page), ("rows", rows_page)):
+                        query, encode, size = measure(session, read, limit, args.runs)
+                        per_row = (query + encode) / limit * 1e6
+                        print(
+                            f"{name:>5} {limit:>6} {query * 1000:>9.1f} "
+                            f"{encode * 1000:>10.1f} {per_row:>8.1f} {size:>9}"
+                        )
+        finally:
+            connection.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+            connection.commit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Throughput of repricing products: the old select-then-mutate update
+(get_by_id with its categories, set the attribute, flush) against one
+UPDATE ... RETURNING per product (ProductRepository.update) and one
+UPDATE ... FROM (VALUES ...) per batch (ProductRepository.update_prices).
+
+Usage:
+    DATABASE_URL=postgresql+psycopg2://... PYTHONPATH=. python benchmarks/repricing.py \
+        --products 10000 --batch 1000
+
+Works in a scratch schema (dropped afterwards). Every variant reprices
+all products by ID, in transactions of `--batch` products.
+"""
+import argparse
+import random
+import time
+from decimal import Decimal
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.database import Base, engine
+from app.models.product import Product
+from app.repositories.product_repository import ProductRepository
+
+
+SCHEMA = "bench_repricing"
+
+
+def populate(connection, products: int, categories: int) -> None:
+    connection.execute(text(
+        "INSERT INTO categories (id, name, created_at, updated_at) "
+        "SELECT gen_random_uuid(), 'Category ' || g, now(), now() "
+        "FROM generate_series(1, :n) g"
+    ), {"n": categories})
+
+    connection.execute(text(
+        "INSERT INTO products (id, name, price, sku, created_at, updated_at) "
+        "SELECT gen_random_uuid(), 'Product ' || g, (g % 1000) + 0.99, "
+        "'PRICE-' || g, now(), now() "
+        "FROM generate_series(1, :n) g"
+    ), {"n": products})
+
+    connection.execute(text(
+        "INSERT INTO product_categories (product_id, category_id) "
+        "SELECT p.id, c.id FROM products p "
+        "JOIN categories c ON c.name = 'Category ' || (1 + abs(hashtext(p.sku)) % :n)"
+    ), {"n": categories})
+
+    connection.execute(text("ANALYZE"))
+
+
+def legacy_reprice(session: Session, prices) -> None:
+    repository = ProductRepository(session)
+
+    for id, price in prices.items():
+        product = repository.get_by_id(id)
+        product.price = price
+        session.flush()
+
+
+def single_reprice(session: Session, prices) -> None:
+    repository = ProductRepository(session)
+
+    for id, price in prices.items():
+        repository.update(id, Product(price=price))
+
+
+def bulk_reprice(session: Session, prices) -> None:
+    ProductRepository(session).update_prices(prices)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=10_000)
+    parser.add_argument("--categories", type=int, default=50)
+    parser.add_argument("--batch", type=int, default=1000, help="products per transaction")
+    args = parser.parse_args()
+
+    with engine.connect() as connection:
+        connection.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        connection.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+        connection.commit()
+
+        # Unqualified names (ORM and text SQL alike) resolve to the scratch schema
+        connection.execute(text(f"SET search_path TO {SCHEMA}"))
+        Base.metadata.create_all(connection)
+        populate(connection, args.products, args.categories)
+        connection.commit()
+
+        ids = [id for (id,) in connection.execute(text("SELECT id FROM products"))]
+
+        try:
+            print(f"{'variant':>8} {'products':>9} {'seconds':>8} {'products/s':>11}")
+
+            for name, reprice in (
+                ("legacy", legacy_reprice),
+                ("single", single_reprice),
+                ("bulk", bulk_reprice),
+            ):
+                started = time.perf_counter()
+
+                for start in range(0, len(ids), args.batch):
+                    prices = {
+                        id: Decimal(random.randint(100, 99_999)) / 100
+                        for id in ids[start:start + args.batch]
+                    }
+                    with Session(bind=connection) as session:
+                        reprice(session, prices)
+                        session.commit()
+
+                elapsed = time.perf_counter() - started
+                print(f"{name:>8} {len(ids):>9} {elapsed:>8.2f} {len(ids) / elapsed:>11.0f}")
+        finally:
+            connection.rollback()
+            connection.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+            connection.commit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Ingest throughput, WAL volume and index sizes with random (v4) vs
+time-ordered (v7) product IDs.
+
+Usage:
+    DATABASE_URL=postgresql+psycopg2://... PYTHONPATH=. python benchmarks/uuid_ingest.py \
+        --rows 10000000 --batch 10000
+
+For each version, creates the tables in a fresh scratch schema and loads
+`--rows` products, each linked to one of `--categories` categories, in
+committed batches of `--batch` rows (IDs generated in Python, as the app
+does). Then reports rows/s, the WAL written and the size of the indexes
+the IDs feed. Random keys hit a random leaf of every such index per row,
+so they fall behind once those indexes outgrow shared_buffers.
+"""
+import argparse
+import time
+import uuid
+
+from sqlalchemy import text
+
+from app.database import Base, engine
+from app.models.base import uuid7
+from app.models import category, product, product_tombstone  # noqa: F401 (registers the tables)
+
+
+SCHEMA = "bench_uuid_ingest"
+
+# Indexes keyed by the generated IDs, with their column labels
+INDEXES = {
+    "products_pkey": "pkey MB",
+    "product_categories_pkey": "links MB",
+    "idx_product_categories_category": "by cat MB",
+}
+
+
+def load(connection, generate, rows: int, batch: int, category_ids) -> None:
+    for start in range(0, rows, batch):
+        count = min(batch, rows - start)
+        ids = [str(generate()) for _ in range(count)]
+
+        connection.execute(text(
+            "INSERT INTO products (id, name, price, sku, created_at, updated_at) "
+            "SELECT id, 'Product ' || (:start + n), 9.99, 'UUID-' || (:start + n), now(), now() "
+            "FROM unnest(CAST(:ids AS uuid[])) WITH ORDINALITY AS t(id, n)"
+        ), {"ids": ids, "start": start})
+
+        connection.execute(text(
+            "INSERT INTO product_categories (product_id, category_id) "
+            "SELECT id, (CAST(:categories AS uuid[]))[1 + abs(hashtext(id::text)) % :count] "
+            "FROM unnest(CAST(:ids AS uuid[])) AS t(id)"
+        ), {"ids": ids, "categories": category_ids, "count": len(category_ids)})
+
+        connection.commit()
+
+
+def run(connection, version: int, generate, args) -> None:
+    connection.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+    connection.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    # Unqualified names (ORM and text SQL alike) resolve to the scratch schema
+    connection.execute(text(f"SET search_path TO {SCHEMA}"))
+    Base.metadata.create_all(connection)
+
+    category_ids = [str(generate()) for _ in range(args.categories)]
+    connection.execute(
+        text(
+            "INSERT INTO categories (id, name, created_at, updated_at) "
+            "SELECT id, 'Category ' || id, now(), now() "
+            "FROM unnest(CAST(:ids AS uuid[])) AS t(id)"
+        ),
+        {"ids": category_ids},
+    )
+    connection.commit()
+
+    wal_before = connection.execute(text("SELECT pg_current_wal_lsn()")).scalar()
+    started = time.perf_counter()
+
+    load(connection, generate, args.rows, args.batch, category_ids)
+
+    elapsed = time.perf_counter() - started
+    wal = connection.execute(
+        text("SELECT pg_wal_lsn_diff(pg_current_wal_lsn(), :before)"),
+        {"before": wal_before},
+    ).scalar()
+
+    sizes = dict(connection.execute(
+        text(
+            "SELECT indexname, pg_relation_size(format('%I.%I', schemaname, indexname)) "
+            "FROM pg_indexes WHERE schemaname = :schema"
+        ),
+        {"schema": SCHEMA},
+    ).all())
+
+    print(
+        f"v{version:<3} {args.rows:>10} {args.rows / elapsed:>8.0f} "
+        f"{int(wal) / 2**20:>8.0f} "
+        + " ".join(f"{sizes[name] / 2**20:>10.0f}" for name in INDEXES)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--batch", type=int, default=10_000)
+    parser.add_argument("--categories", type=int, default=100)
+    args = parser.parse_args()
+
+    with engine.connect() as connection:
+        print(
+            f"{'ids':<4} {'rows':>10} {'rows/s':>8} {'WAL MB':>8} "
+            + " ".join(f"{label:>10}" for label in INDEXES.values())
+        )
+
+        try:
+            for version, generate in ((4, uuid.uuid4), (7, uuid7)):
+                run(connection, version, generate, args)
+        finally:
+            connection.rollback()
+            connection.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+            connection.commit()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,12 @@
 
 CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
 
 
 CREATE TABLE products (
+    -- The app supplies IDs (time-ordered v7 with UUID_VERSION=7); these
+    -- defaults only serve raw inserts. On PostgreSQL 18+, DEFAULT uuidv7()
+    -- keeps those time-ordered too.
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
 
     name TEXT NOT NULL,
@@ -12,8 +16,17 @@ CREATE TABLE products (
 
     sku TEXT UNIQUE NOT NULL,
 
-    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    -- Transaction that last wrote the row; orders the change feed by commit
+    changed_xid BIGINT NOT NULL DEFAULT pg_current_xact_id()::text::bigint,
+
+    -- Full-text document: name matches (A) rank above description (B)
+    search_vector TSVECTOR GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'B')
+    ) STORED,
+
+    created_at TIMESTAMP NOT NULL DEFAULT timezone('UTC', now()),
+    updated_at TIMESTAMP NOT NULL DEFAULT timezone('UTC', now())
 );
 
 
@@ -24,8 +37,8 @@ CREATE TABLE categories (
     name TEXT UNIQUE NOT NULL,
     description TEXT,
 
-    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP NOT NULL DEFAULT timezone('UTC', now()),
+    updated_at TIMESTAMP NOT NULL DEFAULT timezone('UTC', now())
 );
 
 
@@ -37,31 +50,88 @@ CREATE TABLE product_categories (
 );
 
 
+-- Deleted products, reported by GET /products/changes
+CREATE TABLE product_tombstones (
+    product_id UUID PRIMARY KEY,
+    sku TEXT NOT NULL,
+    deleted_at TIMESTAMP NOT NULL DEFAULT timezone('UTC', now()),
+    deleted_xid BIGINT NOT NULL DEFAULT pg_current_xact_id()::text::bigint
+);
+
+
+-- Product count and price aggregates per category, for
+-- GET /categories?include=stats and GET /categories/{id}/stats. The
+-- functions and triggers maintaining it (on product_categories inserts /
+-- deletes, product deletes and price updates) are at the end of this file;
+-- the app installs them at startup from app/category_stats.py and rebuilds
+-- the table whenever they are missing.
+CREATE TABLE category_stats (
+    category_id UUID PRIMARY KEY REFERENCES categories(id) ON DELETE CASCADE,
+    product_count BIGINT NOT NULL DEFAULT 0,
+    price_sum DECIMAL(18, 2) NOT NULL DEFAULT 0,
+    min_price DECIMAL(10, 2),
+    max_price DECIMAL(10, 2),
+    updated_at TIMESTAMP NOT NULL
+);
+
+
+-- Read model (PRODUCT_DOCUMENTS=true): each product's rendered JSON body,
+-- rewritten in the transaction that changes the product or its categories
+CREATE TABLE product_documents (
+    id UUID PRIMARY KEY REFERENCES products(id) ON DELETE CASCADE,
+    updated_at TIMESTAMP NOT NULL,
+    categories_updated_at TIMESTAMP,
+    category_count INTEGER NOT NULL,
+    document BYTEA NOT NULL
+);
+
+
 CREATE INDEX idx_products_price
     ON products(price);
 
 
+-- Keyset pagination: ORDER BY name, id / WHERE (name, id) > (:name, :id)
+CREATE INDEX idx_products_name_id
+    ON products(name, id);
+
+-- Change feed: ORDER BY changed_xid, id / WHERE (changed_xid, id) > (:xid, :id),
+-- bounded by pg_snapshot_xmin(pg_current_snapshot())
+CREATE INDEX idx_products_changed_xid_id
+    ON products(changed_xid, id);
+
+CREATE INDEX idx_product_tombstones_deleted_xid_id
+    ON product_tombstones(deleted_xid, product_id);
+
+CREATE INDEX idx_categories_name_id
+    ON categories(name, id);
+
+
 CREATE INDEX idx_product_categories_product
     ON product_categories(product_id);
 
+-- Category filters: covers product_id so they stay index-only
 CREATE INDEX idx_product_categories_category
-    ON product_categories(category_id);
+    ON product_categories(category_id, product_id);
 
 
-CREATE INDEX idx_products_name_desc
-ON products
-USING GIN (
-    to_tsvector(
-        'english',
-        name || ' ' || COALESCE(description, '')
-    )
-);
+CREATE INDEX idx_products_search_vector
+    ON products
+    USING GIN (search_vector);
+
+-- Autocomplete / fuzzy search (ILIKE and word similarity)
+CREATE INDEX idx_products_name_trgm
+    ON products
+    USING GIN (name gin_trgm_ops);
+
+CREATE INDEX idx_products_sku_trgm
+    ON products
+    USING GIN (sku gin_trgm_ops);
 
 
 CREATE OR REPLACE FUNCTION update_updated_at_column()
 RETURNS TRIGGER AS $$
 BEGIN
-   NEW.updated_at = NOW();
+   NEW.updated_at = timezone('UTC', now());
    RETURN NEW;
 END;
 $$ language 'plpgsql';
@@ -77,3 +147,178 @@ CREATE TRIGGER trg_categories_updated_at
 BEFORE UPDATE ON categories
 FOR EACH ROW
 EXECUTE FUNCTION update_updated_at_column();
+
+
+-- category_stats maintenance. The app installs the same functions and
+-- triggers at startup from app/category_stats.py (a test keeps the two in
+-- step). 10000 is the default CATEGORY_STATS_WALK_THRESHOLD.
+CREATE OR REPLACE FUNCTION category_price_bound(
+    category UUID, lowest BOOLEAN, skip_product UUID DEFAULT NULL
+) RETURNS NUMERIC LANGUAGE plpgsql STABLE AS $$
+BEGIN
+    IF coalesce(
+        (SELECT product_count FROM category_stats WHERE category_id = category), 0
+    ) < 10000 THEN
+        RETURN (
+            SELECT CASE WHEN lowest THEN min(p.price) ELSE max(p.price) END
+            FROM product_categories pc
+            JOIN products p ON p.id = pc.product_id
+            WHERE pc.category_id = category
+              AND p.id IS DISTINCT FROM skip_product
+        );
+    ELSIF lowest THEN
+        RETURN (
+            SELECT p.price FROM products p
+            WHERE EXISTS (
+                SELECT 1 FROM product_categories pc
+                WHERE pc.product_id = p.id AND pc.category_id = category
+            )
+            AND p.id IS DISTINCT FROM skip_product
+            ORDER BY p.price LIMIT 1
+        );
+    END IF;
+    RETURN (
+        SELECT p.price FROM products p
+        WHERE EXISTS (
+            SELECT 1 FROM product_categories pc
+            WHERE pc.product_id = p.id AND pc.category_id = category
+        )
+        AND p.id IS DISTINCT FROM skip_product
+        ORDER BY p.price DESC LIMIT 1
+    );
+END
+$$;
+
+CREATE OR REPLACE FUNCTION category_stats_links_added() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO category_stats AS s
+        (category_id, product_count, price_sum, min_price, max_price, updated_at)
+    SELECT a.category_id, count(*), sum(p.price), min(p.price), max(p.price), timezone('UTC', now())
+    FROM added_links a
+    JOIN products p ON p.id = a.product_id
+    GROUP BY a.category_id
+    ORDER BY a.category_id
+    ON CONFLICT (category_id) DO UPDATE SET
+        product_count = s.product_count + excluded.product_count,
+        price_sum = s.price_sum + excluded.price_sum,
+        min_price = LEAST(s.min_price, excluded.min_price),
+        max_price = GREATEST(s.max_price, excluded.max_price),
+        updated_at = excluded.updated_at;
+    RETURN NULL;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION category_stats_links_removed() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM 1 FROM category_stats
+    WHERE category_id IN (
+        SELECT l.category_id FROM removed_links l
+        JOIN products p ON p.id = l.product_id
+    )
+    ORDER BY category_id
+    FOR UPDATE;
+
+    UPDATE category_stats s SET
+        product_count = s.product_count - r.removed,
+        price_sum = s.price_sum - r.total,
+        min_price = CASE WHEN r.lowest > s.min_price THEN s.min_price
+            ELSE category_price_bound(s.category_id, TRUE) END,
+        max_price = CASE WHEN r.highest < s.max_price THEN s.max_price
+            ELSE category_price_bound(s.category_id, FALSE) END,
+        updated_at = timezone('UTC', now())
+    FROM (
+        SELECT l.category_id, count(*) AS removed, sum(p.price) AS total,
+               min(p.price) AS lowest, max(p.price) AS highest
+        FROM removed_links l
+        JOIN products p ON p.id = l.product_id
+        GROUP BY l.category_id
+    ) r
+    WHERE s.category_id = r.category_id;
+    RETURN NULL;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION category_stats_product_deleted() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM 1 FROM category_stats
+    WHERE category_id IN (
+        SELECT category_id FROM product_categories WHERE product_id = OLD.id
+    )
+    ORDER BY category_id
+    FOR UPDATE;
+
+    UPDATE category_stats s SET
+        product_count = s.product_count - 1,
+        price_sum = s.price_sum - OLD.price,
+        min_price = CASE WHEN OLD.price > s.min_price THEN s.min_price
+            ELSE category_price_bound(s.category_id, TRUE, OLD.id) END,
+        max_price = CASE WHEN OLD.price < s.max_price THEN s.max_price
+            ELSE category_price_bound(s.category_id, FALSE, OLD.id) END,
+        updated_at = timezone('UTC', now())
+    FROM product_categories pc
+    WHERE pc.product_id = OLD.id
+      AND s.category_id = pc.category_id;
+    RETURN OLD;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION category_stats_prices_changed() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM 1 FROM category_stats
+    WHERE category_id IN (
+        SELECT pc.category_id FROM new_products n
+        JOIN old_products o ON o.id = n.id AND o.price <> n.price
+        JOIN product_categories pc ON pc.product_id = n.id
+    )
+    ORDER BY category_id
+    FOR UPDATE;
+
+    UPDATE category_stats s SET
+        price_sum = s.price_sum + d.delta,
+        min_price = CASE WHEN d.old_lowest > s.min_price
+            THEN LEAST(s.min_price, d.new_lowest)
+            ELSE category_price_bound(s.category_id, TRUE) END,
+        max_price = CASE WHEN d.old_highest < s.max_price
+            THEN GREATEST(s.max_price, d.new_highest)
+            ELSE category_price_bound(s.category_id, FALSE) END,
+        updated_at = timezone('UTC', now())
+    FROM (
+        SELECT pc.category_id, sum(n.price - o.price) AS delta,
+               min(o.price) AS old_lowest, max(o.price) AS old_highest,
+               min(n.price) AS new_lowest, max(n.price) AS new_highest
+        FROM new_products n
+        JOIN old_products o ON o.id = n.id AND o.price <> n.price
+        JOIN product_categories pc ON pc.product_id = n.id
+        GROUP BY pc.category_id
+    ) d
+    WHERE s.category_id = d.category_id;
+    RETURN NULL;
+END
+$$;
+
+CREATE TRIGGER trg_product_categories_stats_insert
+AFTER INSERT ON product_categories
+REFERENCING NEW TABLE AS added_links
+FOR EACH STATEMENT
+EXECUTE FUNCTION category_stats_links_added();
+
+CREATE TRIGGER trg_product_categories_stats_delete
+AFTER DELETE ON product_categories
+REFERENCING OLD TABLE AS removed_links
+FOR EACH STATEMENT
+EXECUTE FUNCTION category_stats_links_removed();
+
+CREATE TRIGGER trg_products_stats_delete
+BEFORE DELETE ON products
+FOR EACH ROW
+EXECUTE FUNCTION category_stats_product_deleted();
+
+CREATE TRIGGER trg_products_stats_price
+AFTER UPDATE ON products
+REFERENCING OLD TABLE AS old_products NEW TABLE AS new_products
+FOR EACH STATEMENT
+EXECUTE FUNCTION category_stats_prices_changed();
@@ -51,4 +51,14 @@ def setup_test_db():
 
 @pytest.fixture(scope="function")
 def client():
-    return TestClient(app)
+    # Entering the client runs the lifespan, which disposes the async
+    # engine so pooled asyncpg connections never outlive their event loop.
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture(scope="function")
+def without_documents(monkeypatch):
+    # With PRODUCT_DOCUMENTS on, GET /products/{id} serves the
+    # product_documents read model and never consults the product cache
+    monkeypatch.setattr("app.api.product_routes.PRODUCT_DOCUMENTS", False)
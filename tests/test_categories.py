@@ -1,3 +1,12 @@
+import math
+
+from sqlalchemy import event, text
+
+from app.config import PRODUCT_DOCUMENTS
+from app.database import async_engine, engine
+from app.documents import DOCUMENT_CHUNK_SIZE
+
+
 def test_create_category(client):
 
     response = client.post(
@@ -47,3 +56,339 @@ def test_delete_category(client):
     delete_res = client.delete(f"/categories/{category_id}")
 
     assert delete_res.status_code == 204
+
+
+def test_delete_category_with_many_products(client):
+
+    category_id = client.post(
+        "/categories", json={"name": "Crowded category"}
+    ).json()["id"]
+
+    client.post(
+        "/products/bulk",
+        json=[
+            {
+                "name": f"Crowded product {number}",
+                "price": "1.00",
+                "sku": f"CROWD-{number:05d}",
+                "category_ids": [category_id],
+            }
+            for number in range(2000)
+        ],
+    )
+    product = client.post(
+        "/products/batch-get", json={"skus": ["CROWD-00000"]}
+    ).json()["results"][0]["product"]
+    assert product["categories"][0]["id"] == category_id
+
+    # Cached before the delete. A second, newer category keeps the newest
+    # category updated_at the same across the delete
+    client.post("/categories", json={"name": "Crowded neighbour"})
+    neighbour = client.get("/categories?limit=100").json()
+    neighbour = next(c["id"] for c in neighbour if c["name"] == "Crowded neighbour")
+    client.put(
+        f"/products/{product['id']}", json={"category_ids": [category_id, neighbour]}
+    )
+    before = client.get(f"/products/{product['id']}")
+    product = before.json()
+
+    def written_products():
+        with engine.connect() as connection:
+            return connection.execute(text(
+                "SELECT count(*) FROM products "
+                "WHERE sku LIKE 'CROWD-%' AND xmin::text::bigint >= :xid"
+            ), {"xid": xid}).scalar()
+
+    with engine.connect() as connection:
+        xid = connection.execute(text("SELECT pg_current_xact_id()::text::bigint")).scalar()
+        connection.commit()
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engines = (engine, async_engine.sync_engine)
+    for target in engines:
+        event.listen(target, "before_cursor_execute", record)
+    try:
+        response = client.delete(f"/categories/{category_id}")
+    finally:
+        for target in engines:
+            event.remove(target, "before_cursor_execute", record)
+
+    assert response.status_code == 204
+
+    # The links go with the category: nothing loads or deletes them row
+    # by row, and no product row is written, whatever the fan-out. With
+    # PRODUCT_DOCUMENTS on, the products' documents are re-rendered in
+    # chunks: products, categories and INSERT per DOCUMENT_CHUNK_SIZE
+    renders = 3 * math.ceil(2000 / DOCUMENT_CHUNK_SIZE) if PRODUCT_DOCUMENTS else 0
+    assert len(statements) <= 4 + renders
+    assert not any(
+        statement.lstrip().upper().startswith(("UPDATE", "DELETE FROM PRODUCT_CATEGORIES"))
+        for statement in statements
+    )
+    assert written_products() == 0
+
+    # Still a new representation: new ETag, fresh from the cache
+    updated = client.get(
+        f"/products/{product['id']}", headers={"If-None-Match": before.headers["ETag"]}
+    )
+    assert updated.status_code == 200
+    assert [c["id"] for c in updated.json()["categories"]] == [neighbour]
+    assert updated.json()["updated_at"] == product["updated_at"]
+
+    assert client.delete(f"/categories/{category_id}").status_code == 404
+
+
+def test_list_categories_cursor_pagination(client):
+
+    for name in ("Cursor Gamma", "Cursor Alpha", "Cursor Beta"):
+        res = client.post("/categories", json={"name": name})
+        assert res.status_code == 201
+
+    names = []
+    params = {"limit": 2}
+
+    while True:
+        response = client.get("/categories", params=params)
+        assert response.status_code == 200
+
+        names.extend(item["name"] for item in response.json())
+
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+        params = {"limit": 2, "cursor": cursor}
+
+    assert names == sorted(names)
+    assert len(names) == len(set(names))
+    assert {"Cursor Alpha", "Cursor Beta", "Cursor Gamma"} <= set(names)
+
+
+def test_list_categories_total_count(client):
+
+    client.post("/categories", json={"name": "Counted category"})
+
+    response = client.get("/categories?limit=1&count=exact")
+
+    assert response.status_code == 200
+    assert int(response.headers["X-Total-Count"]) >= 1
+    assert len(response.json()) == 1
+
+
+def test_list_categories_invalid_cursor(client):
+
+    response = client.get("/categories?cursor=not-a-cursor")
+
+    assert response.status_code == 400
+
+
+def test_update_category(client):
+
+    res = client.post("/categories", json={"name": "Garden"})
+    category_id = res.json()["id"]
+
+    response = client.put(
+        f"/categories/{category_id}",
+        json={"description": "Garden tools"}
+    )
+
+    assert response.status_code == 200
+    assert response.json()["description"] == "Garden tools"
+
+
+def test_get_category_conditional(client):
+
+    category_id = client.post(
+        "/categories", json={"name": "Etag category"}
+    ).json()["id"]
+
+    etag = client.get(f"/categories/{category_id}").headers["ETag"]
+
+    response = client.get(f"/categories/{category_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    client.put(f"/categories/{category_id}", json={"description": "Changed"})
+
+    response = client.get(f"/categories/{category_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["description"] == "Changed"
+
+
+def test_category_stats(client):
+
+    phones = client.post("/categories", json={"name": "Stats phones"}).json()["id"]
+    cases = client.post("/categories", json={"name": "Stats cases"}).json()["id"]
+
+    def create(sku, price, category_ids):
+        return client.post(
+            "/products",
+            json={"name": f"Stats {sku}", "price": price, "sku": sku,
+                  "category_ids": category_ids}
+        ).json()["id"]
+
+    def stats(category_id):
+        data = client.get(f"/categories/{category_id}/stats").json()
+        return (data["product_count"], data["min_price"], data["max_price"], data["avg_price"])
+
+    def recomputed(category_id):
+        with engine.connect() as connection:
+            row = connection.execute(text(
+                "SELECT count(*), min(p.price), max(p.price), round(avg(p.price), 2) "
+                "FROM product_categories pc JOIN products p ON p.id = pc.product_id "
+                "WHERE pc.category_id = :id"
+            ), {"id": category_id}).one()
+        return (row[0], *(None if value is None else str(value) for value in row[1:]))
+
+    empty = client.get(f"/categories/{cases}/stats")
+    assert empty.status_code == 200
+    assert stats(cases) == (0, None, None, None)
+
+    cheap = create("STAT-001", "10.00", [phones])
+    dear = create("STAT-002", "30.00", [phones, cases])
+    create("STAT-003", "20.00", [phones])
+
+    assert stats(phones) == (3, "10.00", "30.00", "20.00")
+    assert stats(cases) == (1, "30.00", "30.00", "30.00")
+
+    # Repricing the min / max product, moving links, bulk upserts and deletes
+    client.put(f"/products/{cheap}", json={"price": "15.00"})
+    client.patch("/products/prices", json=[{"sku": "STAT-002", "price": "5.00"}])
+    client.put(f"/products/{cheap}", json={"category_ids": [cases]})
+    client.post("/products/bulk", json=[
+        {"name": "Stats STAT-003", "price": "40.00", "sku": "STAT-003",
+         "category_ids": [phones]},
+        {"name": "Stats STAT-004", "price": "1.00", "sku": "STAT-004",
+         "category_ids": [phones, cases]},
+    ])
+    client.delete(f"/products/{dear}")
+
+    for category_id in (phones, cases):
+        assert stats(category_id) == recomputed(category_id)
+    assert stats(phones) == (2, "1.00", "40.00", "20.50")
+
+    # Listing embeds the same stats; stats changes change the ETag
+    listing = client.get("/categories?include=stats&limit=100")
+    embedded = {item["id"]: item["stats"] for item in listing.json()}
+    assert embedded[phones]["product_count"] == 2
+    assert embedded[cases]["avg_price"] == "8.00"
+    assert "stats" not in client.get("/categories?limit=100").json()[0]
+
+    etag = listing.headers["ETag"]
+    assert client.get(
+        "/categories?include=stats&limit=100", headers={"If-None-Match": etag}
+    ).status_code == 304
+
+    client.patch("/products/prices", json=[{"sku": "STAT-004", "price": "2.00"}])
+    assert client.get(
+        "/categories?include=stats&limit=100", headers={"If-None-Match": etag}
+    ).status_code == 200
+
+    client.delete(f"/categories/{phones}")
+    assert client.get(f"/categories/{phones}/stats").status_code == 404
+    assert stats(cases) == recomputed(cases)
+
+
+def test_category_price_bound_strategies(client):
+
+    from app.category_stats import CATEGORY_PRICE_BOUND, CATEGORY_STATS_WALK_THRESHOLD
+
+    bounded = client.post("/categories", json={"name": "Bound category"}).json()["id"]
+
+    # Unlinked products at both ends of the price range
+    ids = {
+        price: client.post(
+            "/products",
+            json={"name": f"Bound {price}", "price": price, "sku": f"BND-{price[:-3]}",
+                  "category_ids": category_ids}
+        ).json()["id"]
+        for price, category_ids in (
+            ("1.00", []),
+            ("10.00", [bounded]),
+            ("20.00", [bounded]),
+            ("30.00", [bounded]),
+            ("99.00", []),
+        )
+    }
+
+    def bounds():
+        with engine.connect() as connection:
+            return tuple(
+                str(value) for value in connection.execute(text(
+                    "SELECT category_price_bound(:id, TRUE), "
+                    "category_price_bound(:id, FALSE), "
+                    "category_price_bound(:id, TRUE, :skip), "
+                    "category_price_bound(:id, FALSE, :skip)"
+                ), {"id": bounded, "skip": ids["10.00"]}).one()
+            )
+
+    def install(walk_threshold):
+        with engine.begin() as connection:
+            connection.execute(text(CATEGORY_PRICE_BOUND.format(walk_threshold=walk_threshold)))
+
+    # Aggregating the category and walking the price index agree
+    assert bounds() == ("10.00", "30.00", "20.00", "30.00")
+    try:
+        install(0)
+        assert bounds() == ("10.00", "30.00", "20.00", "30.00")
+    finally:
+        install(CATEGORY_STATS_WALK_THRESHOLD)
+
+
+def test_schema_sql_matches_category_stats():
+
+    from app.category_stats import CATEGORY_STATS_FUNCTIONS, CATEGORY_STATS_TRIGGERS
+
+    def normalized(sql):
+        return " ".join(sql.split()).rstrip(";")
+
+    with open("schema.sql") as schema_file:
+        schema = normalized(schema_file.read())
+
+    for statement in CATEGORY_STATS_FUNCTIONS:
+        assert normalized(statement) in schema
+    for (name, _), definition in CATEGORY_STATS_TRIGGERS.items():
+        assert normalized(f"CREATE TRIGGER {name} {definition}") in schema
+
+
+def test_update_category_leaves_products_alone(client):
+
+    category_id = client.post("/categories", json={"name": "Edited category"}).json()["id"]
+    product = client.post(
+        "/products",
+        json={"name": "Edited product", "price": "1.00", "sku": "EDIT-001",
+              "category_ids": [category_id]}
+    ).json()
+    before = client.get(f"/products/{product['id']}")
+
+    token = client.get("/products/changes", params={"limit": 1000}).json()["next_token"]
+    while True:
+        page = client.get("/products/changes", params={"since": token, "limit": 1000}).json()
+        if page["next_token"] == token:
+            break
+        token = page["next_token"]
+
+    with engine.connect() as connection:
+        xmin = connection.execute(
+            text("SELECT xmin::text FROM products WHERE id = :id"), {"id": product["id"]}
+        ).scalar()
+
+    client.put(f"/categories/{category_id}", json={"name": "Renamed edited category"})
+
+    with engine.connect() as connection:
+        assert connection.execute(
+            text("SELECT xmin::text FROM products WHERE id = :id"), {"id": product["id"]}
+        ).scalar() == xmin
+
+    # A new representation all the same, but not a product change
+    after = client.get(
+        f"/products/{product['id']}", headers={"If-None-Match": before.headers["ETag"]}
+    )
+    assert after.status_code == 200
+    assert after.json()["categories"][0]["name"] == "Renamed edited category"
+    assert after.json()["updated_at"] == product["updated_at"]
+
+    page = client.get("/products/changes", params={"since": token, "limit": 1000}).json()
+    assert page["updated"] == []
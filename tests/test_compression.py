@@ -0,0 +1,119 @@
+import asyncio
+import zlib
+
+from starlette.responses import StreamingResponse
+
+from app.compression import CompressionMiddleware, GzipEncoder, negotiate
+
+
+def test_negotiate_encoding():
+
+    available = ["zstd", "br", "gzip"]
+
+    assert negotiate("gzip, deflate", available) == "gzip"
+    assert negotiate("gzip;q=0.5, br", available) == "br"
+    assert negotiate("br;q=0, gzip;q=0.1", available) == "gzip"
+    assert negotiate("*", available) == "zstd"
+    assert negotiate("*;q=0.5, zstd;q=0", available) == "br"
+    assert negotiate("identity", available) is None
+    assert negotiate("", available) is None
+
+
+def test_compresses_large_responses(client):
+
+    for number in range(5):
+        client.post(
+            "/products",
+            json={
+                "name": f"Compressible product {number}",
+                "description": "Long description. " * 50,
+                "price": "1.00",
+                "sku": f"GZIP-{number:03d}",
+            }
+        )
+
+    response = client.get(
+        "/products/search?q=compressible&limit=5",
+        headers={"Accept-Encoding": "gzip"},
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert len(response.json()) == 5
+
+    response = client.get(
+        "/products/search?q=compressible&limit=5",
+        headers={"Accept-Encoding": "identity"},
+    )
+    assert "content-encoding" not in response.headers
+
+    # Below the size threshold
+    response = client.get("/health", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+
+
+def test_compressed_etag_still_matches(client):
+
+    product = client.post(
+        "/products",
+        json={
+            "name": "Compressed etag product",
+            "description": "Long description. " * 100,
+            "price": "1.00",
+            "sku": "GZIP-ETAG-001",
+        }
+    ).json()
+
+    response = client.get(
+        f"/products/{product['id']}", headers={"Accept-Encoding": "gzip"}
+    )
+    etag = response.headers["ETag"]
+    assert etag.startswith("W/")
+
+    response = client.get(
+        f"/products/{product['id']}",
+        headers={"Accept-Encoding": "gzip", "If-None-Match": etag},
+    )
+    assert response.status_code == 304
+
+
+def test_compresses_streams_chunk_by_chunk():
+
+    async def chunks():
+        for number in range(3):
+            yield f'{{"row": {number}}}\n' * 10
+
+    app = CompressionMiddleware(
+        StreamingResponse(chunks(), media_type="application/x-ndjson"),
+        minimum_size=1024,
+        encoders={"gzip": GzipEncoder},
+    )
+
+    messages = []
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "headers": [(b"accept-encoding", b"gzip")],
+    }
+    asyncio.run(app(scope, receive, send))
+
+    start, *bodies = messages
+    assert (b"content-encoding", b"gzip") in start["headers"]
+
+    # Every chunk is flushed as it arrives, so it decodes on its own
+    decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    first = decoder.decompress(bodies[0]["body"])
+    assert first == b'{"row": 0}\n' * 10
+
+    rest = b"".join(decoder.decompress(body["body"]) for body in bodies[1:])
+    assert rest == b'{"row": 1}\n' * 10 + b'{"row": 2}\n' * 10
+    assert decoder.eof
@@ -4,3 +4,28 @@ def test_health_check(client):
 
     assert response.status_code == 200
     assert response.json() == {"status": "UP"}
+
+
+def test_pool_stats(client):
+
+    client.get("/categories")
+
+    response = client.get("/health/pool")
+
+    assert response.status_code == 200
+
+    data = response.json()
+    assert data["sync"]["checkouts"] >= 1
+    assert data["sync"]["in_use"] == 0
+    assert "wait_seconds_max" in data["sync"]
+
+
+def test_cache_stats(client):
+
+    response = client.get("/health/cache")
+
+    assert response.status_code == 200
+
+    data = response.json()
+    assert set(data) == {"products", "categories"}
+    assert {"hits", "misses", "evictions", "invalidations"} <= set(data["products"])
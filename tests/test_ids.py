@@ -0,0 +1,19 @@
+import time
+
+from app.models.base import uuid7
+
+
+def test_uuid7():
+
+    before = time.time_ns() // 1_000_000
+    ids = [uuid7() for _ in range(1000)]
+    after = time.time_ns() // 1_000_000
+
+    assert all(id.version == 7 for id in ids)
+    assert all(id.variant == "specified in RFC 4122" for id in ids)
+    assert len(set(ids)) == len(ids)
+
+    # Time-ordered: the timestamp (and sub-millisecond) bits never go back
+    timestamps = [id.int >> 64 for id in ids]
+    assert timestamps == sorted(timestamps)
+    assert before <= ids[0].int >> 80 <= ids[-1].int >> 80 <= after
@@ -1,4 +1,15 @@
+import asyncio
+import json
+import time
 import uuid
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import text
+
+from app.config import CACHE_NOTIFY
+from app.database import async_engine, engine
+from app.services.async_product_service import AsyncProductService
 
 
 def create_sample_category(client):
@@ -97,3 +108,1222 @@ def test_delete_product(client):
     get_res = client.get(f"/products/{product_id}")
 
     assert get_res.status_code == 404
+
+
+def test_search_products_cursor_pagination(client):
+
+    res = client.post("/categories", json={"name": "Paging"})
+    category_id = res.json()["id"]
+
+    for sku in ("PAG-003", "PAG-001", "PAG-002"):
+        res = client.post(
+            "/products",
+            json={
+                "name": "Pager",
+                "description": "Paging fixture",
+                "price": "10.00",
+                "sku": sku,
+                "category_ids": [category_id]
+            }
+        )
+        assert res.status_code == 201
+
+    first = client.get("/products/search?q=pager&limit=2")
+
+    assert first.status_code == 200
+    assert len(first.json()) == 2
+
+    cursor = first.headers["X-Next-Cursor"]
+    second = client.get(f"/products/search?q=pager&limit=2&cursor={cursor}")
+
+    assert second.status_code == 200
+    assert len(second.json()) == 1
+
+    ids = [item["id"] for item in first.json() + second.json()]
+    assert len(set(ids)) == 3
+
+
+def test_update_product_categories(client):
+
+    res = client.post("/categories", json={"name": "Loading"})
+    category_id = res.json()["id"]
+
+    res = client.post(
+        "/products",
+        json={
+            "name": "Keyboard",
+            "price": "70.00",
+            "sku": "KEY-001"
+        }
+    )
+
+    assert res.status_code == 201
+    assert res.json()["categories"] == []
+
+    product_id = res.json()["id"]
+
+    response = client.put(
+        f"/products/{product_id}",
+        json={
+            "price": "65.00",
+            "category_ids": [category_id]
+        }
+    )
+
+    assert response.status_code == 200
+    assert response.json()["price"] == "65.00"
+    assert [c["id"] for c in response.json()["categories"]] == [category_id]
+
+    listed = client.get("/products/search?q=keyboard").json()
+    assert [c["name"] for c in listed[0]["categories"]] == ["Loading"]
+
+
+def test_async_product_service():
+
+    async def scenario():
+        service = AsyncProductService()
+
+        try:
+            created = await service.create_product(
+                name="Async Widget",
+                price=Decimal("5.00"),
+                sku="ASY-001",
+            )
+            fetched = await service.get_product(created.id)
+            listed = await service.search_products(keyword="widget")
+        finally:
+            await async_engine.dispose()
+
+        return created, fetched, listed
+
+    created, fetched, listed = asyncio.run(scenario())
+
+    assert fetched.sku == "ASY-001"
+    assert fetched.categories == []
+    assert created.id in [product.id for product in listed]
+
+
+def test_create_product_reports_missing_categories(client):
+
+    res = client.post("/categories", json={"name": "Batch Resolve"})
+    category_id = res.json()["id"]
+    missing_id = str(uuid.uuid4())
+
+    response = client.post(
+        "/products",
+        json={
+            "name": "Monitor",
+            "price": "150.00",
+            "sku": "MON-001",
+            "category_ids": [category_id, missing_id, category_id]
+        }
+    )
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == f"Categories not found: {missing_id}"
+
+    response = client.post(
+        "/products",
+        json={
+            "name": "Monitor",
+            "price": "150.00",
+            "sku": "MON-001",
+            "category_ids": [category_id, category_id]
+        }
+    )
+
+    assert response.status_code == 201
+    assert len(response.json()["categories"]) == 1
+
+
+def test_bulk_upsert_products(client):
+
+    res = client.post("/categories", json={"name": "Bulk"})
+    category_id = res.json()["id"]
+
+    response = client.post(
+        "/products/bulk",
+        json=[
+            {"name": "Bulk One", "price": "1.00", "sku": "BLK-001",
+             "category_ids": [category_id]},
+            {"name": "Bulk Two", "price": "2.00", "sku": "BLK-002"},
+            {"name": "Bulk Bad", "price": "-1", "sku": "BLK-003"},
+            {"name": "Bulk Orphan", "price": "3.00", "sku": "BLK-004",
+             "category_ids": [str(uuid.uuid4())]},
+        ]
+    )
+
+    assert response.status_code == 200
+
+    data = response.json()
+    assert (data["created"], data["updated"], data["failed"]) == (2, 0, 2)
+    assert [r["status"] for r in data["results"]] == [
+        "created", "created", "error", "error"
+    ]
+
+    ndjson = "\n".join([
+        '{"name": "Bulk One v2", "price": "1.50", "sku": "BLK-001"}',
+        "not json",
+    ])
+    response = client.post(
+        "/products/bulk",
+        content=ndjson,
+        headers={"Content-Type": "application/x-ndjson"}
+    )
+
+    data = response.json()
+    assert [r["status"] for r in data["results"]] == ["updated", "error"]
+
+    product = client.get(f"/products/{data['results'][0]['id']}").json()
+    assert product["name"] == "Bulk One v2"
+    assert [c["id"] for c in product["categories"]] == [category_id]
+
+
+def test_bulk_upsert_streams_ndjson_in_chunks(client, monkeypatch):
+
+    monkeypatch.setattr("app.api.product_routes.BULK_CHUNK_SIZE", 2)
+
+    lines = [
+        '{"name": "Streamed One", "price": "1.00", "sku": "STR-001"}',
+        "",
+        "[1, 2]",
+        '{"name": "Streamed Two", "price": "2.00", "sku": "STR-002"}',
+        '{"name": "Streamed Three", "price": "3.00", "sku": "STR-003"}',
+        '{"name": "Streamed One v2", "price": "1.50", "sku": "STR-001"}',
+    ]
+
+    def body():
+        # Lines split across chunks of the request body
+        data = "\n".join(lines).encode()
+        for start in range(0, len(data), 7):
+            yield data[start:start + 7]
+
+    response = client.post(
+        "/products/bulk",
+        content=body(),
+        headers={"Content-Type": "application/x-ndjson"}
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert [(r["index"], r["status"]) for r in data["results"]] == [
+        (0, "created"), (1, "error"), (2, "created"), (3, "created"), (4, "updated"),
+    ]
+    # Errors about the row itself have no field path
+    assert data["results"][1]["error"].startswith("Input should be")
+
+    product = client.post(
+        "/products/batch-get", json={"skus": ["STR-001"]}
+    ).json()["results"][0]["product"]
+    assert product["name"] == "Streamed One v2"
+
+
+def test_export_products(client):
+
+    res = client.post("/categories", json={"name": "Exported"})
+    category_id = res.json()["id"]
+
+    for sku, price in (("EXP-001", "5.00"), ("EXP-002", "500.00")):
+        client.post(
+            "/products",
+            json={
+                "name": "Exportable",
+                "price": price,
+                "sku": sku,
+                "category_ids": [category_id]
+            }
+        )
+
+    response = client.get(f"/products/export?category_id={category_id}")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(row["sku"] for row in rows) == ["EXP-001", "EXP-002"]
+    assert rows[0]["categories"] == [{"id": category_id, "name": "Exported"}]
+
+    response = client.get(
+        f"/products/export?format=csv&category_id={category_id}&max_price=10"
+    )
+
+    lines = response.text.splitlines()
+    assert lines[0].startswith("id,name,description,price,sku")
+    assert len(lines) == 2
+    assert "EXP-001" in lines[1] and "Exported" in lines[1]
+
+
+def test_search_products_ranked_by_relevance(client):
+
+    client.post(
+        "/products",
+        json={
+            "name": "Camera bag",
+            "description": "Fits any zoomlens",
+            "price": "30.00",
+            "sku": "RNK-001"
+        }
+    )
+    client.post(
+        "/products",
+        json={
+            "name": "Zoomlens",
+            "description": "Telephoto",
+            "price": "900.00",
+            "sku": "RNK-002"
+        }
+    )
+
+    response = client.get("/products/search?q=zoomlens")
+
+    assert response.status_code == 200
+    assert [p["sku"] for p in response.json()] == ["RNK-002", "RNK-001"]
+
+    response = client.get("/products/search?q=zoomlens&sort=price")
+    assert [p["sku"] for p in response.json()] == ["RNK-001", "RNK-002"]
+
+    response = client.get("/products/search?sort=relevance")
+    assert response.status_code == 400
+
+
+def test_autocomplete_and_fuzzy_search(client):
+
+    client.post(
+        "/products",
+        json={
+            "name": "Ultralight Notebook",
+            "description": "Thin and light",
+            "price": "999.00",
+            "sku": "ACP-001"
+        }
+    )
+
+    response = client.get("/products/autocomplete?q=ultral")
+
+    assert response.status_code == 200
+    suggestions = response.json()
+    assert suggestions[0]["sku"] == "ACP-001"
+    assert set(suggestions[0]) == {"id", "name", "sku"}
+
+    response = client.get("/products/autocomplete?q=acp-0")
+    assert [s["sku"] for s in response.json()] == ["ACP-001"]
+
+    # Partial words match nothing in full-text search ...
+    response = client.get("/products/search?q=ultral")
+    assert response.json() == []
+
+    # ... unless the fuzzy fallback is enabled
+    response = client.get("/products/search?q=ultral&fuzzy=true")
+    assert [p["sku"] for p in response.json()] == ["ACP-001"]
+
+
+def test_trigram_indexes_built_concurrently_by_one_worker(client):
+
+    from app.database import TRIGRAM_INDEX_LOCK, build_trigram_indexes, features
+
+    if not features.trigram:
+        pytest.skip("pg_trgm unavailable")
+
+    def indexes():
+        with engine.connect() as connection:
+            return dict(connection.execute(text(
+                "SELECT c.relname, i.indisvalid FROM pg_index i "
+                "JOIN pg_class c ON c.oid = i.indexrelid "
+                "WHERE c.relname LIKE 'idx_products_%_trgm'"
+            )).all())
+
+    with engine.begin() as connection:
+        connection.execute(text("DROP INDEX idx_products_name_trgm"))
+
+    # Another worker is building: skip
+    with engine.connect() as other:
+        other.execute(text("SELECT pg_advisory_lock(hashtext(:lock))"), {"lock": TRIGRAM_INDEX_LOCK})
+        build_trigram_indexes(engine)
+        assert indexes() == {"idx_products_sku_trgm": True}
+        other.execute(text("SELECT pg_advisory_unlock(hashtext(:lock))"), {"lock": TRIGRAM_INDEX_LOCK})
+        other.commit()
+
+    build_trigram_indexes(engine)
+    assert indexes() == {"idx_products_name_trgm": True, "idx_products_sku_trgm": True}
+
+
+def test_get_product_is_cached_until_written(client, without_documents):
+
+    product_id = client.post(
+        "/products",
+        json={"name": "Cached", "price": "5.00", "sku": "CCH-001"}
+    ).json()["id"]
+
+    client.get(f"/products/{product_id}")
+    stats = client.get("/health/cache").json()["products"]
+
+    response = client.get(f"/products/{product_id}")
+    assert response.json()["name"] == "Cached"
+
+    if stats["enabled"]:
+        hits = client.get("/health/cache").json()["products"]["hits"]
+        assert hits == stats["hits"] + 1
+
+    client.put(f"/products/{product_id}", json={"name": "Recached"})
+
+    response = client.get(f"/products/{product_id}")
+    assert response.json()["name"] == "Recached"
+
+    client.delete(f"/products/{product_id}")
+    assert client.get(f"/products/{product_id}").status_code == 404
+
+
+def test_linking_new_products_keeps_cached_products(client, without_documents):
+
+    category = client.post("/categories", json={"name": "Cache link category"}).json()["id"]
+    product_id = client.post(
+        "/products",
+        json={"name": "Cached linked", "price": "5.00", "sku": "CCH-101",
+              "category_ids": [category]}
+    ).json()["id"]
+
+    client.get(f"/products/{product_id}")
+    stats = client.get("/health/cache").json()["products"]
+
+    if not stats["enabled"]:
+        pytest.skip("cache disabled")
+
+    # Dirties the category through the backref, but changes none of its columns
+    client.post(
+        "/products",
+        json={"name": "Cached neighbour", "price": "6.00", "sku": "CCH-102",
+              "category_ids": [category]}
+    )
+
+    client.get(f"/products/{product_id}")
+    after = client.get("/health/cache").json()["products"]
+    assert after["hits"] == stats["hits"] + 1
+    assert after["misses"] == stats["misses"]
+
+
+@pytest.mark.skipif(not CACHE_NOTIFY, reason="cache notifications disabled")
+def test_cache_evicts_writes_from_other_workers(client, without_documents):
+
+    product_id = client.post(
+        "/products",
+        json={"name": "Shared", "price": "10.00", "sku": "NTF-001"}
+    ).json()["id"]
+    client.get(f"/products/{product_id}")
+
+    # Another worker updates the price and announces it
+    with engine.begin() as connection:
+        connection.execute(
+            text("UPDATE products SET price = 12.00 WHERE id = :id"),
+            {"id": product_id},
+        )
+        connection.execute(
+            text("SELECT pg_notify('catalog_cache', :payload)"),
+            {"payload": json.dumps({
+                "origin": "other-worker",
+                "changes": {"products": [product_id]},
+            })},
+        )
+
+    deadline = time.monotonic() + 5
+    while client.get(f"/products/{product_id}").json()["price"] != "12.00":
+        assert time.monotonic() < deadline, "stale price was never evicted"
+        time.sleep(0.05)
+
+
+def test_cache_listener_survives_unexpected_errors(monkeypatch):
+
+    import asyncpg
+    from app.notifications import listen_for_changes
+
+    attempts = []
+
+    async def connect(dsn):
+        attempts.append(dsn)
+        raise asyncpg.InterfaceError("connection was closed in the middle of operation")
+
+    monkeypatch.setattr("app.notifications.asyncpg.connect", connect)
+
+    async def run():
+        listener = asyncio.create_task(listen_for_changes(retry_seconds=0))
+        while len(attempts) < 3:
+            assert not listener.done()
+            await asyncio.sleep(0.01)
+
+        listener.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await listener
+
+    asyncio.run(run())
+
+
+def test_get_product_conditional(client):
+
+    category_id = client.post(
+        "/categories", json={"name": "Conditional"}
+    ).json()["id"]
+    product_id = client.post(
+        "/products",
+        json={
+            "name": "Conditional",
+            "price": "3.00",
+            "sku": "ETG-001",
+            "category_ids": [category_id]
+        }
+    ).json()["id"]
+
+    response = client.get(f"/products/{product_id}")
+    etag = response.headers["ETag"]
+    last_modified = response.headers["Last-Modified"]
+
+    response = client.get(f"/products/{product_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+
+    response = client.get(
+        f"/products/{product_id}", headers={"If-Modified-Since": last_modified}
+    )
+    assert response.status_code == 304
+
+    # Renaming an embedded category changes the product representation
+    client.put(f"/categories/{category_id}", json={"name": "Renamed conditional"})
+
+    response = client.get(f"/products/{product_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.json()["categories"][0]["name"] == "Renamed conditional"
+
+    etag = response.headers["ETag"]
+    client.put(f"/products/{product_id}", json={"category_ids": []})
+
+    response = client.get(f"/products/{product_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+
+    # A list validator is answered without loading the page
+    response = client.get("/products?limit=5")
+    response = client.get(
+        "/products?limit=5", headers={"If-None-Match": response.headers["ETag"]}
+    )
+    assert response.status_code == 304
+
+    # Lists only go by the ETag: deleting a row moves no updated_at
+    response = client.get("/products?limit=5")
+    assert "Last-Modified" not in response.headers
+    response = client.get(
+        "/products?limit=5", headers={"If-Modified-Since": "Fri, 01 Jan 2100 00:00:00 GMT"}
+    )
+    assert response.status_code == 200
+
+
+def test_last_modified_is_utc_whatever_the_session_time_zone(client):
+
+    from email.utils import parsedate_to_datetime
+    from sqlalchemy.orm import Session
+    from app.models.product import Product
+
+    with engine.connect() as connection:
+        connection.execute(text("SET TIME ZONE 'Asia/Tokyo'"))
+        with Session(bind=connection) as session:
+            product = Product(name="Tokyo product", price=Decimal("1.00"), sku="TZ-001")
+            session.add(product)
+            session.commit()
+            product_id = product.id
+        connection.commit()
+
+    response = client.get(f"/products/{product_id}")
+    last_modified = parsedate_to_datetime(response.headers["Last-Modified"])
+    assert abs(time.time() - last_modified.timestamp()) < 60
+
+
+def test_product_changes_feed(client):
+
+    def sync(token=None):
+        updated, deleted = [], []
+        while True:
+            params = {"limit": 2, **({"since": token} if token else {})}
+            page = client.get("/products/changes", params=params).json()
+            updated += [p["sku"] for p in page["updated"]]
+            deleted += [d["sku"] for d in page["deleted"]]
+            token = page["next_token"]
+            if not page["has_more"]:
+                return updated, deleted, token
+
+    kept = client.post(
+        "/products", json={"name": "Feed kept", "price": "1.00", "sku": "CHG-001"}
+    ).json()["id"]
+    dropped = client.post(
+        "/products", json={"name": "Feed dropped", "price": "1.00", "sku": "CHG-002"}
+    ).json()["id"]
+
+    updated, deleted, token = sync()
+    assert {"CHG-001", "CHG-002"} <= set(updated)
+
+    client.put(f"/products/{kept}", json={"price": "2.00"})
+    client.delete(f"/products/{dropped}")
+
+    updated, deleted, token = sync(token)
+    assert updated == ["CHG-001"]
+    assert deleted == ["CHG-002"]
+
+    assert sync(token) == ([], [], token)
+
+    response = client.get("/products/changes?since=bogus")
+    assert response.status_code == 400
+
+
+def test_search_facets(client):
+
+    tools = client.post("/categories", json={"name": "Facet tools"}).json()["id"]
+    garden = client.post("/categories", json={"name": "Facet garden"}).json()["id"]
+
+    for sku, price, category_ids in (
+        ("FCT-001", "5.00", [tools]),
+        ("FCT-002", "30.00", [tools, garden]),
+        ("FCT-003", "2000.00", [garden]),
+    ):
+        client.post(
+            "/products",
+            json={
+                "name": f"Facetable {sku}",
+                "price": price,
+                "sku": sku,
+                "category_ids": category_ids
+            }
+        )
+
+    response = client.get(
+        "/products/search?q=facetable&facets=categories,price&limit=1"
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data["items"]) == 1
+
+    counts = {c["name"]: c["count"] for c in data["facets"]["categories"]}
+    assert counts == {"Facet tools": 2, "Facet garden": 2}
+
+    price = {b["min"]: b["count"] for b in data["facets"]["price"]}
+    assert price["0"] == 1
+    assert price["25"] == 1
+    assert price["1000"] == 1
+    assert data["facets"]["price"][-1]["max"] is None
+
+    response = client.get("/products/search?q=facetable&facets=brand")
+    assert response.status_code == 400
+
+
+def test_search_multiple_categories(client):
+
+    red = client.post("/categories", json={"name": "Match red"}).json()["id"]
+    blue = client.post("/categories", json={"name": "Match blue"}).json()["id"]
+
+    for sku, category_ids in (
+        ("MCT-001", [red]),
+        ("MCT-002", [red, blue]),
+        ("MCT-003", [blue]),
+    ):
+        client.post(
+            "/products",
+            json={
+                "name": f"Matchable {sku}",
+                "price": "1.00",
+                "sku": sku,
+                "category_ids": category_ids
+            }
+        )
+
+    def skus(query):
+        response = client.get(f"/products/search?sort=name&{query}")
+        assert response.status_code == 200
+        return [p["sku"] for p in response.json()]
+
+    both = f"category_ids={red}&category_ids={blue}"
+
+    assert skus(both) == ["MCT-001", "MCT-002", "MCT-003"]
+    assert skus(f"{both}&category_match=all") == ["MCT-002"]
+    assert skus(f"category_id={red}&category_ids={blue}&category_match=all") == ["MCT-002"]
+    assert skus(f"category_id={blue}") == ["MCT-002", "MCT-003"]
+
+    response = client.get(f"/products/search?{both}&category_match=none")
+    assert response.status_code == 400
+
+
+def test_search_total_count(client):
+
+    for sku in ("CNT-001", "CNT-002", "CNT-003"):
+        client.post(
+            "/products",
+            json={"name": f"Countable {sku}", "price": "3.00", "sku": sku}
+        )
+
+    response = client.get("/products/search?q=countable&limit=2")
+    assert response.status_code == 200
+    assert "X-Total-Count" not in response.headers
+
+    for mode in ("exact", "estimate"):
+        response = client.get(f"/products/search?q=countable&limit=2&count={mode}")
+        assert response.status_code == 200
+        assert len(response.json()) == 2
+        # Small results are always counted exactly
+        assert response.headers["X-Total-Count"] == "3"
+
+    response = client.get(
+        "/products/search?q=countable&facets=price&count=exact&limit=1"
+    )
+    assert response.json()["total"] == 3
+
+    response = client.get("/products/search?q=countable&count=roughly")
+    assert response.status_code == 400
+
+
+def test_list_products_total_count(client):
+
+    client.post(
+        "/products",
+        json={"name": "Counted product", "price": "1.00", "sku": "CNT-LIST-001"}
+    )
+
+    response = client.get("/products?limit=1&count=exact")
+    assert response.status_code == 200
+    total = int(response.headers["X-Total-Count"])
+    assert total >= 1
+
+    response = client.get("/products?limit=1&count=estimate")
+    assert int(response.headers["X-Total-Count"]) >= 0
+
+    # A changed total changes the ETag of an otherwise identical page
+    etag = client.get("/products?limit=1&count=exact").headers["ETag"]
+    client.post(
+        "/products",
+        json={"name": "~Counted product", "price": "1.00", "sku": "CNT-LIST-002"}
+    )
+    response = client.get(
+        "/products?limit=1&count=exact",
+        headers={"If-None-Match": etag},
+    )
+    assert response.status_code == 200
+    assert int(response.headers["X-Total-Count"]) == total + 1
+
+
+def test_plain_rows_serialize_like_response_model(client):
+
+    from typing import List
+
+    from pydantic import TypeAdapter
+    from sqlalchemy.orm import Session
+    from starlette.responses import JSONResponse
+
+    from app.api.responses import FastJSONResponse
+    from app.rendering import FULL_PROJECTION, project
+    from app.repositories.product_repository import ProductRepository
+    from app.schemas.product import ProductResponse
+
+    # Created in reverse name order, so ID order is unlikely to match it
+    categories = [
+        client.post("/categories", json={"name": name, "description": "Equivalent"}).json()["id"]
+        for name in ("Equivalence second", "Equivalence first", "Equivalence third")
+    ]
+    for sku, price, linked in (("EQV-001", "12.34", categories), ("EQV-002", "0.50", [])):
+        client.post(
+            "/products",
+            json={"name": f"Equivalence {sku}", "price": price, "sku": sku,
+                  "description": "Caf\u00e9 \"quoted\"", "category_ids": linked}
+        )
+
+    page = TypeAdapter(List[ProductResponse])
+
+    def response_model(products):
+        # What FastAPI did with response_model=List[ProductResponse]
+        validated = page.validate_python(products, from_attributes=True)
+        return json.loads(JSONResponse(page.dump_python(validated, mode="json")).body)
+
+    def plain(rows):
+        return json.loads(FastJSONResponse([project(row, FULL_PROJECTION) for row in rows]).body)
+
+    after = ("Equivalence", uuid.UUID(int=0))
+
+    with Session(engine) as session:
+        repository = ProductRepository(session)
+
+        listed = response_model(repository.get_all(limit=2, after=after))
+        assert plain(repository.get_all_rows(limit=2, after=after)) == listed
+
+        searched = response_model(repository.search(keyword="equivalence"))
+        assert plain(repository.search_rows(keyword="equivalence")) == searched
+
+    assert [p["sku"] for p in listed] == ["EQV-001", "EQV-002"]
+    assert [p["price"] for p in listed] == ["12.34", "0.50"]
+    assert [c["name"] for c in listed[0]["categories"]] == [
+        "Equivalence first", "Equivalence second", "Equivalence third"
+    ]
+    assert {p["sku"] for p in searched} == {"EQV-001", "EQV-002"}
+
+
+def test_sparse_fieldsets(client):
+
+    category = client.post("/categories", json={"name": "Sparse category"}).json()["id"]
+
+    product = client.post(
+        "/products",
+        json={
+            "name": "Sparse product",
+            "description": "Not requested",
+            "price": "12.50",
+            "sku": "SPR-001",
+            "category_ids": [category]
+        }
+    ).json()
+
+    response = client.get(f"/products/{product['id']}?fields=name,price")
+    assert response.status_code == 200
+    assert response.json() == {
+        "id": product["id"],
+        "name": "Sparse product",
+        "price": "12.50",
+    }
+    full_etag = client.get(f"/products/{product['id']}").headers["ETag"]
+    assert response.headers["ETag"] != full_etag
+
+    response = client.get(
+        f"/products/{product['id']}?fields=sku&expand=categories"
+    )
+    assert set(response.json()) == {"id", "sku", "categories"}
+    assert response.json()["categories"][0]["name"] == "Sparse category"
+
+    response = client.get("/products/search?q=sparse&fields=name&sort=name")
+    assert response.status_code == 200
+    assert response.json() == [{"id": product["id"], "name": "Sparse product"}]
+
+    response = client.get(f"/products/search?category_id={category}&expand=categories")
+    item = response.json()[0]
+    assert item["description"] == "Not requested"
+    assert item["categories"][0]["id"] == category
+
+    # Keyset cursors still work when the sort key is not requested
+    response = client.get("/products?fields=sku&limit=1")
+    assert set(response.json()[0]) == {"id", "sku"}
+    assert response.headers["X-Next-Cursor"]
+
+    etag = response.headers["ETag"]
+    response = client.get(
+        "/products?fields=sku&limit=1",
+        headers={"If-None-Match": etag},
+    )
+    assert response.status_code == 304
+
+    response = client.get("/products?fields=name,secret")
+    assert response.status_code == 400
+
+    response = client.get("/products?expand=reviews")
+    assert response.status_code == 400
+
+
+def test_batch_get_products(client):
+
+    category = client.post("/categories", json={"name": "Batch category"}).json()["id"]
+
+    products = [
+        client.post(
+            "/products",
+            json={
+                "name": f"Batch product {number}",
+                "price": "4.00",
+                "sku": f"BATCH-{number:03d}",
+                "category_ids": [category]
+            }
+        ).json()
+        for number in range(3)
+    ]
+    missing = "00000000-0000-0000-0000-000000000000"
+
+    response = client.post(
+        "/products/batch-get",
+        json={"ids": [products[2]["id"], missing, products[0]["id"], products[2]["id"]]},
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["found"] == 3
+    assert data["not_found"] == 1
+    assert [r["status"] for r in data["results"]] == ["found", "not_found", "found", "found"]
+    assert [r["key"] for r in data["results"]] == [
+        products[2]["id"], missing, products[0]["id"], products[2]["id"]
+    ]
+    assert data["results"][0]["product"]["sku"] == "BATCH-002"
+    assert data["results"][0]["product"]["categories"][0]["id"] == category
+    assert data["results"][1]["product"] is None
+
+    response = client.post(
+        "/products/batch-get?fields=name",
+        json={"skus": ["BATCH-001", "BATCH-404"]},
+    )
+    results = response.json()["results"]
+    assert results[0]["product"] == {"id": products[1]["id"], "name": "Batch product 1"}
+    assert results[1]["status"] == "not_found"
+
+    response = client.post("/products/batch-get", json={"ids": [], "skus": []})
+    assert response.status_code == 400
+
+    response = client.post("/products/batch-get", json={})
+    assert response.status_code == 400
+
+    response = client.post(
+        "/products/batch-get",
+        json={"skus": [f"BATCH-{number}" for number in range(1001)]},
+    )
+    assert response.status_code == 400
+
+
+def test_bulk_delete_products(client):
+
+    category = client.post("/categories", json={"name": "Bulk delete category"}).json()["id"]
+
+    products = [
+        client.post(
+            "/products",
+            json={
+                "name": f"Bulk delete product {number}",
+                "price": "3.00",
+                "sku": f"BDEL-{number:03d}",
+                "category_ids": [category]
+            }
+        ).json()["id"]
+        for number in range(3)
+    ]
+    missing = "00000000-0000-0000-0000-000000000000"
+
+    # Cached before the delete
+    client.get(f"/products/{products[0]}")
+
+    response = client.delete(
+        "/products",
+        params={"ids": [products[0], missing, products[1], products[0]]},
+    )
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "deleted": [products[0], products[1]],
+        "not_found": [missing],
+    }
+
+    assert client.get(f"/products/{products[0]}").status_code == 404
+    assert client.get(f"/products/{products[2]}").status_code == 200
+
+    with engine.connect() as connection:
+        tombstones = connection.execute(
+            text("SELECT sku FROM product_tombstones WHERE sku LIKE 'BDEL-%' ORDER BY sku")
+        ).scalars().all()
+        links = connection.execute(
+            text("SELECT count(*) FROM product_categories WHERE category_id = :id"),
+            {"id": category},
+        ).scalar()
+
+    assert tombstones == ["BDEL-000", "BDEL-001"]
+    assert links == 1
+
+    response = client.delete("/products")
+    assert response.status_code == 400
+
+    response = client.delete(
+        "/products", params={"ids": [str(uuid.uuid4()) for _ in range(1001)]}
+    )
+    assert response.status_code == 400
+
+
+def test_update_prices(client):
+
+    products = [
+        client.post(
+            "/products",
+            json={"name": f"Repriced product {number}", "price": "10.00", "sku": f"PRICE-{number:03d}"}
+        ).json()
+        for number in range(3)
+    ]
+    missing = "00000000-0000-0000-0000-000000000000"
+
+    # Cached before the update
+    client.get(f"/products/{products[0]['id']}")
+
+    response = client.patch(
+        "/products/prices",
+        json=[
+            {"id": products[0]["id"], "price": "11.50"},
+            {"id": missing, "price": "1.00"},
+            {"id": products[1]["id"], "price": "12.00"},
+            {"id": products[0]["id"], "price": "11.75"},
+        ],
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["updated"] == 3
+    assert data["not_found"] == 1
+    assert [r["status"] for r in data["results"]] == ["updated", "not_found", "updated", "updated"]
+
+    updated = client.get(f"/products/{products[0]['id']}").json()
+    assert updated["price"] == "11.75"
+    assert updated["updated_at"] > products[0]["updated_at"]
+
+    response = client.patch(
+        "/products/prices",
+        json=[{"sku": "PRICE-002", "price": "9.99"}, {"sku": "PRICE-404", "price": "1.00"}],
+    )
+    assert [r["status"] for r in response.json()["results"]] == ["updated", "not_found"]
+    assert client.get(f"/products/{products[2]['id']}").json()["price"] == "9.99"
+
+    # Mixed keys, no key, empty body, prices out of DECIMAL(10, 2)
+    for body in (
+        [{"id": products[0]["id"], "price": "1.00"}, {"sku": "PRICE-001", "price": "1.00"}],
+        [{"price": "1.00"}],
+        [],
+        [{"sku": "PRICE-001", "price": "-1.00"}],
+        [{"sku": "PRICE-001", "price": "100000000.00"}],
+        [{"sku": "PRICE-001", "price": "1.005"}],
+    ):
+        assert client.patch("/products/prices", json=body).status_code == 400
+
+
+def test_product_documents(client, monkeypatch):
+
+    monkeypatch.setattr("app.documents.PRODUCT_DOCUMENTS", True)
+
+    category = client.post("/categories", json={"name": "Document category"}).json()["id"]
+    product = client.post(
+        "/products",
+        json={
+            "name": "Document product",
+            "price": "8.00",
+            "sku": "DOC-001",
+            "category_ids": [category]
+        }
+    ).json()
+
+    # Products written before documents were enabled
+    from app.documents import backfill_documents
+    backfill_documents(engine)
+
+    def both(method, url, **kwargs):
+        responses = []
+        for enabled in (False, True):
+            monkeypatch.setattr("app.api.product_routes.PRODUCT_DOCUMENTS", enabled)
+            responses.append(client.request(method, url, **kwargs))
+        return responses
+
+    regular, document = both("GET", f"/products/{product['id']}")
+    assert document.content == regular.content
+    assert document.headers["ETag"] == regular.headers["ETag"]
+
+    regular, document = both("GET", "/products?limit=5")
+    assert document.content == regular.content
+    assert document.headers["ETag"] == regular.headers["ETag"]
+    assert document.headers.get("X-Next-Cursor") == regular.headers.get("X-Next-Cursor")
+
+    regular, document = both(
+        "POST", "/products/batch-get",
+        json={"skus": ["DOC-001", "DOC-404", "DOC-001"]},
+    )
+    assert document.content == regular.content
+
+    # Category renames and price changes reach the documents
+    client.put(f"/categories/{category}", json={"name": "Renamed document category"})
+    client.patch("/products/prices", json=[{"sku": "DOC-001", "price": "9.00"}])
+
+    regular, document = both("GET", f"/products/{product['id']}")
+    assert document.content == regular.content
+    assert document.json()["price"] == "9.00"
+    assert document.json()["categories"][0]["name"] == "Renamed document category"
+
+    # Category deletes don't write the products; the documents follow
+    # anyway, whether or not the deleting process keeps documents
+    for enabled in (True, False):
+        monkeypatch.setattr("app.documents.PRODUCT_DOCUMENTS", enabled)
+        doomed = client.post("/categories", json={"name": f"Doomed {enabled}"}).json()["id"]
+        client.put(f"/products/{product['id']}", json={"category_ids": [category, doomed]})
+        client.delete(f"/categories/{doomed}")
+
+        regular, document = both("GET", f"/products/{product['id']}")
+        assert document.content == regular.content
+        assert document.headers["ETag"] == regular.headers["ETag"]
+        assert len(document.json()["categories"]) == 1
+
+    monkeypatch.setattr("app.documents.PRODUCT_DOCUMENTS", True)
+    assert backfill_documents(engine) == 1
+
+    def documents():
+        with engine.connect() as connection:
+            return connection.execute(
+                text("SELECT count(*) FROM product_documents WHERE id = :id"),
+                {"id": product["id"]},
+            ).scalar()
+
+    assert documents() == 1
+    client.delete(f"/products/{product['id']}")
+    assert documents() == 0
+
+
+def test_product_documents_render_only_written_products(client, monkeypatch):
+
+    monkeypatch.setattr("app.documents.PRODUCT_DOCUMENTS", True)
+
+    category = client.post("/categories", json={"name": "Render category"}).json()["id"]
+    neighbour = client.post(
+        "/products",
+        json={"name": "Render neighbour", "price": "4.00", "sku": "RND-001",
+              "category_ids": [category]}
+    ).json()["id"]
+
+    def versions():
+        # xmin changes whenever the upsert rewrites a row
+        with engine.connect() as connection:
+            return dict(connection.execute(text(
+                "SELECT p.sku, d.xmin::text FROM product_documents d "
+                "JOIN products p ON p.id = d.id WHERE p.sku LIKE 'RND-%'"
+            )).all())
+
+    before = versions()
+    assert set(before) == {"RND-001"}
+
+    created = client.post(
+        "/products",
+        json={"name": "Render new", "price": "5.00", "sku": "RND-002",
+              "category_ids": [category]}
+    )
+    assert created.status_code == 201
+
+    after = versions()
+    assert set(after) == {"RND-001", "RND-002"}
+    assert after["RND-001"] == before["RND-001"]
+
+    client.delete(f"/products/{neighbour}")
+
+
+def test_product_documents_follow_orm_category_edits(client, monkeypatch):
+
+    monkeypatch.setattr("app.documents.PRODUCT_DOCUMENTS", True)
+
+    from app.models.category import Category
+    from app.unit_of_work.sqlalchemy_uow import SQLAlchemyUnitOfWork
+
+    edited = client.post("/categories", json={"name": "ORM edited"}).json()["id"]
+    other = client.post("/categories", json={"name": "ORM other"}).json()["id"]
+    for sku, category in (("ORM-001", edited), ("ORM-002", other)):
+        client.post(
+            "/products",
+            json={"name": f"ORM {sku}", "price": "3.00", "sku": sku,
+                  "category_ids": [category]}
+        )
+
+    def documents():
+        with engine.connect() as connection:
+            return {sku: (xmin, bytes(document)) for sku, xmin, document in connection.execute(text(
+                "SELECT p.sku, d.xmin::text, d.document FROM product_documents d "
+                "JOIN products p ON p.id = d.id WHERE p.sku LIKE 'ORM-%'"
+            ))}
+
+    before = documents()
+
+    # Only the edited category's products are re-rendered, not the catalog
+    with SQLAlchemyUnitOfWork() as uow:
+        uow.session.get(Category, uuid.UUID(edited)).name = "ORM renamed"
+
+    after = documents()
+    assert b"ORM renamed" in after["ORM-001"][1]
+    assert after["ORM-002"] == before["ORM-002"]
+
+
+def test_backfill_documents_runs_in_one_worker(client, monkeypatch):
+
+    from app.documents import BACKFILL_LOCK, backfill_documents
+
+    # Written by a process with PRODUCT_DOCUMENTS off: no document
+    monkeypatch.setattr("app.documents.PRODUCT_DOCUMENTS", False)
+    client.post(
+        "/products",
+        json={"name": "Backfill product", "price": "3.00", "sku": "BFL-001"}
+    )
+
+    def documented():
+        with engine.connect() as connection:
+            return connection.execute(text(
+                "SELECT count(*) FROM product_documents d "
+                "JOIN products p ON p.id = d.id WHERE p.sku = 'BFL-001'"
+            )).scalar()
+
+    # Another worker is backfilling: skip
+    with engine.connect() as other:
+        other.execute(text("SELECT pg_advisory_lock(hashtext(:lock))"), {"lock": BACKFILL_LOCK})
+        assert backfill_documents(engine) == 0
+        other.execute(text("SELECT pg_advisory_unlock(hashtext(:lock))"), {"lock": BACKFILL_LOCK})
+        other.commit()
+
+    assert documented() == 0
+    assert backfill_documents(engine) >= 1
+    assert documented() == 1
+
+
+def test_product_documents_fall_back_when_missing(client, monkeypatch):
+
+    # Written by a process with PRODUCT_DOCUMENTS off: no document
+    product = client.post(
+        "/products",
+        json={"name": "0 Undocumented product", "price": "2.00", "sku": "UND-001"}
+    ).json()
+
+    def both(method, url, **kwargs):
+        responses = []
+        for enabled in (False, True):
+            monkeypatch.setattr("app.api.product_routes.PRODUCT_DOCUMENTS", enabled)
+            responses.append(client.request(method, url, **kwargs))
+        return responses
+
+    regular, document = both("POST", "/products/batch-get", json={"skus": ["UND-001"]})
+    assert document.json()["results"][0]["status"] == "found"
+    assert document.content == regular.content
+
+    regular, document = both("GET", "/products?limit=100")
+    assert product["id"] in [item["id"] for item in document.json()]
+    assert document.content == regular.content
+    assert document.headers["ETag"] == regular.headers["ETag"]
+
+    regular, document = both("GET", f"/products/{product['id']}")
+    assert document.content == regular.content
+
+
+def test_product_changes_feed_follows_commit_order(client):
+
+    def sync(token):
+        page = client.get("/products/changes", params={"since": token, "limit": 1000}).json()
+        return [p["sku"] for p in page["updated"]], page["next_token"]
+
+    client.post("/products", json={"name": "Feed start", "price": "1.00", "sku": "ORD-000"})
+    token = client.get("/products/changes", params={"limit": 1000}).json()["next_token"]
+    while True:
+        skus, next_token = sync(token)
+        if next_token == token:
+            break
+        token = next_token
+
+    # A long read-only transaction (an export, a backup) doesn't hold the feed back
+    with engine.connect() as reader:
+        reader.execute(text("SELECT count(*) FROM products"))
+
+        client.post("/products", json={"name": "Feed read", "price": "1.00", "sku": "ORD-001"})
+        skus, token = sync(token)
+        assert skus == ["ORD-001"]
+
+        reader.rollback()
+
+    # A write still in progress hides later commits until it commits,
+    # then both show up
+    with engine.connect() as writer:
+        writer.execute(text(
+            "INSERT INTO products (id, name, price, sku, created_at, updated_at) "
+            "VALUES (gen_random_uuid(), 'Feed slow', 1.00, 'ORD-002', now(), now())"
+        ))
+
+        client.post("/products", json={"name": "Feed fast", "price": "1.00", "sku": "ORD-003"})
+        assert sync(token) == ([], token)
+
+        writer.commit()
+
+    skus, token = sync(token)
+    assert skus == ["ORD-002", "ORD-003"]